@@ -7,7 +7,9 @@ import sys
 # Adicionar diretório raiz ao path para importar scripts
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from scripts.utils import convert_xlsx_to_csv_all_methods
+from scripts.utils import concat_sheets, list_sheets_metadata
+from scripts.workbook_cache import read_workbook_cached, workbook_digest
+from scripts.session_store import get_session_store, STAGE_RAW
 
 st.set_page_config(page_title="1. Upload Excel", layout="wide")
 
@@ -15,6 +17,7 @@ st.header("1. Upload de Arquivo")
 st.markdown("Carregue seu arquivo Excel (.xlsx) para iniciar o processamento.")
 
 # --- Inicialização do Session State ---
+store = get_session_store(st.session_state)
 if 'sheet_mode' not in st.session_state:
     st.session_state['sheet_mode'] = 'Uma Aba'
 if 'sheet_selected' not in st.session_state:
@@ -75,11 +78,6 @@ if uploaded_file:
     # Mostrar banner
     if file_source == 'test':
         st.toast(f"Usando arquivo de teste: {uploaded_file.name}", icon="🧪")
-    
-    # Salvar temporariamente para conversão
-    temp_path = f"temp_{uploaded_file.name}"
-    with open(temp_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
         
     try:
         st.divider()
@@ -94,53 +92,86 @@ if uploaded_file:
             horizontal=True
         )
         
-        # --- Conversão ---
-        with st.spinner("Lendo estrutura do arquivo..."):
-            result = convert_xlsx_to_csv_all_methods(temp_path, output_dir="temp_csvs")
+        # --- Estrutura do arquivo: só metadados e primeiras linhas de cada aba ---
+        digest = workbook_digest(st.session_state['excel_bytes'])
+        if st.session_state.get('sheet_metadata_digest') != digest:
+            with st.spinner("Lendo estrutura do arquivo..."):
+                st.session_state['sheet_metadata'] = list_sheets_metadata(
+                    st.session_state['excel_bytes'], uploaded_file.name
+                )
+            st.session_state['sheet_metadata_digest'] = digest
+            st.session_state['concat_confirmed'] = False
+        
+        metadata = st.session_state['sheet_metadata']
         
-        if not result['success']:
-            st.error(f"Erro na conversão: {result['message']}")
+        if not metadata['success']:
+            st.error(f"Erro na leitura: {metadata['message']}")
         else:
-            files_generated = result['output_files']
-            sheet_map = {os.path.basename(f): f for f in files_generated}
-            sheet_names = list(sheet_map.keys())
+            sheet_info = {sheet['name']: sheet for sheet in metadata['sheets']}
+            sheet_names = list(sheet_info.keys())
+            
+            def sheet_label(name):
+                rows = sheet_info[name]['rows']
+                rows_label = f"~{rows:,}".replace(',', '.') if rows is not None else "?"
+                return f"{name} ({rows_label} × {sheet_info[name]['cols']})"
+            
+            with st.expander(f"📑 Abas do arquivo ({len(sheet_names)})", expanded=False):
+                st.dataframe(pd.DataFrame({
+                    'Aba': sheet_names,
+                    'Linhas (aprox.)': [sheet_info[n]['rows'] for n in sheet_names],
+                    'Colunas': [sheet_info[n]['cols'] for n in sheet_names],
+                }), use_container_width=True, hide_index=True)
+                preview_name = st.selectbox("Prévia da aba", sheet_names, key='sheet_preview')
+                st.dataframe(sheet_info[preview_name]['preview'], use_container_width=True)
             
-            selected_csv_path = None
+            df_raw = None
+            to_read = []
             
             if st.session_state['sheet_mode'] == "Uma Aba":
                 if len(sheet_names) > 8:
-                    selected_sheet_name = st.selectbox("Selecione a Aba", sheet_names)
+                    selected_sheet_name = st.selectbox("Selecione a Aba", sheet_names, index=None, format_func=sheet_label)
                 else:
                     if hasattr(st, 'pills'):
-                        selected_sheet_name = st.pills("Selecione a Aba", sheet_names, selection_mode="single")
+                        selected_sheet_name = st.pills("Selecione a Aba", sheet_names, selection_mode="single", format_func=sheet_label)
                     else:
-                        selected_sheet_name = st.radio("Selecione a Aba", sheet_names, horizontal=True)
+                        selected_sheet_name = st.radio("Selecione a Aba", sheet_names, horizontal=True, format_func=sheet_label)
                 
                 st.session_state['sheet_selected'] = selected_sheet_name
                 if selected_sheet_name:
-                    selected_csv_path = sheet_map[selected_sheet_name]
+                    to_read = [selected_sheet_name]
                     
             else: # Concatenar
-                st.info(f"Concatenando {len(files_generated)} abas...")
-                dfs = []
-                for fname in files_generated:
-                    try:
-                        d = pd.read_csv(fname)
-                        d['aba_origem'] = os.path.basename(fname)
-                        dfs.append(d)
-                    except Exception as e:
-                        st.warning(f"Ignorando {fname}: {e}")
+                st.info(f"{len(sheet_names)} abas serão concatenadas (coluna `aba_origem` indica a origem).")
+                if st.button(f"Concatenar {len(sheet_names)} abas"):
+                    st.session_state['concat_confirmed'] = True
+                if st.session_state.get('concat_confirmed'):
+                    to_read = sheet_names
+            
+            # --- Leitura completa só das abas escolhidas (cache Parquet por SHA-256) ---
+            if to_read:
+                with st.spinner("Lendo dados..."):
+                    result = read_workbook_cached(
+                        st.session_state['excel_bytes'],
+                        uploaded_file.name,
+                        sheet_names=None if to_read == sheet_names else to_read
+                    )
                 
-                if dfs:
-                    df_concat = pd.concat(dfs, ignore_index=True)
-                    concat_path = "temp_csvs/concatenado.csv"
-                    df_concat.to_csv(concat_path, index=False)
-                    selected_csv_path = concat_path
+                if not result['success']:
+                    st.error(f"Erro na leitura: {result['message']}")
+                else:
+                    if result.get('cached'):
+                        st.caption(f"⚡ Abas carregadas do cache ({result['digest'][:12]})")
+                    
+                    sheets = result['sheets']
+                    if st.session_state['sheet_mode'] == "Uma Aba":
+                        df_raw = sheets[to_read[0]]
+                    else:
+                        df_raw = concat_sheets(sheets)
             
-            # --- Carregar e Exibir CSV Raw ---
-            if selected_csv_path and os.path.exists(selected_csv_path):
-                df_raw = pd.read_csv(selected_csv_path)
-                st.session_state['csv_raw'] = df_raw.to_csv(index=False)
+            # --- Tabela bruta na sessão (só regravada quando arquivo/abas mudam) ---
+            if df_raw is not None:
+                raw_key = (st.session_state['sheet_metadata_digest'], st.session_state['sheet_mode'], tuple(to_read))
+                store.put(STAGE_RAW, df_raw, key=raw_key)
                 
                 # Resumo
                 st.divider()
@@ -171,10 +202,3 @@ if uploaded_file:
 
     except Exception as e:
         st.error(f"Erro inesperado: {e}")
-    finally:
-        # Limpar temporário principal
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except:
-                pass
@@ -1,6 +1,16 @@
 import streamlit as st
 import pandas as pd
-import io
+import os
+import sys
+
+# Adicionar diretório raiz ao path para importar scripts
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from scripts.header_utils import detect_header, apply_header_row, column_mapping_for, header_matches, frame_to_grid
+from scripts.hierarchy import build_hierarchy
+from scripts.numeric import parse_numeric_columns, NUMERIC_FIELDS
+from scripts.session_store import get_session_store, STAGE_RAW, STAGE_STRUCT
+from scripts.stage_cache import get_stage_cache, make_key
 
 st.set_page_config(page_title="2. Mapear Colunas", layout="wide")
 
@@ -8,7 +18,9 @@ st.set_page_config(page_title="2. Mapear Colunas", layout="wide")
 st.title("2. Mapeamento de Colunas")
 
 # --- Validação Inicial ---
-if 'csv_raw' not in st.session_state:
+store = get_session_store(st.session_state)
+stage_cache = get_stage_cache(st.session_state)
+if STAGE_RAW not in store:
     st.error("Nenhum arquivo carregado. Volte para a página 1.")
     if st.button("Voltar"):
         st.switch_page("pages/1_Upload_Excel.py")
@@ -32,18 +44,41 @@ with st.sidebar:
     
     # --- Ajuste de Cabeçalho ---
     st.markdown("### 1. Ajuste de Tabela")
-    # Default 0, mas permite pular linhas de "lixo" no topo
+    
+    # Tabela crua (sem cabeçalho) montada uma única vez por versão da etapa
+    # raw; a linha do cabeçalho é detectada automaticamente e só define o
+    # default do ajuste
+    raw_key = store.version(STAGE_RAW)
+    if st.session_state.get('raw_grid_key') != raw_key:
+        try:
+            grid = frame_to_grid(store.get(STAGE_RAW))
+        except Exception as e:
+            st.error(f"Erro ao ler a tabela: {e}")
+            st.stop()
+        st.session_state['raw_grid'] = grid
+        st.session_state['raw_grid_key'] = raw_key
+        st.session_state['header_detection'] = detect_header(grid)
+        st.session_state['header_row'] = st.session_state['header_detection']['header_row_idx']
+    
+    detection = st.session_state['header_detection']
+    
+    # Default: linha detectada; permite pular linhas de "lixo" no topo
     header_row = st.number_input(
         "Linha do Cabeçalho", 
         min_value=0, 
-        value=0, 
+        key='header_row',
         help="Se a planilha tem títulos ou logos no topo, aumente este número até a linha azul (cabeçalho) ficar correta."
     )
+    st.caption(f"Detectada automaticamente: linha {detection['header_row_idx']} ({detection['method']}, score {detection['score']:.1f})")
     
-    # Recarregar com novo header (Otimização: cachear ou apenas ler de novo é rápido com StringIO)
+    # Reaplicar o cabeçalho sobre a tabela já lida (sem remontar a tabela crua);
+    # linhas de cabeçalho já testadas voltam do cache de etapas
+    raw_fingerprint = store.fingerprint(STAGE_RAW)
     try:
-        # header=header_row define qual linha é o header (0-indexed)
-        df_raw = pd.read_csv(io.StringIO(st.session_state['csv_raw']), header=header_row)
+        df_raw, _ = stage_cache.get_or_compute(
+            make_key('header', raw_fingerprint, int(header_row)),
+            lambda: apply_header_row(st.session_state['raw_grid'], header_row)
+        )
         cols_originais = df_raw.columns.tolist()
     except Exception as e:
         st.error(f"Erro ao ler cabeçalho na linha {header_row}: {e}")
@@ -55,22 +90,20 @@ with st.sidebar:
     
     current_map = st.session_state['colmap'].copy()
     
+    # Mapeamento sugerido pela detecção (vale só para a linha detectada)
+    detected_map = column_mapping_for(detection, cols_originais) if header_row == detection['header_row_idx'] else {}
+    
     # Função Auxiliar de AutoMap
     def try_automap(field, columns, used):
         if field in current_map and current_map[field] in columns:
             return current_map[field]
         
-        keywords = {
-            'descricao': ['desc', 'disc', 'nome', 'servico', 'objeto'],
-            'unidade': ['unid', 'und', 'med'],
-            'quantidade': ['quant', 'qtd', 'qtde'],
-            'codigo': ['cod', 'item', 'ref'],
-            'preco_unit': ['unit', 'p.u', 'preco_unit'],
-            'preco_total': ['total', 'vl', 'valor', 'preco_tot']
-        }
+        if detected_map.get(field) in columns and detected_map[field] not in used:
+            return detected_map[field]
+        
         for col in columns:
             if col in used: continue
-            if any(k in col.lower() for k in keywords.get(field, [])):
+            if header_matches(col, field):
                 return col
         return None
 
@@ -165,8 +198,8 @@ with st.sidebar:
         st.error(f"Pesquise: {', '.join(warnings)}")
         
     if st.button("✅ Aplicar e Continuar", type="primary", disabled=not can_proceed):
-         try:
-            # Construir csv_struct
+         def build_struct():
+            # Construir a etapa struct
             df_struct = df_raw.copy()
             rename_map = {v: k for k, v in current_map.items()}
             
@@ -181,10 +214,21 @@ with st.sidebar:
                 if opt not in df_struct.columns:
                     df_struct[opt] = None
                     
-            if 'quantidade' in df_struct.columns:
-                df_struct['quantidade'] = pd.to_numeric(df_struct['quantidade'], errors='coerce')
-                
-            st.session_state['csv_struct'] = df_struct.to_csv(index=False)
+            # Quantidade e preços em float64 (formato pt-BR detectado por coluna)
+            mapped_numeric = [f for f in NUMERIC_FIELDS if f in current_map]
+            df_struct, numeric_report = parse_numeric_columns(df_struct, mapped_numeric)
+            
+            # Hierarquia do orçamento (títulos, subtotais, capítulos)
+            return build_hierarchy(df_struct), numeric_report
+         
+         try:
+            # Mesma tabela, cabeçalho e mapeamento já aplicados: resultado do cache
+            (df_struct, numeric_report), _ = stage_cache.get_or_compute(
+                make_key('struct', raw_fingerprint, int(header_row), current_map),
+                build_struct
+            )
+            st.session_state['numeric_report'] = numeric_report
+            store.put(STAGE_STRUCT, df_struct)
             st.success("Salvo!")
             st.switch_page("pages/3_Normalizar.py")
             
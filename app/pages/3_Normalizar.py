@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import io
 import time
 import sys
 import os
@@ -9,24 +8,35 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from scripts.normalize import normalize_dataframe, get_normalization_report
+from scripts.abbreviations import load_abbreviations
+from scripts.session_store import get_session_store, STAGE_STRUCT, STAGE_NORM
+from scripts.stage_cache import get_stage_cache, make_key
 
 st.set_page_config(page_title="3. Normalizar", layout="wide")
 
 st.header("3. Normalização")
 st.markdown("Limpeza e padronização dos textos e números para garantir a qualidade da classificação.")
 
-if 'csv_struct' not in st.session_state:
+store = get_session_store(st.session_state)
+if STAGE_STRUCT not in store:
     st.error("Estrutura não definida. Volte para a página 2.")
     if st.button("Voltar"):
         st.switch_page("pages/2_Mapear_Colunas.py")
     st.stop()
 
 # --- Carregar Dados ---
-try:
-    df_struct = pd.read_csv(io.StringIO(st.session_state['csv_struct']))
-except Exception as e:
-    st.error(f"Erro ao ler CSV estruturado: {e}")
-    st.stop()
+df_struct = store.get(STAGE_STRUCT)
+
+# --- Conversão numérica feita no mapeamento (quantidade e preços) ---
+numeric_failures = {col: rep for col, rep in st.session_state.get('numeric_report', {}).items() if rep['falhas'] > 0}
+if numeric_failures:
+    st.warning(
+        "Células numéricas que não puderam ser convertidas (ficaram vazias): "
+        + "; ".join(
+            f"**{col}**: {rep['falhas']} (ex: {', '.join(map(str, rep['exemplos_falha'][:3]))})"
+            for col, rep in numeric_failures.items()
+        )
+    )
 
 # --- Configuração das Regras ---
 col1, col2 = st.columns([1, 2])
@@ -39,9 +49,18 @@ with col1:
         'remove_stopwords': st.checkbox("Remover stopwords (de, da, com...)", value=False),
         'collapse_spaces': st.checkbox("Remover espaços duplos", value=True),
         'normalize_numbers': st.checkbox("Normalizar números e decimais", value=True),
+        'expand_abbreviations': st.checkbox("Expandir abreviações (conc. → concreto)", value=True, help="Usa o dicionário data/yaml/unidades/abreviacoes.yaml."),
+        'extract_attributes': st.checkbox("Extrair atributos técnicos (fck, DN, bitola, espessura, traço, aço)", value=True),
         'remove_empty_rows': st.checkbox("Remover linhas sem descrição (Vazias/None)", value=True),
-        'remove_duplicates': st.checkbox("Remover duplicatas (Manter itens únicos)", value=False, help="Mantém apenas a primeira ocorrência de itens iguais (Mesma Descrição Normalizada + Unidade).")
+        'remove_duplicates': st.checkbox("Remover duplicatas (Manter itens únicos)", value=False, help="Mantém apenas a primeira ocorrência de itens iguais (Mesma Descrição Normalizada + Unidade)."),
+        'cluster_near_duplicates': st.checkbox("Agrupar quase-duplicatas (cluster_id)", value=False, help="Agrupa descrições parecidas (ordem das palavras, uma palavra a mais, numeração) com a mesma unidade.")
     }
+    if config['cluster_near_duplicates']:
+        config['near_duplicate_threshold'] = st.slider(
+            "Similaridade mínima",
+            min_value=0.5, max_value=1.0, value=0.85, step=0.05,
+            help="Fração de palavras em comum (Jaccard) para duas descrições caírem no mesmo cluster."
+        )
 
 # --- Preview Dinâmico (Amostra) ---
 with col2:
@@ -68,11 +87,16 @@ if c1.button("Voltar"):
 if c2.button("Aplicar Normalização em Tudo", type="primary"):
     with st.spinner("Normalizando..."):
         try:
-            # Processar tudo
-            df_norm, audit_log = normalize_dataframe(df_struct, config, col_desc='descricao')
+            # Processar tudo (mesma estrutura, regras e abreviações: resultado do cache)
+            stage_cache = get_stage_cache(st.session_state)
+            abbreviations = load_abbreviations().fingerprint if config.get('expand_abbreviations', True) else None
+            (df_norm, audit_log), _ = stage_cache.get_or_compute(
+                make_key('normalize', store.fingerprint(STAGE_STRUCT), config, abbreviations),
+                lambda: normalize_dataframe(df_struct, config, col_desc='descricao')
+            )
             
             # Salvar sessão
-            st.session_state['csv_norm'] = df_norm.to_csv(index=False)
+            store.put(STAGE_NORM, df_norm)
             st.session_state['audit_log'] = audit_log
             
             # Mostrar Relatório (Rápido)
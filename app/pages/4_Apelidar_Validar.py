@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-import io
+import numpy as np
 import os
 import time
 import sys
@@ -10,7 +10,17 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 
 from scripts.builder import TaxonomyBuilder
 from scripts.classify import ClassifierEngine
+from scripts.classify_job import classify_sample, submit_classification, STATE_CANCELLED, PREVIEW_STATUSES
 from scripts.unknowns import aggregate_unknowns
+from scripts.abbreviations import load_abbreviations
+from scripts.session_store import get_session_store, STAGE_NORM, STAGE_VALIDATED
+from scripts.stage_cache import get_stage_cache, make_key, taxonomy_fingerprint
+from scripts.search_index import TrigramIndex
+from scripts.exports import get_export_cache, bump_data_version, in_original_order, write_csv, VERSION_KEY
+from scripts.review import (
+    SortIndex, FacetIndex, GroupIndex, apply_changes, editor_changes_by_label, paginate, to_categorical,
+    PAGE_SIZES, DEFAULT_PAGE_SIZE, GROUP_COLUMNS, GROUP_SORTS
+)
 
 st.set_page_config(page_title="4. Apelidar e Validar", layout="wide")
 
@@ -25,12 +35,29 @@ def get_engine():
 
     return classifier
 
+@st.cache_resource
+def get_taxonomy_fingerprint():
+    # Identifica as regras carregadas na chave do cache de classificação
+    return taxonomy_fingerprint(get_engine().builder)
+
 if st.button("🔄 Recarregar Regras (Limpar Cache)"):
     st.cache_resource.clear()
+    load_abbreviations.cache_clear()
+    
+    # Job em andamento usa as regras antigas
+    job = st.session_state.pop('classify_job', None)
+    if job is not None:
+        job.cancel()
+    st.session_state.pop('classify_preview', None)
     
     # Forçar reclassificação dos dados
     if 'df_working' in st.session_state:
         del st.session_state['df_working']
+    st.session_state.pop('pending_edits', None)
+    st.session_state.pop('review_sort_index', None)
+    st.session_state.pop('review_facets', None)
+    st.session_state.pop('review_search_index', None)
+    st.session_state.pop('review_groups', None)
         
     st.success("Cache e Dados limpos! O classificador rodará novamente.")
     st.rerun()
@@ -41,16 +68,55 @@ st.header("4. Classificação e Validação")
 st.markdown("O sistema sugere apelidos baseados na taxonomia. Você valida ou corrige.")
 
 # --- Verificações de Sessão ---
-if 'csv_norm' not in st.session_state:
+store = get_session_store(st.session_state)
+if STAGE_NORM not in store:
     st.error("Dados normalizados não encontrados. Volte para a página 3.")
     if st.button("Voltar"):
         st.switch_page("pages/3_Normalizar.py")
     st.stop()
 
+# --- Classificação em segundo plano ---
+@st.fragment(run_every=1.0)
+def show_classification_progress(job):
+    """Progresso do job, atualizado a cada segundo sem rodar a página inteira."""
+    if not job.running:
+        st.rerun()
+    
+    eta = job.eta()
+    st.progress(
+        job.progress,
+        text=f"Classificando em segundo plano... {job.rows_done:,} de {job.total:,} linhas "
+             f"(lote {job.chunks_done}/{job.chunks_total})"
+             + (f" · ~{eta:.0f}s restantes" if eta is not None else "")
+    )
+    if st.button("⏹️ Cancelar classificação"):
+        job.cancel()
+        st.rerun()
+    show_partial_results(job)
+
+def show_partial_results(job):
+    """Contagem por status e últimas linhas já classificadas."""
+    if not job.rows_done:
+        return
+    st.caption(" · ".join(f"{status}: {n:,}" for status, n in sorted(job.status_counts.items())))
+    st.dataframe(job.partial(last=200), use_container_width=True, height=300)
+
+def show_sample_preview(preview):
+    """Taxas estimadas na amostra estratificada, com intervalo de 95%."""
+    st.markdown(
+        f"**Prévia por amostra:** {preview['amostra']:,} de {preview['itens']:,} itens "
+        f"(estratificada por aba e unidade, {preview['segundos']:.1f}s)"
+    )
+    labels = {'ok': "OK (estimado)", 'revisar': "Revisar (estimado)", 'desconhecido': "Desconhecidos (estimado)"}
+    for col, status in zip(st.columns(len(PREVIEW_STATUSES)), PREVIEW_STATUSES):
+        est = preview['estimativas'][status]
+        col.metric(labels[status], f"{est['p']:.0%}")
+        col.caption(f"IC 95%: {est['inferior']:.0%} – {est['superior']:.0%}")
+
 # --- Carregar Dados ---
 if 'df_working' not in st.session_state:
     try:
-        df_norm = pd.read_csv(io.StringIO(st.session_state['csv_norm']))
+        df_norm = store.get(STAGE_NORM)
         
         # Adicionar ID original para preservar ordem da planilha
         if 'id_original' not in df_norm.columns:
@@ -59,24 +125,71 @@ if 'df_working' not in st.session_state:
         # Inicializar colunas de trabalho se não existirem
         if 'apelido_sugerido' not in df_norm.columns:
             # Ainda não rodou classificador
-            # Vamos rodar automaticamente na primeira vez
-            with st.spinner("Classificando pela primeira vez..."):
-                result_df = classifier.process_dataframe(df_norm, col_desc='descricao_norm', col_unit='unidade')
-                # Merge
-                # O process_dataframe retorna um df com mesmo index, então concat axis=1 funciona se index alinhado
-                # Mas para garantir, vamos fazer concat e remover duplicatas se tiver
-                df_combined = pd.concat([df_norm, result_df], axis=1)
+            # Mesmos dados normalizados e mesma taxonomia: resultado do cache;
+            # senão roda em segundo plano, com progresso e cancelamento
+            stage_cache = get_stage_cache(st.session_state)
+            classify_key = make_key('classify', store.fingerprint(STAGE_NORM), get_taxonomy_fingerprint())
+            result_df = stage_cache.get(classify_key)
+            
+            if result_df is None:
+                job = st.session_state.get('classify_job')
+                if job is None or job.key != classify_key:
+                    # Dados normalizados mudaram: o job anterior não serve mais
+                    if job is not None:
+                        job.cancel()
+                    # Amostra estratificada primeiro (prévia em ~1s); o job
+                    # reaproveita os pares já classificados nela
+                    preview, _ = stage_cache.get_or_compute(
+                        make_key('classify_sample', store.fingerprint(STAGE_NORM), get_taxonomy_fingerprint()),
+                        lambda: classify_sample(classifier, df_norm, col_desc='descricao_norm', col_unit='unidade')
+                    )
+                    job = submit_classification(
+                        classifier, df_norm, key=classify_key, col_desc='descricao_norm', col_unit='unidade',
+                        cache=preview['cache']
+                    )
+                    st.session_state['classify_job'] = job
+                    st.session_state['classify_preview'] = preview
+                
+                if job.running:
+                    if 'classify_preview' in st.session_state:
+                        show_sample_preview(st.session_state['classify_preview'])
+                    show_classification_progress(job)
+                    st.stop()
                 
-                # Inicializar coluna de revisão
-                df_combined['revisar'] = False
+                if job.state == STATE_CANCELLED or job.error:
+                    if job.error:
+                        st.error(f"Erro na classificação: {job.error}")
+                    else:
+                        st.warning(f"Classificação cancelada: {job.rows_done:,} de {job.total:,} linhas classificadas.")
+                    if 'classify_preview' in st.session_state:
+                        show_sample_preview(st.session_state['classify_preview'])
+                    show_partial_results(job)
+                    if st.button("🔁 Classificar novamente", type="primary"):
+                        st.session_state.pop('classify_job', None)
+                        st.session_state.pop('classify_preview', None)
+                        st.rerun()
+                    st.stop()
                 
-                # Inicializar coluna de apelido desejado (feedback do usuário)
-                if 'apelido_desejado' not in df_combined.columns:
-                    df_combined['apelido_desejado'] = ''
+                result_df = stage_cache.put(classify_key, job.result())
+                st.session_state.pop('classify_job', None)
+                st.session_state.pop('classify_preview', None)
+            
+            # Merge
+            # O process_dataframe retorna um df com mesmo index, então concat axis=1 funciona se index alinhado
+            # Mas para garantir, vamos fazer concat e remover duplicatas se tiver
+            df_combined = pd.concat([df_norm, result_df], axis=1)
+            
+            # Inicializar coluna de revisão
+            df_combined['revisar'] = False
+            
+            # Inicializar coluna de apelido desejado (feedback do usuário)
+            if 'apelido_desejado' not in df_combined.columns:
+                df_combined['apelido_desejado'] = ''
                 
             st.session_state['df_working'] = df_combined
         else:
             st.session_state['df_working'] = df_norm
+        bump_data_version(st.session_state)
             
     except Exception as e:
         st.error(f"Erro ao preparar dados: {e}")
@@ -103,14 +216,23 @@ if 'apelido_desejado' not in df_combined.columns:
     df_combined['apelido_desejado'] = ''
     st.session_state['df_working'] = df_combined
 
-# --- Métricas ---
+# --- Facetas (categorias + índice valor → posições) ---
+# Montadas uma vez para o df_working e atualizadas nas edições; filtros,
+# opções e contagens saem do índice em vez de varrer a tabela.
 df = df_combined # Alias curto
 
-total = len(df)
-marcados_revisar = df['revisar'].sum()
-ok = len(df[df['query_status']=='ok']) if 'query_status' in df.columns else len(df[df['status'] == 'ok']) # fallback compatibility
-status_revisar = len(df[df['status'] == 'revisar'])
-desconhecidos = len(df[df['status'] == 'desconhecido'])
+facets = st.session_state.get('review_facets')
+if facets is None or not facets.matches(df):
+    to_categorical(df)
+    facets = FacetIndex(df)
+    st.session_state['review_facets'] = facets
+
+# --- Métricas ---
+total = len(df) - facets.count('status', 'estrutura') # Títulos/subtotais não são itens
+marcados_revisar = facets.count('revisar', True)
+ok = int((df['query_status'] == 'ok').sum()) if 'query_status' in df.columns else facets.count('status', 'ok') # fallback compatibility
+status_revisar = facets.count('status', 'revisar')
+desconhecidos = facets.count('status', 'desconhecido')
 
 m1, m2, m3, m4 = st.columns(4)
 m1.metric("Total de Itens", total)
@@ -129,7 +251,7 @@ with st.expander("🔍 Filtros Avançados", expanded=True):
         # Filtro por Status
         status_filter = st.multiselect(
             "Status",
-            options=['ok', 'revisar', 'desconhecido'],
+            options=['ok', 'revisar', 'desconhecido', 'estrutura'],
             default=['ok', 'revisar', 'desconhecido']
         )
     
@@ -143,7 +265,7 @@ with st.expander("🔍 Filtros Avançados", expanded=True):
     
     with col3:
         # Filtro por Tipo (Domínio)
-        tipos_disponiveis = ['Todos'] + sorted(df['tax_tipo'].dropna().unique().tolist())
+        tipos_disponiveis = ['Todos'] + facets.values('tax_tipo')
         tipo_filter = st.selectbox(
             "Tipo (Domínio)",
             options=tipos_disponiveis,
@@ -153,16 +275,14 @@ with st.expander("🔍 Filtros Avançados", expanded=True):
     # Segunda linha de filtros
     col4, col5, col6, col7 = st.columns(4)
     
+    # Posições do tipo/grupo escolhidos restringem as opções seguintes
+    tipo_positions = facets.positions('tax_tipo', [tipo_filter]) if tipo_filter != 'Todos' else None
+    
     with col4:
         # Filtro por Grupo (Arquivo YAML) - apenas se coluna existir
-        if 'tax_grupo' in df.columns:
+        if 'tax_grupo' in facets:
             # Filtrar grupos baseado no tipo selecionado
-            if tipo_filter != 'Todos':
-                grupos_disponiveis = ['Todos'] + sorted(
-                    df[df['tax_tipo'] == tipo_filter]['tax_grupo'].dropna().unique().tolist()
-                )
-            else:
-                grupos_disponiveis = ['Todos'] + sorted(df['tax_grupo'].dropna().unique().tolist())
+            grupos_disponiveis = ['Todos'] + facets.values('tax_grupo', within=tipo_positions)
             
             grupo_filter = st.selectbox(
                 "Grupo (Arquivo YAML)",
@@ -176,16 +296,11 @@ with st.expander("🔍 Filtros Avançados", expanded=True):
     with col5:
         # Filtro por Apelido
         # Filtrar apelidos baseado no grupo selecionado
-        if 'tax_grupo' in df.columns and grupo_filter != 'Todos':
-            apelidos_disponiveis = ['Todos'] + sorted(
-                df[df['tax_grupo'] == grupo_filter]['apelido_sugerido'].dropna().unique().tolist()
-            )
-        elif tipo_filter != 'Todos':
-            apelidos_disponiveis = ['Todos'] + sorted(
-                df[df['tax_tipo'] == tipo_filter]['apelido_sugerido'].dropna().unique().tolist()
-            )
+        if 'tax_grupo' in facets and grupo_filter != 'Todos':
+            within = facets.positions('tax_grupo', [grupo_filter])
         else:
-            apelidos_disponiveis = ['Todos'] + sorted(df['apelido_sugerido'].dropna().unique().tolist())
+            within = tipo_positions
+        apelidos_disponiveis = ['Todos'] + facets.values('apelido_sugerido', within=within)
         
         apelido_filter = st.selectbox(
             "Apelido Sugerido",
@@ -201,38 +316,45 @@ with st.expander("🔍 Filtros Avançados", expanded=True):
         # Filtro de busca por texto na descrição (busca em AMBAS as colunas)
         search_text = st.text_input("Buscar na descrição", placeholder="Digite para filtrar...")
 
-# Filtragem do DataFrame para Exibição
-mask = df['status'].isin(status_filter)
+# Filtragem do DataFrame para Exibição: interseção das facetas escolhidas
+facet_filters = {'status': status_filter}
 
 # Aplicar filtro de revisar
 if 'Marcado' in revisar_filter and 'Não Marcado' not in revisar_filter:
-    mask = mask & (df['revisar'] == True)
+    facet_filters['revisar'] = [True]
 elif 'Não Marcado' in revisar_filter and 'Marcado' not in revisar_filter:
-    mask = mask & (df['revisar'] == False)
+    facet_filters['revisar'] = [False]
 # Se ambos ou nenhum estiver selecionado, não filtra por revisar
 
 # Aplicar filtro de tipo
 if tipo_filter != 'Todos':
-    mask = mask & (df['tax_tipo'] == tipo_filter)
+    facet_filters['tax_tipo'] = [tipo_filter]
 
 # Aplicar filtro de grupo (apenas se coluna existir)
-if 'tax_grupo' in df.columns and grupo_filter != 'Todos':
-    mask = mask & (df['tax_grupo'] == grupo_filter)
+if 'tax_grupo' in facets and grupo_filter != 'Todos':
+    facet_filters['tax_grupo'] = [grupo_filter]
 
 # Aplicar filtro de apelido
 if apelido_filter != 'Todos':
-    mask = mask & (df['apelido_sugerido'] == apelido_filter)
+    facet_filters['apelido_sugerido'] = [apelido_filter]
+
+positions = facets.select(facet_filters)
 
-# Aplicar filtro de busca por texto (busca em AMBAS: original e normalizada)
+# Aplicar filtro de busca por texto (busca em AMBAS: original e normalizada),
+# sem acentos/maiúsculas, pelo índice de trigramas (montado na primeira busca)
 if search_text:
-    search_lower = search_text.lower()
-    mask_search = (
-        df['descricao_norm'].str.contains(search_lower, case=False, na=False) |
-        df['descricao'].str.contains(search_text, case=False, na=False)  # Busca também no original
-    )
-    mask = mask & mask_search
+    cached_index = st.session_state.get('review_search_index')
+    if cached_index is None or cached_index[0] != facets.source:
+        with st.spinner("Indexando descrições para a busca..."):
+            search_columns = [df[c] for c in ['descricao', 'descricao_norm'] if c in df.columns]
+            cached_index = (facets.source, TrigramIndex(search_columns))
+        st.session_state['review_search_index'] = cached_index
+    found = cached_index[1].search(search_text)
+    if found is not None:
+        positions = np.intersect1d(positions, found, assume_unique=True)
+
+mask = pd.Series(facets.mask(positions), index=df.index)
 
-df_view = df[mask].copy()
 
 # --- Configuração de Colunas Disponíveis (Mapeamento Interno -> Label) ---
 COL_LABELS = {
@@ -249,7 +371,18 @@ COL_LABELS = {
     "motivo": "Motivo",
     "codigo": "Código",
     "preco_unit": "Preço Unit.",
-    "preco_total": "Preço Total"
+    "preco_total": "Preço Total",
+    "fck_mpa": "fck (MPa)",
+    "dn_mm": "DN (mm)",
+    "bitola_mm": "Bitola (mm)",
+    "espessura_cm": "Espessura (cm)",
+    "traco": "Traço",
+    "classe_aco": "Aço",
+    "cluster_id": "Cluster",
+    "tipo_linha": "Tipo Linha",
+    "nivel": "Nível",
+    "capitulo": "Capítulo",
+    "subtotal_calculado": "Subtotal Calc."
 }
 
 # Defaults visíveis - mostrar original E normalizada
@@ -295,6 +428,18 @@ col_config = {
     "codigo": st.column_config.TextColumn("Código", disabled=True, width="small"),
     "preco_unit": st.column_config.NumberColumn("Preço Unit.", disabled=True, format="%.2f"),
     "preco_total": st.column_config.NumberColumn("Preço Total", disabled=True, format="%.2f"),
+    "fck_mpa": st.column_config.NumberColumn("fck (MPa)", disabled=True, width="small"),
+    "dn_mm": st.column_config.NumberColumn("DN (mm)", disabled=True, width="small"),
+    "bitola_mm": st.column_config.NumberColumn("Bitola (mm)", disabled=True, width="small", format="%.1f"),
+    "espessura_cm": st.column_config.NumberColumn("Espessura (cm)", disabled=True, width="small", format="%.1f"),
+    "traco": st.column_config.TextColumn("Traço", disabled=True, width="small"),
+    "classe_aco": st.column_config.TextColumn("Aço", disabled=True, width="small"),
+    "cluster_id": st.column_config.NumberColumn("Cluster", disabled=True, width="small", help="Descrições quase iguais compartilham o mesmo cluster"),
+    "tipo_linha": st.column_config.TextColumn("Tipo Linha", disabled=True, width="small", help="item, titulo ou subtotal (hierarquia do orçamento)"),
+    "nivel": st.column_config.NumberColumn("Nível", disabled=True, width="small"),
+    "capitulo": st.column_config.TextColumn("Capítulo", disabled=True),
+    "subtotal_calculado": st.column_config.NumberColumn("Subtotal Calc.", disabled=True, format="%.2f", help="Soma dos itens do título"),
+    "pai_linha": None,
     # Esconder colunas técnicas sempre
     "id_linha": None, "linha_origem": None, "aba_origem": None, 
     "alternativa": None, "score": None, "tax_desconhecido": None,
@@ -314,40 +459,141 @@ if show_similares:
 else:
     col_config["semelhantes"] = None
 
-st.caption("✏️ **Edite 'Apelido Desejado'** para sugerir novos apelidos. Marque itens para revisão. Baixe CSV para aprendizado.")
+# --- Paginação e Ordenação (no servidor) ---
+# A view filtrada/ordenada fica no servidor como um índice; só a página atual
+# (e só as colunas visíveis) vai para o navegador.
+if 'review_sort_index' not in st.session_state:
+    st.session_state['review_sort_index'] = SortIndex()
+sort_index = st.session_state['review_sort_index']
+
+# Edições ainda não salvas, por rótulo do df_working (sobrevivem à troca de página/filtro)
+if 'pending_edits' not in st.session_state:
+    st.session_state['pending_edits'] = {}
+pending_edits = st.session_state['pending_edits']
+
+# Modo agrupado: uma linha por (descricao_norm, unidade); a decisão vale para
+# todas as linhas do grupo (índice de grupos montado uma vez por df_working)
+grouped = st.toggle(
+    "Agrupar descrições iguais",
+    value=False,
+    disabled=not all(c in df.columns for c in GROUP_COLUMNS),
+    help="Mostra cada (descrição normalizada, unidade) uma vez, com o nº de linhas e o preço total; "
+         "Revisar e Apelido Desejado editados no grupo valem para todas as suas linhas."
+)
+if grouped:
+    group_index = st.session_state.get('review_groups')
+    if group_index is None or not group_index.matches(df):
+        group_index = GroupIndex(df)
+        st.session_state['review_groups'] = group_index
+
+GROUP_LABELS = {"linhas": "Linhas", "preco_total": "Preço Total", "descricao_norm": "Descrição (Normalizada)"}
+
+p1, p2, p3, p4 = st.columns([2, 1, 1, 1])
+if grouped:
+    sort_col = p1.selectbox("Ordenar grupos por", options=GROUP_SORTS, format_func=GROUP_LABELS.get)
+    descending = p2.toggle("Decrescente", value=sort_col != 'descricao_norm')
+else:
+    sort_options = [None] + [c for c in COL_LABELS if c in df.columns]
+    sort_col = p1.selectbox(
+        "Ordenar por",
+        options=sort_options,
+        format_func=lambda c: "Ordem original" if c is None else COL_LABELS[c]
+    )
+    descending = p2.toggle("Decrescente", value=False, disabled=sort_col is None)
+page_size = p3.selectbox("Linhas por página", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE))
+
+if grouped:
+    view_index = group_index.view_index(group_index.groups(positions), sort_col, ascending=not descending)
+else:
+    view_index = sort_index.view_index(df, mask.to_numpy(), sort_col, ascending=not descending)
+n_pages = max(1, -(-len(view_index) // page_size))
+if st.session_state.get('review_page', 1) > n_pages:
+    st.session_state['review_page'] = n_pages
+page = p4.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, value=1, key='review_page')
+page_index, page, n_pages = paginate(view_index, page, page_size)
+
+if grouped:
+    # Colunas do grupo: chave, sugestão/status do representante e campos editáveis
+    send_cols = ['revisar', 'descricao_norm', 'unidade', 'apelido_sugerido', 'status', 'apelido_desejado']
+    df_page = group_index.summary(df, page_index, send_cols)
+    col_config = {
+        **{c: col_config.get(c) for c in df_page.columns},
+        "descricao_norm": st.column_config.TextColumn("Descrição (Normalizada)", disabled=True, width="large"),
+        "unidade": st.column_config.TextColumn("Und", disabled=True, width="small"),
+        "apelido_sugerido": st.column_config.TextColumn("Sugestão", disabled=True),
+        "status": st.column_config.TextColumn("Status", disabled=True, width="small"),
+        "linhas": st.column_config.NumberColumn("Linhas", disabled=True, width="small", help="Linhas da planilha neste grupo"),
+        "preco_total": st.column_config.NumberColumn("Preço Total", disabled=True, format="%.2f", help="Soma do preço total das linhas do grupo"),
+    }
+    # Pendências do grupo: as da sua primeira linha (as edições de grupo vão para todas)
+    first_labels = df.index[group_index.first[page_index.to_numpy()]]
+    pending_rows = [(group, label) for group, label in zip(page_index, first_labels) if label in pending_edits]
+else:
+    send_cols = [c for c in df.columns if c in visible_cols or (c == 'semelhantes' and show_similares)]
+    df_page = df.loc[page_index, send_cols].copy()
+    pending_rows = [(label, label) for label in page_index.intersection(list(pending_edits))]
+
+# Edições pendentes aparecem na página como já feitas
+for row, label in pending_rows:
+    for col, value in pending_edits[label].items():
+        if col in df_page.columns:
+            df_page.at[row, col] = value
+
+shown = f"{len(page_index)} de {len(view_index)} " + ("grupos filtrados" if grouped else "linhas filtradas")
+st.caption(
+    f"✏️ **Edite 'Apelido Desejado'** para sugerir novos apelidos. Marque itens para revisão. Baixe CSV para aprendizado. "
+    f"Mostrando {shown}."
+)
 
-edited_df_view = st.data_editor(
-    df_view,
+def capture_edits(key, index, groups=None):
+    # edited_rows vem por posição na página; guardamos pelo rótulo original
+    # (no modo agrupado, a edição do grupo vai para todas as suas linhas)
+    changes = editor_changes_by_label(index, st.session_state[key]['edited_rows'])
+    if groups is not None:
+        changes = groups.expand(st.session_state['df_working'], changes)
+    for label, row_changes in changes.items():
+        st.session_state['pending_edits'].setdefault(label, {}).update(row_changes)
+
+# Key muda com a página exibida (e após salvar): posições do editor nunca
+# são reaproveitadas em outra view
+view_kind = 'grupos' if grouped else 'linhas'
+editor_key = f"editor_validation_{st.session_state.get('editor_generation', 0)}_{view_kind}_{hash((tuple(page_index), tuple(send_cols))) & 0xFFFFFFFF:x}"
+st.data_editor(
+    df_page,
     column_config=col_config,
     use_container_width=True,
     hide_index=True,
-    key="editor_validation" # Key fixa para não resetar em rerun parcial
+    key=editor_key,
+    on_change=capture_edits,
+    args=(editor_key, page_index, group_index if grouped else None)
 )
 
 # --- Sincronização de Edições ---
-# O st.data_editor retorna apenas as linhas que estavam visíveis (df_view) com as edições.
-# Precisamos atualizar o df principal (st.session_state['df_working']) com essas edições.
-# Usamos o index original que foi preservado no df_view.
-
-if st.button("💾 Salvar Alterações na Sessão"):
-    # Atualizar o DataFrame mestre com as edições do view
-    # Pandas update é eficiente com índices alinhados
-    st.session_state['df_working'].update(edited_df_view)
-    
-    # Atualizar status baseado na marcação de revisar
-    # Se marcou revisar=True, mudar status para 'revisar'
-    # Se desmarcou revisar=False e status era 'revisar', voltar para status original ou 'ok'
-    mask_marcado = st.session_state['df_working']['revisar'] == True
-    st.session_state['df_working'].loc[mask_marcado, 'status'] = 'revisar'
+# Só as linhas editadas são escritas no df principal (st.session_state['df_working'])
+# e só o status delas é recalculado; ordenações das colunas alteradas são refeitas.
+s1, s2, _ = st.columns([1, 1, 3])
+if s1.button("💾 Salvar Alterações na Sessão", disabled=not pending_edits):
+    summary = apply_changes(st.session_state['df_working'], pending_edits)
+    sort_index.invalidate(summary['colunas'])
+    facets.refresh_rows(st.session_state['df_working'], summary['rotulos'], summary['colunas'])
+    pending_edits.clear()
+    st.session_state['editor_generation'] = st.session_state.get('editor_generation', 0) + 1
+    bump_data_version(st.session_state)
     
-    # Se desmarcou e status é 'revisar', voltar para 'ok' (assumindo que estava ok antes)
-    mask_desmarcado = st.session_state['df_working']['revisar'] == False
-    mask_status_revisar = st.session_state['df_working']['status'] == 'revisar'
-    st.session_state['df_working'].loc[mask_desmarcado & mask_status_revisar, 'status'] = 'ok'
-    
-    st.success("Alterações salvas! Status atualizado automaticamente.")
+    st.success(
+        f"Alterações salvas! {summary['linhas']} linhas atualizadas, "
+        f"{summary['status_alterados']} status alterados automaticamente."
+    )
     st.rerun() # Refresh nas métricas
 
+if s2.button("↩️ Descartar Alterações", disabled=not pending_edits):
+    pending_edits.clear()
+    st.session_state['editor_generation'] = st.session_state.get('editor_generation', 0) + 1
+    st.rerun()
+
+if pending_edits:
+    st.caption(f"{len(pending_edits)} linhas com alterações não salvas.")
+
 # --- Exportação ---
 st.divider()
 st.subheader("Finalizar e Exportar")
@@ -358,50 +604,45 @@ c1, c2, c3, c4 = st.columns(4)
 if c1.button("Voltar"):
     st.switch_page("pages/3_Normalizar.py")
 
-# Botão Download Validado (Completo) - Ordenado pela ordem original
-df_export = st.session_state['df_working'].copy()
-if 'id_original' in df_export.columns:
-    df_export = df_export.sort_values('id_original')
+# Downloads gerados só no clique e guardados até a próxima edição salva
+# (data_version); a cópia rasa fixa os dados desta versão sem copiá-los.
+exports = get_export_cache(st.session_state)
+data_version = st.session_state.get(VERSION_KEY, 0)
+df_snapshot = st.session_state['df_working'].copy(deep=False)
+
+def csv_export(flag_col=None):
+    """Gerador do CSV (todas as linhas ou só as com flag_col marcada), na ordem original."""
+    def build():
+        rows = df_snapshot if flag_col is None else df_snapshot[df_snapshot[flag_col] == True]
+        return write_csv(in_original_order(rows))
+    return build
 
-csv_validado = df_export.to_csv(index=False).encode('utf-8')
+# Botão Download Validado (Completo) - Ordenado pela ordem original
 c2.download_button(
     label="📥 Baixar Completo",
-    data=csv_validado,
+    data=exports.deferred('completo', data_version, csv_export()),
     file_name="orcamento_validado.csv",
     mime="text/csv",
     help="Baixa todos os dados processados na ordem original da planilha."
 )
 
 # Botão Download Marcados para Revisar (Aprendizado)
-marcados_revisar_df = st.session_state['df_working'][
-    st.session_state['df_working']['revisar'] == True
-].copy()
-if 'id_original' in marcados_revisar_df.columns:
-    marcados_revisar_df = marcados_revisar_df.sort_values('id_original')
-
-csv_marcados = marcados_revisar_df.to_csv(index=False).encode('utf-8')
 c3.download_button(
     label="📥 Marcados Revisar",
-    data=csv_marcados,
+    data=exports.deferred('revisar', data_version, csv_export('revisar')),
     file_name="aprendizado_revisar.csv",
     mime="text/csv",
-    help=f"Baixa {len(marcados_revisar_df)} itens marcados para revisão → data/aprendizado/revisar/"
+    help=f"Baixa {facets.count('revisar', True)} itens marcados para revisão → data/aprendizado/revisar/"
 )
 
 # Botão Download Desconhecidos (Aprendizado)
-unknowns_df = st.session_state['df_working'][
-    st.session_state['df_working']['tax_desconhecido'] == True
-].copy()
-if 'id_original' in unknowns_df.columns:
-    unknowns_df = unknowns_df.sort_values('id_original')
-
-csv_unknowns = unknowns_df.to_csv(index=False).encode('utf-8')
+n_unknowns = facets.count('tax_desconhecido', True) if 'tax_desconhecido' in facets else 0
 c4.download_button(
     label="📥 Desconhecidos",
-    data=csv_unknowns,
+    data=exports.deferred('desconhecidos', data_version, csv_export('tax_desconhecido')),
     file_name="aprendizado_desconhecidos.csv",
     mime="text/csv",
-    help=f"Baixa {len(unknowns_df)} itens desconhecidos → data/aprendizado/desconhecidos/"
+    help=f"Baixa {n_unknowns} itens desconhecidos → data/aprendizado/desconhecidos/"
 )
 
 # Segunda linha - Botão de continuar
@@ -411,11 +652,9 @@ st.markdown("")  # Espaçamento
 # Salva unknowns na sessão antes de ir
 if st.button("Gerir Desconhecidos >", type="primary"):
     # Salvar estado final - ordenado pela ordem original
-    df_final = st.session_state['df_working'].copy()
-    if 'id_original' in df_final.columns:
-        df_final = df_final.sort_values('id_original')
+    df_final = in_original_order(st.session_state['df_working'])
     
-    st.session_state['csv_validated'] = df_final.to_csv(index=False)
+    store.put(STAGE_VALIDATED, df_final)
     
     # Gerar Unknowns
     # Consideramos unknown aquilo que ainda está marked as unknown OU não foi validado/preenchido
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import io
 import os
 import sys
 
@@ -8,24 +7,23 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from scripts.unknowns import aggregate_unknowns, save_unknowns_jsonl
+from scripts.session_store import get_session_store, STAGE_VALIDATED
+from scripts.exports import get_export_cache, write_csv, write_jsonl
 
 st.set_page_config(page_title="5. Desconhecidos", layout="wide")
 
 st.header("5. Gestão de Desconhecidos")
 st.markdown("Itens não identificados são oportunidades de aprendizado para a IA. Exporte-os para alimentar o ciclo de melhoria.")
 
-if 'csv_validated' not in st.session_state:
+store = get_session_store(st.session_state)
+if STAGE_VALIDATED not in store:
     st.error("Dados validados não encontrados. Volte para a página 4.")
     if st.button("Voltar"):
         st.switch_page("pages/4_Apelidar_Validar.py")
     st.stop()
 
 # --- Carregar Dados ---
-try:
-    df_final = pd.read_csv(io.StringIO(st.session_state['csv_validated']))
-except Exception as e:
-    st.error(f"Erro ao ler CSV da sessão: {e}")
-    st.stop()
+df_final = store.get(STAGE_VALIDATED)
     
 # --- Agregar Unknowns ---
 # Unknowns são aqueles onde tax_desconhecido=True (mesmo após validação humana, se o humano marcou que manteve desconhecido?)
@@ -65,25 +63,21 @@ if unique_unknowns > 0:
     
     b1, b2 = st.columns(2)
     
-    # Gerar JSONL em memória para download
-    jsonl_str = agg_df.to_dict(orient='records')
-    import json
-    jsonl_output = ""
-    for record in jsonl_str:
-        jsonl_output += json.dumps(record, ensure_ascii=False) + '\n'
-        
+    # Arquivos gerados só no clique, um por versão dos dados validados
+    exports = get_export_cache(st.session_state)
+    validated_version = store.version(STAGE_VALIDATED)
+    
     b1.download_button(
         "📥 Baixar JSONL (Treinamento IA)",
-        data=jsonl_output,
+        data=exports.deferred('unknowns_jsonl', validated_version, lambda: write_jsonl(agg_df)),
         file_name="unknowns_training.jsonl",
         mime="application/x-jsonlines"
     )
     
     # CSV Simples
-    csv_output = agg_df.to_csv(index=False).encode('utf-8')
     b2.download_button(
         "📥 Baixar Tabela Agregada (CSV)",
-        data=csv_output,
+        data=exports.deferred('unknowns_csv', validated_version, lambda: write_csv(agg_df)),
         file_name="unknowns_aggregated.csv",
         mime="text/csv"
     )
@@ -1,5 +1,10 @@
 import streamlit as st
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.session_store import get_session_store, STAGE_RAW, STAGE_VALIDATED
 
 st.set_page_config(
     page_title="ObraTaxonomia Home",
@@ -25,15 +30,16 @@ Este sistema guia você através de 5 etapas para processar, normalizar e classi
 """)
 
 # Mostrar estado atual da sessão para debug/acompanhamento
-if 'csv_raw' in st.session_state:
-    st.success("✅ CSV Bruto carregado")
+store = get_session_store(st.session_state)
+if STAGE_RAW in store:
+    st.success("✅ Tabela bruta carregada")
 else:
     st.warning("⚠️ Nenhum arquivo carregado")
 
 if 'colmap' in st.session_state:
     st.success("✅ Colunas mapeadas")
 
-if 'csv_validated' in st.session_state:
+if STAGE_VALIDATED in store:
     st.success("✅ Classificação validada")
 
 st.divider()
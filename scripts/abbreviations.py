@@ -0,0 +1,177 @@
+"""
+Módulo de Expansão de Abreviações
+
+Compila o dicionário YAML de abreviações (data/yaml/unidades/abreviacoes.yaml)
+numa trie de tokens e expande as abreviações de uma descrição numa única
+passada, sempre preferindo a sequência mais longa.
+
+Abreviações formadas só por letras soltas ("m. o.", "f. e a.") não entram
+na trie: sem a pontuação elas casariam com texto comum ("50 m, o mesmo").
+Elas são reconhecidas só na forma com pontos, no texto original, antes de
+a normalização remover a pontuação (expand_dotted).
+"""
+
+import os
+import re
+import json
+import yaml
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+from scripts.utils import normalize_text
+
+
+DEFAULT_ABBREVIATIONS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'data', 'yaml', 'unidades', 'abreviacoes.yaml'
+)
+
+# Chave reservada do nó que guarda a expansão (tokens nunca são vazios)
+_END = ''
+
+
+class AbbreviationTrie:
+    """Trie de tokens: sequência de tokens abreviados -> tokens expandidos."""
+
+    def __init__(self):
+        self.root: Dict = {}
+        self.size = 0
+        # Abreviações de letras soltas, só na forma com pontos
+        self.dotted: Dict[Tuple[str, ...], List[str]] = {}
+        self._dotted_re = None
+        # Hash do dicionário de origem (chave de cache da normalização)
+        self.fingerprint = ''
+
+    def add(self, abbreviation: Sequence[str], expansion: Sequence[str]):
+        """Registra uma abreviação (lista de tokens) e sua expansão."""
+        if not abbreviation:
+            return
+        node = self.root
+        for token in abbreviation:
+            node = node.setdefault(token, {})
+        if _END not in node:
+            self.size += 1
+        node[_END] = list(expansion)
+
+    def add_dotted(self, letters: Sequence[str], expansion: Sequence[str]):
+        """Registra uma abreviação de letras soltas ("m o" -> "m.o.")."""
+        self.dotted[tuple(letters)] = list(expansion)
+        self._dotted_re = None
+
+    def expand_dotted(self, text: str) -> Tuple[str, int]:
+        """
+        Expande as abreviações de letras soltas escritas com pontos, no texto
+        ainda com pontuação: juntas ("M.O", "f.e.a.") ou separadas por espaço
+        com ponto em todas as letras ("m. o."; "50 m. O mesmo" não casa).
+
+        Returns:
+            (texto, quantidade_de_expansoes)
+        """
+        if not self.dotted:
+            return text, 0
+        if self._dotted_re is None:
+            patterns = []
+            for letters in self.dotted:
+                escaped = [re.escape(letter) for letter in letters]
+                patterns.append(r'\.'.join(escaped) + r'\.?')
+                patterns.append(r'\.\s*'.join(escaped) + r'\.')
+            patterns.sort(key=len, reverse=True)
+            self._dotted_re = re.compile(r'(?<![^\W_])(?:' + '|'.join(patterns) + r')(?![^\W_])', re.IGNORECASE)
+
+        count = 0
+
+        def replace(match):
+            nonlocal count
+            letters = tuple(re.findall(r'[^\W\d_]', match.group(0).lower()))
+            expansion = self.dotted.get(letters)
+            if expansion is None:
+                return match.group(0)
+            count += 1
+            return ' '.join(expansion)
+
+        text = self._dotted_re.sub(replace, text)
+        return text, count
+
+    def expand(self, tokens: List[str]) -> Tuple[List[str], int]:
+        """
+        Expande abreviações numa lista de tokens (maior sequência vence).
+
+        Args:
+            tokens: Tokens da descrição
+
+        Returns:
+            (tokens_expandidos, quantidade_de_expansoes)
+        """
+        out = []
+        count = 0
+        i = 0
+        n = len(tokens)
+        root = self.root
+
+        while i < n:
+            node = root
+            j = i
+            match = None
+            while j < n:
+                node = node.get(tokens[j].lower())
+                if node is None:
+                    break
+                j += 1
+                if _END in node:
+                    match = (j, node[_END])
+
+            if match:
+                i, expansion = match
+                out.extend(expansion)
+                count += 1
+            else:
+                out.append(tokens[i])
+                i += 1
+
+        return out, count
+
+    def expand_text(self, text: str) -> Tuple[str, int]:
+        """Versão de expand() para texto separado por espaços."""
+        tokens, count = self.expand(text.split())
+        if not count:
+            return text, 0
+        return ' '.join(tokens), count
+
+
+def build_abbreviation_trie(abbreviations: Dict[str, List[str]]) -> AbbreviationTrie:
+    """
+    Compila o mapa {termo_expandido: [abreviações]} numa AbbreviationTrie.
+
+    Abreviações e expansões são normalizadas com normalize_text, o mesmo
+    formato de 'descricao_norm'. Abreviações de várias letras soltas vão para
+    a forma com pontos (add_dotted), não para a trie.
+    """
+    trie = AbbreviationTrie()
+    payload = json.dumps(abbreviations or {}, sort_keys=True, ensure_ascii=False, default=str)
+    trie.fingerprint = hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+    for expanded, abbrevs in (abbreviations or {}).items():
+        expansion = normalize_text(str(expanded)).split()
+        for abbrev in abbrevs or []:
+            tokens = normalize_text(str(abbrev)).split()
+            if len(tokens) > 1 and all(len(t) == 1 and t.isalpha() for t in tokens):
+                trie.add_dotted(tokens, expansion)
+            else:
+                trie.add(tokens, expansion)
+    return trie
+
+
+@lru_cache(maxsize=8)
+def load_abbreviations(path: str = DEFAULT_ABBREVIATIONS_PATH) -> AbbreviationTrie:
+    """
+    Carrega e compila o dicionário de abreviações (cacheado por caminho;
+    load_abbreviations.cache_clear() relê o arquivo).
+
+    Retorna uma trie vazia se o arquivo não existir.
+    """
+    if not os.path.exists(path):
+        return AbbreviationTrie()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+
+    return build_abbreviation_trie(data.get('abreviacoes', {}))
@@ -0,0 +1,78 @@
+"""
+Módulo de Extração de Atributos Técnicos
+
+Extrai atributos técnicos das descrições (fck, DN, bitola, espessura, traço,
+classe do aço) numa única passada vetorizada de regex, gerando colunas
+tipadas e compactas (float32 / categorical) para filtros e precificação.
+"""
+
+import re
+import pandas as pd
+
+
+_NUM = r'\d+(?:[.,]\d+)?'
+
+# Uma alternância com grupos nomeados: cada match preenche apenas o seu atributo
+ATTRIBUTE_PATTERN = re.compile('|'.join([
+    rf'\bfck\s*[=:]?\s*(?P<fck>{_NUM})',
+    rf'\bdn\s*[=:]?\s*(?P<dn>{_NUM})',
+    # 'bitola' sem unidade costuma ser bitola de chapa (gauge): exige unidade
+    rf'(?:ø|φ|\bbitola(?=\D{{0,4}}{_NUM}(?:/\d+)?\s*(?:mm|cm|pol\b|")))\s*(?:de\s+)?[=:]?\s*'
+    rf'(?P<bitola>{_NUM})(?:/(?P<bitola_den>\d+))?\s*(?P<bitola_un>mm|cm|pol\b|")?',
+    rf'(?:\be\s*=\s*|\besp(?:essura|\.)?\s*(?:de\s+)?[=:]?\s*)(?P<esp>{_NUM})\s*(?P<esp_un>mm|cm|m)\b',
+    rf'\bca\s*-?\s*(?P<ca>25|50|60)\b',
+    rf'(?P<traco>\b{_NUM}(?:\s*:\s*{_NUM}){{1,3}})\b',
+]))
+
+# Fatores de conversão para as unidades de saída
+_BITOLA_TO_MM = {'mm': 1.0, 'cm': 10.0, 'pol': 25.4, '"': 25.4}
+_ESPESSURA_TO_CM = {'mm': 0.1, 'cm': 1.0, 'm': 100.0}
+
+ATTRIBUTE_COLUMNS = ['fck_mpa', 'dn_mm', 'bitola_mm', 'espessura_cm', 'traco', 'classe_aco']
+
+
+def _to_float(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def extract_attributes(series: pd.Series) -> pd.DataFrame:
+    """
+    Extrai atributos técnicos de uma coluna de descrições.
+
+    Exemplos:
+        'Concreto fck30 bombeável'     → fck_mpa=30
+        'Tubo PVC DN100'               → dn_mm=100
+        'Armação CA-50 ø20mm'          → classe_aco='CA-50', bitola_mm=20
+        'Tubo ø 1/2"'                  → bitola_mm=12.7 (frações sem unidade = polegadas)
+        'Laje e=15cm'                  → espessura_cm=15
+        'Argamassa traço 1:3'          → traco='1:3'
+
+    Args:
+        series: Descrições originais (a pontuação ainda é usada pelos padrões)
+
+    Returns:
+        DataFrame com o mesmo índice e colunas ATTRIBUTE_COLUMNS
+        (float32 para medidas, category para traço e classe do aço)
+    """
+    # Índice posicional: groupby(level=0) não pode juntar rótulos repetidos
+    text = series.astype(str).str.lower().reset_index(drop=True)
+    matches = text.str.extractall(ATTRIBUTE_PATTERN)
+
+    # Primeiro valor não nulo de cada atributo por linha
+    first = matches.groupby(level=0).first().reindex(text.index).set_axis(series.index)
+
+    bitola_den = pd.to_numeric(first['bitola_den'], errors='coerce')
+    bitola_factor = first['bitola_un'].map(_BITOLA_TO_MM)
+    bitola_factor = bitola_factor.fillna(bitola_den.notna().map({True: 25.4, False: 1.0}))
+    espessura_factor = first['esp_un'].map(_ESPESSURA_TO_CM)
+    traco = first['traco'].str.replace(r'\s+', '', regex=True).str.replace(',', '.', regex=False)
+    classe_aco = 'CA-' + first['ca']
+
+    return pd.DataFrame({
+        'fck_mpa': _to_float(first['fck']).astype('float32'),
+        'dn_mm': _to_float(first['dn']).astype('float32'),
+        'bitola_mm': (_to_float(first['bitola']) / bitola_den.fillna(1.0) * bitola_factor).astype('float32'),
+        'espessura_cm': (_to_float(first['esp']) * espessura_factor).astype('float32'),
+        'traco': traco.astype('category'),
+        'classe_aco': classe_aco.astype('category'),
+    }, index=series.index)
@@ -0,0 +1,438 @@
+"""
+Ingestão em Lote de Pastas de Planilhas
+
+Processa uma pasta inteira (ex: data/excel, 10-50 planilhas de uma licitação)
+com o mesmo fluxo das telas do app, sem interação:
+
+    leitura (cache Parquet) → cabeçalho → mapeamento de colunas → números
+    pt-BR → hierarquia → normalização → classificação
+
+Cabeçalho, números e hierarquia dependem da aba inteira; normalização e
+classificação rodam em lotes de BATCH_ROWS linhas (normalize_batches →
+process_batches), com a memória intermediária limitada pelo lote.
+
+Cada arquivo é processado num worker de um pool de processos. O resultado
+de todas as abas vai para um único Parquet consolidado, com as colunas
+arquivo_origem e aba_origem; tempos e falhas por arquivo vão para um resumo
+JSON ao lado do Parquet.
+
+Mapeamentos salvos (--colmap) são um JSON no formato do colmap do app
+(campo -> coluna), por arquivo, por aba ou para todos:
+
+    {
+        "*": {"descricao": "Descrição", "unidade": "Und", "quantidade": "Qtd"},
+        "02_plan_rodovia_der.xlsx": {"header_row": 3, "colmap": {...}},
+        "04_plan_sinapi.xlsx::Composições": {...}
+    }
+
+Sem mapeamento salvo, o cabeçalho e as colunas são detectados
+automaticamente (header_utils).
+
+Arquivos sem nenhuma aba com as colunas obrigatórias ficam como 'ignorado'
+no resumo; o código de saída só é 1 quando algum arquivo falha ('erro').
+
+Uso:
+    python scripts/batch_ingest.py data/excel [-o saida.parquet] [-w 4] [--colmap mapas.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.header_utils import (
+    HEADER_KEYWORDS, detect_header, apply_header_row, column_mapping_for, header_matches, frame_to_grid
+)
+from scripts.numeric import NUMERIC_FIELDS, parse_numeric_columns
+from scripts.hierarchy import build_hierarchy
+from scripts.normalize import normalize_dataframe, normalize_batches, concat_batches
+from scripts.workbook_cache import read_workbook_cached, to_parquet_frame
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YAML_DIR = os.path.join(ROOT_DIR, 'data', 'yaml')
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'data', 'output')
+
+SUPPORTED_EXTENSIONS = ('.xls', '.xlsx', '.csv')
+
+# Linhas por lote na normalização e na classificação
+BATCH_ROWS = 20000
+
+MANDATORY_FIELDS = ['descricao', 'unidade', 'quantidade']
+OPTIONAL_FIELDS = ['codigo', 'preco_unit', 'preco_total']
+
+# Mesmos padrões da tela de normalização
+DEFAULT_NORMALIZE_CONFIG = {
+    'remove_accents': True,
+    'remove_punctuation': True,
+    'remove_stopwords': False,
+    'collapse_spaces': True,
+    'normalize_numbers': True,
+    'expand_abbreviations': True,
+    'extract_attributes': True,
+    'remove_empty_rows': True,
+    'remove_duplicates': False,
+    'cluster_near_duplicates': False,
+}
+
+
+def discover_files(directory: str, extensions=SUPPORTED_EXTENSIONS) -> List[str]:
+    """Planilhas da pasta (não recursivo), em ordem alfabética, ignorando vazias e temporárias (~$)."""
+    files = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.startswith('~$') or not os.path.isfile(path):
+            continue
+        if os.path.splitext(name)[1].lower() in extensions and os.path.getsize(path) > 0:
+            files.append(path)
+    return files
+
+
+def load_colmaps(path: Optional[str]) -> Dict[str, Dict]:
+    """
+    Lê o JSON de mapeamentos salvos.
+
+    Returns:
+        Dict chave -> {'header_row': int ou None, 'colmap': Dict[campo, coluna]},
+        com chave '*', '<arquivo>' ou '<arquivo>::<aba>'
+    """
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    colmaps = {}
+    for key, entry in raw.items():
+        if 'colmap' in entry:
+            colmaps[key] = {'header_row': entry.get('header_row'), 'colmap': dict(entry['colmap'])}
+        else:
+            colmaps[key] = {'header_row': None, 'colmap': dict(entry)}
+    return colmaps
+
+
+def _saved_mapping(colmaps: Dict[str, Dict], filename: str, sheet: str) -> Optional[Dict]:
+    """Mapeamento salvo mais específico: aba, depois arquivo, depois '*'."""
+    for key in (f"{filename}::{sheet}", filename, '*'):
+        if key in colmaps:
+            return colmaps[key]
+    return None
+
+
+def _auto_mapping(detection: Dict, columns: List[str]) -> Dict[str, str]:
+    """Mapeamento detectado, completado por palavra-chave como no auto-mapeamento da tela."""
+    mapping = column_mapping_for(detection, columns)
+    used = set(mapping.values())
+    for field in HEADER_KEYWORDS:
+        if field in mapping:
+            continue
+        for col in columns:
+            if col not in used and header_matches(col, field):
+                mapping[field] = col
+                used.add(col)
+                break
+    return mapping
+
+
+@lru_cache(maxsize=1)
+def _get_classifier(yaml_dir: str):
+    """Taxonomia carregada uma vez por processo worker."""
+    from scripts.builder import TaxonomyBuilder
+    from scripts.classify import ClassifierEngine
+
+    return ClassifierEngine(TaxonomyBuilder(yaml_dir).load_all())
+
+
+def process_sheet(
+    df: pd.DataFrame,
+    mapping: Optional[Dict],
+    config: Dict[str, bool],
+    classifier=None,
+    threshold: int = 8,
+    batch_rows: int = BATCH_ROWS
+) -> Dict:
+    """
+    Aplica o fluxo do app a uma aba.
+
+    Args:
+        df: Aba lida (cabeçalho na primeira linha, como read_workbook_cached devolve)
+        mapping: Mapeamento salvo ({'header_row', 'colmap'}) ou None para detectar
+        config: Configuração de normalize_dataframe
+        classifier: ClassifierEngine (None pula a classificação)
+        threshold: Score mínimo do classificador
+        batch_rows: Linhas por lote na normalização e classificação (com
+            remoção de duplicatas ou quase-duplicatas, a aba vai inteira)
+
+    Returns:
+        Dict com df (ou None se a aba foi pulada), header_row, colmap,
+        numeric (relatório de parse_numeric_columns) e motivo (se pulada)
+    """
+    grid = frame_to_grid(df)
+    detection = None
+    header_row = mapping.get('header_row') if mapping else None
+    if header_row is None:
+        detection = detect_header(grid)
+        header_row = detection['header_row_idx']
+
+    table = apply_header_row(grid, int(header_row))
+    columns = list(table.columns)
+    if mapping and mapping.get('colmap'):
+        colmap = {field: col for field, col in mapping['colmap'].items() if col in columns}
+    else:
+        colmap = _auto_mapping(detection or detect_header(grid), columns)
+
+    info = {'df': None, 'header_row': int(header_row), 'colmap': colmap, 'numeric': {}, 'motivo': None}
+    missing = [field for field in MANDATORY_FIELDS if field not in colmap]
+    if missing:
+        info['motivo'] = f"Colunas obrigatórias não encontradas: {', '.join(missing)}"
+        return info
+
+    # Mesma montagem do "Aplicar e Continuar" da tela de mapeamento
+    rename_map = {col: field for field, col in colmap.items()}
+    struct = table[list(rename_map)].rename(columns=rename_map)
+    struct['id_linha'] = range(1, len(struct) + 1)
+    for opt in OPTIONAL_FIELDS:
+        if opt not in struct.columns:
+            struct[opt] = None
+
+    struct, info['numeric'] = parse_numeric_columns(struct, [f for f in NUMERIC_FIELDS if f in colmap])
+    struct = build_hierarchy(struct)
+
+    if config.get('remove_duplicates') or config.get('cluster_near_duplicates'):
+        # Regras que comparam linhas da aba inteira
+        norm, _ = normalize_dataframe(struct, config, col_desc='descricao')
+        batches = iter([norm.reset_index(drop=True)])
+    else:
+        # Aba vazia ainda gera um lote (colunas da normalização)
+        slices = (struct.iloc[i:i + batch_rows] for i in range(0, max(len(struct), 1), batch_rows))
+        batches = (norm for norm, _ in normalize_batches(slices, config, col_desc='descricao'))
+    if classifier is not None:
+        batches = classifier.process_batches(batches, col_desc='descricao_norm', col_unit='unidade', threshold=threshold)
+
+    info['df'] = concat_batches(list(batches))
+    return info
+
+
+def ingest_file(
+    path: str,
+    colmaps: Optional[Dict[str, Dict]] = None,
+    config: Optional[Dict[str, bool]] = None,
+    classify: bool = True,
+    yaml_dir: str = YAML_DIR,
+    threshold: int = 8
+) -> Dict:
+    """
+    Processa todas as abas de um arquivo (executado no worker).
+
+    Returns:
+        Dict com arquivo, status ('ok', 'parcial', 'ignorado', 'erro'), segundos,
+        metodo, cached, linhas, abas (resumo por aba), erro e df
+        (abas processadas concatenadas, com arquivo_origem/aba_origem).
+        'ignorado': nenhuma aba tem as colunas obrigatórias (não é falha)
+    """
+    start = time.perf_counter()
+    filename = os.path.basename(path)
+    summary = {
+        'arquivo': filename, 'status': 'erro', 'segundos': 0.0, 'metodo': None,
+        'cached': False, 'linhas': 0, 'abas': [], 'erro': None, 'df': None,
+    }
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Um processo por arquivo: as abas são lidas em série dentro dele
+        result = read_workbook_cached(data, filename, max_workers=1)
+        summary['metodo'] = result['method']
+        summary['cached'] = result.get('cached', False)
+        if not result['success']:
+            raise ValueError(result['message'])
+
+        classifier = _get_classifier(yaml_dir) if classify else None
+        frames = []
+        for sheet, df in result['sheets'].items():
+            sheet_info = {
+                'aba': sheet, 'linhas': 0, 'header_row': None, 'colmap': {},
+                'falhas_numericas': {}, 'erro': None, 'ignorada': False
+            }
+            try:
+                processed = process_sheet(
+                    df, _saved_mapping(colmaps or {}, filename, sheet),
+                    config or DEFAULT_NORMALIZE_CONFIG, classifier, threshold
+                )
+                sheet_info.update(
+                    header_row=processed['header_row'],
+                    colmap=processed['colmap'],
+                    falhas_numericas={col: rep['falhas'] for col, rep in processed['numeric'].items() if rep['falhas']},
+                    erro=processed['motivo'],
+                    ignorada=processed['motivo'] is not None,
+                )
+                if processed['df'] is not None:
+                    out = processed['df']
+                    out.insert(0, 'aba_origem', sheet)
+                    out.insert(0, 'arquivo_origem', filename)
+                    sheet_info['linhas'] = len(out)
+                    frames.append(out)
+            except Exception as e:
+                sheet_info['erro'] = f"{type(e).__name__}: {e}"
+            summary['abas'].append(sheet_info)
+
+        if frames:
+            summary['df'] = pd.concat(frames, ignore_index=True)
+            summary['linhas'] = len(summary['df'])
+        skipped = [s for s in summary['abas'] if s['erro']]
+        if not frames and all(s['ignorada'] for s in summary['abas']):
+            # Sem aba utilizável (ex: planilha sem quantidade): pulado, não falhou
+            summary['status'] = 'ignorado'
+            summary['erro'] = 'Nenhuma aba com as colunas obrigatórias'
+        elif not frames:
+            summary['erro'] = 'Nenhuma aba processada'
+        else:
+            summary['status'] = 'parcial' if skipped else 'ok'
+    except Exception as e:
+        summary['erro'] = f"{type(e).__name__}: {e}"
+
+    summary['segundos'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def _get_ingest_pool(max_workers: int):
+    """Pool de processos ('forkserver' onde existe, como na leitura paralela de abas)."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        ctx.set_forkserver_preload(['pandas', 'scripts.batch_ingest'])
+    else:
+        ctx = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
+
+
+def ingest_directory(
+    directory: str,
+    output_path: Optional[str] = None,
+    colmap_path: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    config: Optional[Dict[str, bool]] = None,
+    classify: bool = True,
+    yaml_dir: str = YAML_DIR,
+    threshold: int = 8
+) -> Dict:
+    """
+    Processa todas as planilhas de uma pasta em paralelo e grava o Parquet
+    consolidado e o resumo JSON (<saida>.summary.json).
+
+    Args:
+        directory: Pasta com .xls/.xlsx/.csv
+        output_path: Parquet de saída (padrão: data/output/lote_<pasta>.parquet)
+        colmap_path: JSON de mapeamentos salvos (load_colmaps)
+        max_workers: Processos (padrão: núcleos, limitado ao número de arquivos; 1 = serial)
+        config: Configuração de normalização (padrão: DEFAULT_NORMALIZE_CONFIG)
+        classify: Rodar a classificação
+        yaml_dir: Taxonomia usada na classificação
+        threshold: Score mínimo do classificador
+
+    Returns:
+        Resumo: pasta, saida, resumo_path, arquivos, linhas, segundos e
+        a lista por arquivo (status, tempos, abas e erros)
+    """
+    start = time.perf_counter()
+    files = discover_files(directory)
+    colmaps = load_colmaps(colmap_path)
+    if output_path is None:
+        folder = os.path.basename(os.path.normpath(directory)) or 'pasta'
+        output_path = os.path.join(OUTPUT_DIR, f"lote_{folder}.parquet")
+
+    args = [(path, colmaps, config, classify, yaml_dir, threshold) for path in files]
+    workers = min(max_workers or os.cpu_count() or 1, len(files))
+    results = []
+    if workers < 2:
+        results = [ingest_file(*a) for a in args]
+    else:
+        with _get_ingest_pool(workers) as pool:
+            futures = [pool.submit(ingest_file, *a) for a in args]
+            for path, future in zip(files, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # Worker morto (ex: falta de memória): registra e segue
+                    results.append({
+                        'arquivo': os.path.basename(path), 'status': 'erro', 'segundos': 0.0,
+                        'metodo': None, 'cached': False, 'linhas': 0, 'abas': [],
+                        'erro': f"{type(e).__name__}: {e}", 'df': None,
+                    })
+
+    frames = [r.pop('df') for r in results]
+    frames = [df for df in frames if df is not None]
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if frames:
+        consolidated = pd.concat(frames, ignore_index=True)
+        to_parquet_frame(consolidated).to_parquet(output_path, index=False)
+        rows = len(consolidated)
+    else:
+        rows = 0
+
+    summary = {
+        'pasta': os.path.abspath(directory),
+        'saida': os.path.abspath(output_path) if frames else None,
+        'resumo_path': os.path.splitext(os.path.abspath(output_path))[0] + '.summary.json',
+        'arquivos': len(files),
+        'ok': sum(r['status'] == 'ok' for r in results),
+        'parcial': sum(r['status'] == 'parcial' for r in results),
+        'ignorado': sum(r['status'] == 'ignorado' for r in results),
+        'erro': sum(r['status'] == 'erro' for r in results),
+        'linhas': rows,
+        'workers': max(workers, 1),
+        'segundos': round(time.perf_counter() - start, 3),
+        'resultados': results,
+    }
+    with open(summary['resumo_path'], 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+    return summary
+
+
+def print_summary(summary: Dict):
+    """Tabela de tempos e falhas por arquivo no terminal."""
+    print(f"\n{'Arquivo':36s} {'Status':8s} {'Linhas':>8s} {'Tempo (s)':>10s}  Detalhe")
+    for r in summary['resultados']:
+        detail = r['erro'] or ''
+        skipped = [f"{s['aba']}: {s['erro']}" for s in r['abas'] if s['erro']]
+        if skipped:
+            detail = '; '.join(skipped)
+        if r.get('cached'):
+            detail = f"(cache) {detail}".strip()
+        print(f"{r['arquivo'][:36]:36s} {r['status']:8s} {r['linhas']:8d} {r['segundos']:10.2f}  {detail[:120]}")
+
+    print(
+        f"\n{summary['arquivos']} arquivos ({summary['ok']} ok, {summary['parcial']} parcial, "
+        f"{summary['ignorado']} ignorado, {summary['erro']} erro), {summary['linhas']} linhas em {summary['segundos']:.1f}s "
+        f"com {summary['workers']} worker(s)"
+    )
+    if summary['saida']:
+        print(f"Parquet: {summary['saida']}")
+    print(f"Resumo:  {summary['resumo_path']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingestão em lote de uma pasta de planilhas")
+    parser.add_argument('pasta', help="Pasta com .xls/.xlsx/.csv (ex: data/excel)")
+    parser.add_argument('-o', '--output', help="Parquet de saída (padrão: data/output/lote_<pasta>.parquet)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Processos (padrão: núcleos; 1 = serial)")
+    parser.add_argument('--colmap', help="JSON com mapeamentos de colunas salvos")
+    parser.add_argument('--sem-classificar', action='store_true', help="Só normalizar, sem classificar")
+    parser.add_argument('--threshold', type=int, default=8, help="Score mínimo do classificador")
+    opts = parser.parse_args()
+
+    result = ingest_directory(
+        opts.pasta, opts.output, opts.colmap, opts.workers,
+        classify=not opts.sem_classificar, threshold=opts.threshold
+    )
+    print_summary(result)
+    sys.exit(0 if result['erro'] == 0 else 1)
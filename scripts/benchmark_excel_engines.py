@@ -0,0 +1,42 @@
+"""
+Benchmark das engines de leitura de Excel sobre as planilhas de data/excel.
+
+Ranqueia as engines disponíveis por vazão (linhas/s) para cada extensão e
+salva o ranking em data/output/excel_engine_ranking.json. A partir daí a
+leitura (read_excel_sheets_all_methods / convert_xlsx_to_csv_all_methods)
+tenta primeiro a engine mais rápida para o tipo do arquivo.
+
+Uso:
+    python scripts/benchmark_excel_engines.py [diretorio] [repeticoes]
+"""
+import os
+import sys
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.utils import probe_excel_engines, benchmark_excel_engines, ENGINE_RANKING_PATH
+
+
+if __name__ == '__main__':
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fixtures_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, 'data', 'excel')
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    print("=" * 60)
+    print("ENGINES DISPONÍVEIS")
+    print("=" * 60)
+    for engine, ok in probe_excel_engines().items():
+        print(f"{'[OK]' if ok else '[--]'} {engine}")
+
+    ranking = benchmark_excel_engines(fixtures_dir, repeat=repeat)
+
+    for ext, results in sorted(ranking.items()):
+        print("\n" + "=" * 60)
+        print(f"RANKING {ext}")
+        print("=" * 60)
+        for pos, r in enumerate(results, 1):
+            status = f"{r['failures']} falha(s)" if r['failures'] else ""
+            print(f"{pos}. {r['method']:10s} {r['rows_per_sec']:>12,.0f} linhas/s  ({r['rows']} linhas em {r['seconds']:.3f}s) {status}")
+
+    print(f"\nRanking salvo em: {ENGINE_RANKING_PATH}")
@@ -0,0 +1,99 @@
+"""
+Benchmark de normalize_text: implementação atual vs. implementação original
+(NFKD + encode/decode + dois re.sub por chamada).
+
+Também verifica que as duas produzem exatamente a mesma saída.
+
+Uso:
+    python scripts/benchmark_normalize.py [repeticoes]
+"""
+import os
+import re
+import sys
+import time
+import unicodedata
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.utils import normalize_text, _normalize_str
+
+
+def normalize_text_legacy(text):
+    """Implementação original de normalize_text (referência)."""
+    if not isinstance(text, str):
+        return str(text).lower() if text is not None else ""
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+SAMPLES = [
+    'Concreto fck30 bombeável',
+    'Armação CA-50 ø20mm',
+    'Argamassa traço 1:3',
+    'Cimento Portland CP-II',
+    'Tubo DN100 PVC',
+    'ESCAVAÇÃO MECÂNICA DE VALA EM MATERIAL DE 1ª CATEGORIA',
+    'Fornecimento e assentamento de tubo PEAD Ø 200 mm',
+    'Lançamento de concreto em m³',
+    'Demolição de alvenaria de tijolo maciço',
+    'concreto usinado fck 25 mpa',
+    'reaterro compactado com solo de 2º categoria',
+    'Pavimentação asfáltica - CBUQ e=5cm',
+]
+
+
+def _build_corpus(n_unique: int, repeats: int):
+    # Mistura de textos únicos (com sufixo numérico) e repetidos, como num orçamento
+    unique = [f"{SAMPLES[i % len(SAMPLES)]} item {i}" for i in range(n_unique)]
+    return unique * repeats
+
+
+def _time_it(func, corpus):
+    start = time.perf_counter()
+    for text in corpus:
+        func(text)
+    return time.perf_counter() - start
+
+
+def run_benchmark(repeats: int = 10, n_unique: int = 5000):
+    corpus = _build_corpus(n_unique, repeats)
+    already_normalized = [normalize_text_legacy(t) for t in corpus]
+
+    # Verificação de equivalência
+    mismatches = [t for t in set(corpus) | set(SAMPLES) if normalize_text(t) != normalize_text_legacy(t)]
+
+    print("=" * 60)
+    print("BENCHMARK normalize_text")
+    print("=" * 60)
+    print(f"Textos: {len(corpus)} ({n_unique} únicos x {repeats})")
+    print(f"Divergências: {len(mismatches)}")
+    for t in mismatches[:10]:
+        print(f"  [X] {t!r}: {normalize_text(t)!r} != {normalize_text_legacy(t)!r}")
+
+    results = []
+    _normalize_str.cache_clear()
+    results.append(('original', 'bruto', _time_it(normalize_text_legacy, corpus)))
+    results.append(('atual (cache frio)', 'bruto', _time_it(normalize_text, corpus)))
+    results.append(('atual (cache quente)', 'bruto', _time_it(normalize_text, corpus)))
+    results.append(('original', 'ja normalizado', _time_it(normalize_text_legacy, already_normalized)))
+    _normalize_str.cache_clear()
+    results.append(('atual (cache frio)', 'ja normalizado', _time_it(normalize_text, already_normalized)))
+
+    base = {entrada: t for nome, entrada, t in results if nome == 'original'}
+    print()
+    print(f"{'Implementação':22s} {'Entrada':16s} {'Tempo (s)':>10s} {'us/texto':>9s} {'Speedup':>8s}")
+    for nome, entrada, t in results:
+        print(f"{nome:22s} {entrada:16s} {t:10.4f} {t / len(corpus) * 1e6:9.2f} {base[entrada] / t:7.1f}x")
+
+    return results, mismatches
+
+
+if __name__ == '__main__':
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    _, diffs = run_benchmark(repeats=reps)
+    if diffs:
+        sys.exit(1)
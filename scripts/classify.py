@@ -1,5 +1,58 @@
+import numpy as np
 import pandas as pd
 from scripts.utils import normalize_text
+from scripts.normalize import tokenize_descriptions
+from scripts.hierarchy import is_structure_row
+
+# Resultado fixo das linhas de título/subtotal: não são itens e não são classificadas
+STRUCTURE_RESULT = {
+    'apelido_sugerido': None,
+    'alternativa': None,
+    'score': 0,
+    'status': 'estrutura',
+    'motivo': 'Título/subtotal',
+    'semelhantes': '[]',
+    'tax_tipo': None,
+    'tax_desconhecido': False,
+    'unidade_sugerida': None
+}
+
+
+def _pair_codes(df, col_desc, col_unit):
+    """
+    Código do par (descrição tokenizada, unidade) de cada linha.
+    
+    As descrições são tokenizadas uma única vez (tokenize_descriptions) e as
+    unidades fatoradas; títulos e subtotais (tipo_linha da hierarquia)
+    compartilham um código que não é classificado.
+    
+    Returns:
+        (código do par por linha, lista de pares únicos (descrição, unidade),
+        com None no lugar do par das linhas de estrutura)
+    """
+    n_rows = len(df)
+    if col_desc in df.columns:
+        desc_codes, desc_tokens = tokenize_descriptions(df[col_desc])
+    else:
+        desc_codes, desc_tokens = np.zeros(n_rows, dtype=np.int32), [""]
+    
+    if col_unit in df.columns:
+        unit_codes, unit_uniques = pd.factorize(df[col_unit], use_na_sentinel=False)
+    else:
+        unit_codes, unit_uniques = np.zeros(n_rows, dtype=np.intp), [""]
+    
+    pair_keys = desc_codes.astype(np.int64) * len(unit_uniques) + unit_codes
+    structure = is_structure_row(df)
+    if structure is not None:
+        pair_keys = np.where(structure, -1, pair_keys)
+    pair_codes, pair_uniques = pd.factorize(pair_keys)
+    
+    pairs = [
+        None if key < 0 else (desc_tokens[key // len(unit_uniques)], str(unit_uniques[key % len(unit_uniques)]))
+        for key in pair_uniques
+    ]
+    return pair_codes, pairs
+
 
 class ClassifierEngine:
     def __init__(self, builder):
@@ -7,13 +60,16 @@ class ClassifierEngine:
         self.rules = builder.rules_cache
         self.units_map = builder.units_map
         
-    def classify_row(self, description, unit):
+    def classify_row(self, description, unit, normalized=False):
         """
         Classifica uma única linha (descrição + unidade).
         Retorna (tax_apelido, tax_tipo, tax_desconhecido, score)
+        
+        Se normalized=True, a descrição já está tokenizada (saída de
+        tokenize_descriptions) e não é normalizada de novo.
         """
         # 1. Normalização
-        desc_norm = normalize_text(description)
+        desc_norm = description if normalized else normalize_text(description)
         
         # Normalização de unidade usando o mapa carregado
         unit_raw_norm = normalize_text(unit)
@@ -77,63 +133,104 @@ class ClassifierEngine:
     def process_dataframe(self, df, col_desc='descricao', col_unit='unidade', threshold=8):
         """
         Processa um DataFrame inteiro.
+        
+        As descrições são tokenizadas uma única vez (tokenize_descriptions) e cada
+        par único (descrição, unidade) é classificado uma única vez; o resultado
+        é replicado para as linhas repetidas. Linhas de título/subtotal
+        (tipo_linha != 'item') recebem status 'estrutura' sem classificação.
         """
-        results = []
-        for index, row in df.iterrows():
-            desc = str(row[col_desc]) if col_desc in df.columns else ""
-            unit = str(row[col_unit]) if col_unit in df.columns else ""
-            
-            # 1. Tentativa de Match Exato (Strict)
-            apelido, tipo, desconhecido, score = self.classify_row(desc, unit)
-            incerto = False
-            alternativa = None
-            motivo = "Match exato" if not desconhecido else "Sem match"
-            status = "ok"
-            matches_similares = []
+        pair_codes, pairs = _pair_codes(df, col_desc, col_unit)
+        results = [
+            STRUCTURE_RESULT if pair is None else self._classify_pair(pair[0], pair[1], threshold)
+            for pair in pairs
+        ]
+        
+        return pd.DataFrame(results).take(pair_codes).reset_index(drop=True)
+    
+    def _classify_pair(self, desc, unit, threshold):
+        """Classifica um par (descrição tokenizada, unidade) e monta a linha de resultado."""
+        # 1. Tentativa de Match Exato (Strict)
+        apelido, tipo, desconhecido, score = self.classify_row(desc, unit, normalized=True)
+        incerto = False
+        alternativa = None
+        motivo = "Match exato" if not desconhecido else "Sem match"
+        status = "ok"
+        matches_similares = []
 
-            # 2. Tentativa de Fuzzy Match (se falhou exato)
-            if desconhecido:
-                matches = self.get_similar_matches(desc, unit, top_n=3)
-                if matches and matches[0]['score'] >= threshold:
-                    # Encontrou um candidato bom (Incerto/Sugestão)
-                    best = matches[0]
-                    apelido = best['apelido']
-                    tipo = best['tipo']
-                    desconhecido = False # Não é totalmente desconhecido, é incerto/sugerido
-                    incerto = True
-                    score = best['score']
-                    status = "revisar"
-                    motivo = "Similaridade"
-                    
-                    if len(matches) > 1:
-                        alternativa = matches[1]['apelido']
-                    
-                    matches_similares = [m['apelido'] for m in matches]
-                else:
-                    # Realmente desconhecido
-                    score = matches[0]['score'] if matches else 0
-                    status = "desconhecido"
-                    motivo = "Score baixo ou unidade inv."
-            
-            # Definição do apelido final sugerido
-            # Se for desconhecido, apelido é None ou vazio, para forçar usuário a preencher
-            apelido_sugerido = apelido if apelido else None
+        # 2. Tentativa de Fuzzy Match (se falhou exato)
+        if desconhecido:
+            matches = self.get_similar_matches(desc, unit, top_n=3, normalized=True)
+            if matches and matches[0]['score'] >= threshold:
+                # Encontrou um candidato bom (Incerto/Sugestão)
+                best = matches[0]
+                apelido = best['apelido']
+                tipo = best['tipo']
+                desconhecido = False # Não é totalmente desconhecido, é incerto/sugerido
+                incerto = True
+                score = best['score']
+                status = "revisar"
+                motivo = "Similaridade"
+                
+                if len(matches) > 1:
+                    alternativa = matches[1]['apelido']
+                
+                matches_similares = [m['apelido'] for m in matches]
+            else:
+                # Realmente desconhecido
+                score = matches[0]['score'] if matches else 0
+                status = "desconhecido"
+                motivo = "Score baixo ou unidade inv."
+        
+        # Definição do apelido final sugerido
+        # Se for desconhecido, apelido é None ou vazio, para forçar usuário a preencher
+        apelido_sugerido = apelido if apelido else None
 
-            results.append({
-                'apelido_sugerido': apelido_sugerido,
-                'alternativa': alternativa,
-                'score': score,
-                'status': status,
-                'motivo': motivo,
-                'semelhantes': str(matches_similares), # Flatten para simples visualização
-                'tax_tipo': tipo,
-                'tax_desconhecido': desconhecido, # Manter legado por enquanto se necessário
-                'unidade_sugerida': unit # Por enquanto assume a unidade original se validou? Ou pega da regra?
-            })
+        return {
+            'apelido_sugerido': apelido_sugerido,
+            'alternativa': alternativa,
+            'score': score,
+            'status': status,
+            'motivo': motivo,
+            'semelhantes': str(matches_similares), # Flatten para simples visualização
+            'tax_tipo': tipo,
+            'tax_desconhecido': desconhecido, # Manter legado por enquanto se necessário
+            'unidade_sugerida': unit # Por enquanto assume a unidade original se validou? Ou pega da regra?
+        }
+    
+    def process_batches(self, batches, col_desc='descricao', col_unit='unidade', threshold=8, cache_size=100000, cache=None):
+        """
+        Versão em streaming de process_dataframe: classifica lote a lote
+        (ex: saída de normalize_batches) e devolve cada lote com as colunas
+        de classificação anexadas.
+        
+        Os resultados por par (descrição, unidade) ficam num cache entre lotes,
+        limitado a cache_size pares para manter a memória constante. Um dict
+        passado em cache é usado e preenchido (ex: para reaproveitar os pares
+        de uma amostra já classificada na classificação completa).
+        """
+        if cache is None:
+            cache = {}
+        
+        for batch in batches:
+            pair_codes, pairs = _pair_codes(batch, col_desc, col_unit)
+            
+            if len(cache) > cache_size:
+                cache.clear()
+            
+            results = []
+            for pair in pairs:
+                if pair is None:
+                    results.append(STRUCTURE_RESULT)
+                    continue
+                if pair not in cache:
+                    cache[pair] = self._classify_pair(pair[0], pair[1], threshold)
+                results.append(cache[pair])
             
-        return pd.DataFrame(results)
+            result_df = pd.DataFrame(results).take(pair_codes)
+            result_df.index = batch.index
+            yield pd.concat([batch, result_df], axis=1)
     
-    def get_similar_matches(self, description, unit, top_n=5):
+    def get_similar_matches(self, description, unit, top_n=5, normalized=False):
         """
         Retorna os N apelidos mais similares para uma descrição.
         Útil para sugestões quando não há match exato.
@@ -142,11 +239,12 @@ class ClassifierEngine:
             description: Descrição do item
             unit: Unidade do item
             top_n: Número de sugestões a retornar
+            normalized: Se True, a descrição já está tokenizada
             
         Returns:
             List[Dict]: Lista de dicionários com apelido, tipo e score
         """
-        desc_norm = normalize_text(description)
+        desc_norm = description if normalized else normalize_text(description)
         unit_norm = normalize_text(unit)
         
         scores = []
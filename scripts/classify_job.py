@@ -0,0 +1,270 @@
+"""
+Módulo de Classificação em Segundo Plano
+
+Roda ClassifierEngine.process_batches fora da thread do script do
+Streamlit, lote a lote, para que a página 4 continue respondendo enquanto
+uma planilha grande é classificada:
+
+- progresso por lote (linhas, lotes, contagem por status, tempo restante);
+- resultados parciais disponíveis a cada lote concluído;
+- cancelamento entre lotes (o lote em andamento termina e é mantido).
+
+Antes do job, classify_sample classifica uma amostra estratificada (por aba
+e unidade) e estima as taxas de ok/revisar/desconhecido com intervalo de
+confiança; os pares já classificados na amostra são reaproveitados pelo job.
+
+Os jobs rodam num pool de threads do processo: o classificador (regras e
+índices da taxonomia) já está em memória via st.cache_resource e seria
+copiado inteiro para cada processo de um pool de processos.
+"""
+
+import time
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Hashable, List, Optional
+
+from scripts.hierarchy import is_structure_row
+from scripts.sampling import stratified_sample, estimate_proportions, DEFAULT_SAMPLE_SIZE
+
+
+# Linhas por lote (uma atualização de progresso por lote)
+CHUNK_SIZE = 5000
+
+# Jobs simultâneos no processo (sessões diferentes)
+MAX_JOBS = 2
+
+STATE_RUNNING = 'executando'
+STATE_DONE = 'concluido'
+STATE_CANCELLED = 'cancelado'
+STATE_FAILED = 'erro'
+
+# Estratos da amostra de prévia e status estimados nela
+SAMPLE_STRATA = ['aba_origem', 'unidade']
+PREVIEW_STATUSES = ['ok', 'revisar', 'desconhecido']
+
+
+@lru_cache(maxsize=1)
+def _get_job_pool() -> ThreadPoolExecutor:
+    """Pool de threads compartilhado pelos jobs de classificação."""
+    return ThreadPoolExecutor(max_workers=MAX_JOBS, thread_name_prefix='classify')
+
+
+class ClassificationJob:
+    """Classificação de um DataFrame em lotes, com progresso e cancelamento."""
+
+    def __init__(
+        self,
+        classifier,
+        df: pd.DataFrame,
+        key: Hashable = None,
+        col_desc: str = 'descricao_norm',
+        col_unit: str = 'unidade',
+        threshold: int = 8,
+        chunk_size: int = CHUNK_SIZE,
+        cache: Optional[dict] = None
+    ):
+        """
+        Args:
+            classifier: ClassifierEngine já carregado
+            df: Dados normalizados (só as colunas usadas na classificação são guardadas)
+            key: Identificação da entrada (ex: chave do cache de etapas), para a
+                página saber se o job corresponde aos dados atuais
+            col_desc: Coluna de descrição
+            col_unit: Coluna de unidade
+            threshold: Score mínimo da sugestão por similaridade
+            chunk_size: Linhas por lote
+            cache: Resultados por par (descrição, unidade) já conhecidos (ver
+                classify_sample); é copiado, o original não muda
+        """
+        columns = [c for c in (col_desc, col_unit, 'tipo_linha') if c in df.columns]
+        self.classifier = classifier
+        self.key = key
+        self.source = df[columns].reset_index(drop=True)
+        self.col_desc = col_desc
+        self.col_unit = col_unit
+        self.threshold = threshold
+        self.chunk_size = max(int(chunk_size), 1)
+        self.cache = dict(cache) if cache else {}
+
+        self.total = len(self.source)
+        self.chunks_total = -(-self.total // self.chunk_size)
+        self.chunks_done = 0
+        self.rows_done = 0
+        self.status_counts: Dict[str, int] = {}
+        self.state = STATE_RUNNING
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.ended: Optional[float] = None
+        self.future = None
+
+        self._parts = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def _run(self):
+        self.started = time.monotonic()
+        if self._cancel.is_set():
+            # Cancelado enquanto esperava vaga no pool
+            self.state = STATE_CANCELLED
+            self.ended = self.started
+            return
+
+        batches = (
+            self.source.iloc[start:start + self.chunk_size]
+            for start in range(0, self.total, self.chunk_size)
+        )
+        try:
+            results = self.classifier.process_batches(
+                batches, col_desc=self.col_desc, col_unit=self.col_unit, threshold=self.threshold,
+                cache=self.cache
+            )
+            for batch in results:
+                part = batch.drop(columns=self.source.columns)
+                counts = part['status'].value_counts() if 'status' in part.columns else {}
+                with self._lock:
+                    self._parts.append(part)
+                    self.rows_done += len(part)
+                    self.chunks_done += 1
+                    for status, n in counts.items():
+                        self.status_counts[status] = self.status_counts.get(status, 0) + int(n)
+                if self._cancel.is_set() and self.rows_done < self.total:
+                    self.state = STATE_CANCELLED
+                    return
+            self.state = STATE_DONE
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = STATE_FAILED
+        finally:
+            self.ended = time.monotonic()
+
+    def cancel(self):
+        """Pede o cancelamento; o job para ao fim do lote em andamento."""
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self.state == STATE_RUNNING
+
+    @property
+    def progress(self) -> float:
+        """Fração das linhas já classificadas (0 a 1)."""
+        return self.rows_done / self.total if self.total else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos desde o início da execução (0 enquanto espera no pool)."""
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.monotonic()) - self.started
+
+    def eta(self) -> Optional[float]:
+        """Segundos estimados até o fim (None antes do primeiro lote)."""
+        if not self.rows_done or not self.running:
+            return None
+        return self.elapsed / self.rows_done * (self.total - self.rows_done)
+
+    def partial(self, last: Optional[int] = None) -> pd.DataFrame:
+        """
+        Linhas já classificadas: colunas de entrada + colunas de classificação,
+        com o índice posicional da entrada.
+
+        Args:
+            last: Se informado, só as últimas N linhas classificadas
+        """
+        with self._lock:
+            parts = list(self._parts)
+        if not parts:
+            return self.source.iloc[:0]
+        if last is not None:
+            kept, n = [], 0
+            for part in reversed(parts):
+                kept.append(part)
+                n += len(part)
+                if n >= last:
+                    break
+            parts = kept[::-1]
+        result = pd.concat(parts)
+        if last is not None:
+            result = result.iloc[-last:]
+        return pd.concat([self.source.loc[result.index], result], axis=1)
+
+    def result(self) -> pd.DataFrame:
+        """Colunas de classificação de todas as linhas (mesmo formato de process_dataframe)."""
+        if self.state != STATE_DONE:
+            raise RuntimeError(f"Classificação não concluída (estado: {self.state})")
+        with self._lock:
+            parts = list(self._parts)
+        if not parts:
+            return self.classifier.process_dataframe(self.source, col_desc=self.col_desc, col_unit=self.col_unit)
+        return pd.concat(parts).reset_index(drop=True)
+
+
+def classify_sample(
+    classifier,
+    df: pd.DataFrame,
+    col_desc: str = 'descricao_norm',
+    col_unit: str = 'unidade',
+    threshold: int = 8,
+    size: int = DEFAULT_SAMPLE_SIZE,
+    strata: List[str] = SAMPLE_STRATA
+) -> Dict:
+    """
+    Classifica uma amostra estratificada dos itens (títulos e subtotais ficam
+    de fora) e estima a taxa de cada status na tabela inteira.
+
+    Args:
+        classifier: ClassifierEngine já carregado
+        df: Dados normalizados
+        col_desc: Coluna de descrição
+        col_unit: Coluna de unidade
+        threshold: Score mínimo da sugestão por similaridade
+        size: Tamanho aproximado da amostra
+        strata: Colunas dos estratos (as ausentes são ignoradas)
+
+    Returns:
+        Dict com amostra (linhas sorteadas), itens (linhas elegíveis),
+        estimativas ({status: {p, inferior, superior, amostra}}), segundos e
+        cache (resultados por par, para o ClassificationJob)
+    """
+    started = time.monotonic()
+    structure = is_structure_row(df)
+    positions, strata_codes = stratified_sample(
+        df, strata, size, eligible=None if structure is None else ~structure
+    )
+
+    cache = {}
+    columns = [c for c in (col_desc, col_unit, 'tipo_linha') if c in df.columns]
+    sample = df[columns].iloc[positions]
+    classified = next(
+        classifier.process_batches([sample], col_desc=col_desc, col_unit=col_unit, threshold=threshold, cache=cache),
+        None
+    ) if len(sample) else None
+    statuses = classified['status'] if classified is not None and 'status' in classified.columns else pd.Series([], dtype=object)
+
+    return {
+        'amostra': len(positions),
+        'itens': int((strata_codes >= 0).sum()),
+        'estimativas': estimate_proportions(statuses, strata_codes[positions], strata_codes, PREVIEW_STATUSES),
+        'segundos': time.monotonic() - started,
+        'cache': cache,
+    }
+
+
+def submit_classification(classifier, df: pd.DataFrame, key: Hashable = None, **kwargs) -> ClassificationJob:
+    """
+    Cria um ClassificationJob e o coloca no pool de threads.
+
+    Args:
+        classifier: ClassifierEngine já carregado
+        df: Dados normalizados
+        key: Identificação da entrada (ver ClassificationJob)
+        **kwargs: col_desc, col_unit, threshold, chunk_size, cache
+
+    Returns:
+        Job em execução (consultar progress/state; cancel() para interromper)
+    """
+    job = ClassificationJob(classifier, df, key=key, **kwargs)
+    job.future = _get_job_pool().submit(job._run)
+    return job
@@ -0,0 +1,104 @@
+"""
+Módulo de Exportação
+
+Gera os arquivos de download do app (CSV e JSONL) só quando o usuário
+clica, em vez de serializar a tabela inteira a cada rerun:
+
+- write_csv / write_jsonl escrevem lote a lote num buffer binário, sem
+  montar o texto inteiro em memória antes de codificar;
+- ExportCache guarda o último arquivo gerado de cada download junto com a
+  versão dos dados que o originou; enquanto a versão não muda (nenhuma
+  edição salva), cliques repetidos reaproveitam o arquivo.
+
+Os downloads usam o modo diferido do st.download_button (data=função): a
+função roda na thread do servidor no momento do clique, por isso o cache
+tem trava.
+"""
+
+import io
+import json
+import threading
+import pandas as pd
+from typing import Callable, Dict, Hashable, Tuple
+
+
+# Linhas serializadas por vez
+EXPORT_CHUNK_ROWS = 50000
+
+SESSION_KEY = 'export_cache'
+VERSION_KEY = 'data_version'
+
+
+def write_csv(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> bytes:
+    """CSV (UTF-8, sem índice) idêntico ao de df.to_csv, escrito em lotes."""
+    buffer = io.BytesIO()
+    if df.empty:
+        df.to_csv(buffer, index=False, encoding='utf-8')
+    for start in range(0, len(df), chunk_rows):
+        df.iloc[start:start + chunk_rows].to_csv(buffer, index=False, header=start == 0, encoding='utf-8')
+    return buffer.getvalue()
+
+
+def write_jsonl(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> bytes:
+    """Um objeto JSON por linha (json.dumps, acentos preservados), escrito em lotes."""
+    buffer = io.BytesIO()
+    for start in range(0, len(df), chunk_rows):
+        records = df.iloc[start:start + chunk_rows].to_dict(orient='records')
+        buffer.write("".join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8'))
+    return buffer.getvalue()
+
+
+def in_original_order(df: pd.DataFrame) -> pd.DataFrame:
+    """Linhas na ordem da planilha (id_original), quando a coluna existe."""
+    if 'id_original' in df.columns:
+        return df.sort_values('id_original')
+    return df
+
+
+class ExportCache:
+    """Último arquivo gerado por download, válido enquanto a versão dos dados não mudar."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Hashable, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, version: Hashable, build: Callable[[], bytes]) -> bytes:
+        """
+        Arquivo do download name para a versão dos dados, gerando se preciso.
+
+        Args:
+            name: Identificação do download (ex: 'completo')
+            version: Versão dos dados (ex: contador data_version da sessão)
+            build: Gera o arquivo (bytes)
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+        data = build()
+        with self._lock:
+            # Só a versão mais recente de cada download fica guardada
+            self._entries[name] = (version, data)
+        return data
+
+    def deferred(self, name: str, version: Hashable, build: Callable[[], bytes]) -> Callable[[], bytes]:
+        """Função para o data= do st.download_button: gera (ou reaproveita) só no clique."""
+        return lambda: self.get(name, version, build)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_export_cache(state) -> ExportCache:
+    """ExportCache da sessão (criado na primeira chamada); state é o st.session_state."""
+    if SESSION_KEY not in state:
+        state[SESSION_KEY] = ExportCache()
+    return state[SESSION_KEY]
+
+
+def bump_data_version(state) -> int:
+    """Marca os dados de trabalho como alterados (invalida as exportações geradas)."""
+    state[VERSION_KEY] = state.get(VERSION_KEY, 0) + 1
+    return state[VERSION_KEY]
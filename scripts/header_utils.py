@@ -0,0 +1,202 @@
+"""
+Módulo de Detecção de Cabeçalho
+
+Encontra a linha de cabeçalho de uma aba lida sem cabeçalho (header=None),
+olhando só as primeiras linhas. Cada linha candidata recebe uma pontuação
+por palavras-chave de colunas conhecidas (descrição, unidade, quantidade...)
+e pela consistência de tipos das linhas logo abaixo; tudo vetorizado sobre
+o bloco inicial da aba.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from scripts.utils import normalize_text, _dedupe_header
+
+
+# Palavras-chave por campo (mesmas do auto-mapeamento da tela de colunas),
+# na ordem de prioridade do mapeamento
+HEADER_KEYWORDS = {
+    'descricao': ['desc', 'disc', 'nome', 'servico', 'objeto'],
+    'unidade': ['unid', 'und', 'med'],
+    'quantidade': ['quant', 'qtd', 'qtde'],
+    'preco_unit': ['unit', 'p.u', 'preco_unit'],
+    'preco_total': ['total', 'vl', 'valor', 'preco_tot'],
+    'codigo': ['cod', 'item', 'ref'],
+}
+
+# Linhas candidatas a cabeçalho e linhas de dados usadas para medir os tipos
+DEFAULT_MAX_ROWS = 30
+DEFAULT_SAMPLE_ROWS = 20
+
+# Células mais longas que isso são dado, não título de coluna
+_MAX_HEADER_CELL_LEN = 40
+
+_UNNAMED_RE = re.compile(r'^unnamed \d+$')
+_NUMERIC_RE = r'^[-+]?(?:\d{1,3}(?:[.,]\d{3})+|\d+)(?:[.,]\d+)?$'
+
+
+def _keyword_pattern(field: str) -> str:
+    terms = [normalize_text(k) for k in HEADER_KEYWORDS[field]]
+    return '|'.join(re.escape(t) for t in terms if t)
+
+
+_FIELD_PATTERNS = {field: re.compile(_keyword_pattern(field)) for field in HEADER_KEYWORDS}
+
+
+def header_matches(name, field: str) -> bool:
+    """Verifica se um título de coluna contém alguma palavra-chave do campo."""
+    text = normalize_text(name)
+    if not text or _UNNAMED_RE.match(text):
+        return False
+    return bool(_FIELD_PATTERNS[field].search(text))
+
+
+def detect_header(
+    df: pd.DataFrame,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS
+) -> Dict:
+    """
+    Detecta a linha de cabeçalho de uma aba lida com header=None.
+
+    Pontuação de cada linha candidata (entre as max_rows primeiras):
+        - 2 pontos por campo conhecido com palavra-chave na linha
+        - fração de células de texto curto na linha (títulos não são números)
+        - consistência de tipos nas sample_rows linhas seguintes (cada coluna
+          predominantemente numérica ou predominantemente texto)
+        - preenchimento das linhas seguintes
+
+    Args:
+        df: Aba crua (header=None)
+        max_rows: Linhas candidatas a cabeçalho
+        sample_rows: Linhas de dados usadas na consistência de tipos
+
+    Returns:
+        Dict com:
+            - method: 'keywords' (>= 2 campos reconhecidos), 'types' ou 'empty'
+            - score: float
+            - header_row_idx: int (posição da linha no df)
+            - mapping: Dict[nome_da_coluna, campo] (nomes como read_csv daria)
+    """
+    n_candidates = min(max_rows, len(df))
+    if n_candidates == 0 or df.shape[1] == 0:
+        return {'method': 'empty', 'score': 0.0, 'header_row_idx': 0, 'mapping': {}}
+
+    block = df.iloc[:n_candidates + sample_rows]
+
+    # Bloco achatado numa Series só: cada regra é uma operação vetorizada
+    shape = block.shape
+    values = pd.Series(block.to_numpy(dtype=object).ravel())
+    present = values.notna().to_numpy().copy()
+    text = values.map(normalize_text, na_action='ignore').fillna('')
+    text = text.mask(text.str.match(_UNNAMED_RE), '')
+    present &= (text != '').to_numpy()
+
+    is_numeric = (
+        values.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool)).to_numpy()
+        | values.astype(str).str.strip().str.match(_NUMERIC_RE).to_numpy()
+    ) & present
+    is_short_text = (text.str.len() <= _MAX_HEADER_CELL_LEN).to_numpy() & present & ~is_numeric
+
+    # Campos reconhecidos por célula: (campo, linha, coluna)
+    field_hits = np.stack([
+        (text.str.contains(pattern).to_numpy() & is_short_text).reshape(shape)
+        for pattern in _FIELD_PATTERNS.values()
+    ])
+    present = present.reshape(shape)
+    is_numeric = is_numeric.reshape(shape)
+    is_short_text = is_short_text.reshape(shape)
+    keyword_fields = field_hits.any(axis=2).sum(axis=0)[:n_candidates]
+
+    filled = present.sum(axis=1)
+    text_frac = np.divide(is_short_text.sum(axis=1), filled, out=np.zeros(len(filled)), where=filled > 0)[:n_candidates]
+
+    # Janelas das linhas abaixo de cada candidata via somas acumuladas
+    def window_sums(matrix):
+        cs = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0)])
+        starts = np.arange(1, n_candidates + 1)
+        ends = np.minimum(starts + sample_rows, len(matrix))
+        return cs[ends] - cs[starts]
+
+    below_present = window_sums(present)
+    below_numeric = window_sums(is_numeric)
+    numeric_frac = np.divide(below_numeric, below_present, out=np.zeros_like(below_numeric), where=below_present > 0)
+    column_consistency = np.maximum(numeric_frac, 1 - numeric_frac)
+    used_columns = below_present > 0
+    consistency = np.divide(
+        (column_consistency * used_columns).sum(axis=1), used_columns.sum(axis=1),
+        out=np.zeros(n_candidates), where=used_columns.sum(axis=1) > 0
+    )
+    window = np.maximum(np.minimum(sample_rows, len(present) - np.arange(1, n_candidates + 1)), 1)
+    fill = below_present.sum(axis=1) / (window * df.shape[1])
+
+    # Linha do cabeçalho precisa ter conteúdo
+    scores = 2.0 * keyword_fields + text_frac + consistency + fill
+    scores[filled[:n_candidates] == 0] = -1.0
+
+    best = int(np.argmax(scores))
+    columns = _dedupe_header(list(df.iloc[best]))
+
+    mapping = {}
+    for f, field in enumerate(HEADER_KEYWORDS):
+        for c in np.flatnonzero(field_hits[f, best]):
+            if columns[c] not in mapping:
+                mapping[columns[c]] = field
+                break
+
+    return {
+        'method': 'keywords' if keyword_fields[best] >= 2 else 'types',
+        'score': float(scores[best]),
+        'header_row_idx': best,
+        'mapping': mapping,
+    }
+
+
+def detect_headers(sheets: Dict[str, pd.DataFrame], max_rows: int = DEFAULT_MAX_ROWS) -> Dict[str, Dict]:
+    """Aplica detect_header a todas as abas de um workbook (lidas com header=None)."""
+    return {name: detect_header(df, max_rows=max_rows) for name, df in sheets.items()}
+
+
+def apply_header_row(grid: pd.DataFrame, header_row_idx: int) -> pd.DataFrame:
+    """
+    Monta a tabela a partir de uma aba crua (header=None) usando a linha
+    indicada como cabeçalho, com os mesmos nomes e tipos que
+    pd.read_csv(..., header=header_row_idx) daria.
+
+    Args:
+        grid: Aba crua, idealmente lida com dtype=str
+        header_row_idx: Posição da linha de cabeçalho
+
+    Returns:
+        DataFrame com as linhas abaixo do cabeçalho
+    """
+    columns = _dedupe_header(list(grid.iloc[header_row_idx])) if len(grid) > header_row_idx else []
+    body = grid.iloc[header_row_idx + 1:].reset_index(drop=True)
+    body.columns = columns
+
+    # Colunas inteiramente numéricas voltam a ser números (como no read_csv)
+    for col in body.columns:
+        try:
+            body[col] = pd.to_numeric(body[col])
+        except (ValueError, TypeError):
+            pass
+    return body
+
+
+def frame_to_grid(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aba lida com cabeçalho (nomes das colunas) → aba crua em texto, como
+    pd.read_csv(..., header=None, dtype=str) sobre df.to_csv(index=False):
+    o cabeçalho vira a primeira linha e os vazios continuam vazios.
+    """
+    header = np.array([str(c) for c in df.columns], dtype=object)
+    body = df.astype(str).where(df.notna()).to_numpy(dtype=object)
+    return pd.DataFrame(np.vstack([header[None, :], body]) if len(body) else header[None, :])
+
+
+def column_mapping_for(result: Dict, columns: List[str]) -> Dict[str, str]:
+    """Inverte o mapping de detect_header (campo -> coluna), só com colunas existentes."""
+    return {field: col for col, field in result.get('mapping', {}).items() if col in columns}
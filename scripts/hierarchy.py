@@ -0,0 +1,235 @@
+"""
+Módulo de Hierarquia do Orçamento
+
+Reconstrói a árvore do orçamento a partir da coluna 'codigo' (1, 1.2, 1.2.3)
+e das linhas de título e subtotal, como ponteiros para o pai (um int32 por
+linha). Marca o tipo de cada linha (item, titulo, subtotal) para que só os
+itens sejam classificados, e calcula subtotais e totais por capítulo com
+reduções vetorizadas sobre a árvore.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+
+TIPO_ITEM = 'item'
+TIPO_TITULO = 'titulo'
+TIPO_SUBTOTAL = 'subtotal'
+TIPOS_LINHA = [TIPO_ITEM, TIPO_TITULO, TIPO_SUBTOTAL]
+
+# Código hierárquico: segmentos numéricos curtos separados por ponto ("1", "1.2",
+# "01.02.003", "1.2."). Códigos de catálogo (SINAPI, DER: "493615") não entram.
+_HIER_CODE_RE = r'^\d{1,3}(?:\.\d{1,3})*\.?$'
+
+# Fração mínima de códigos hierárquicos para a coluna ser tratada como árvore
+MIN_HIERARCHICAL_FRACTION = 0.5
+
+_SUBTOTAL_RE = re.compile(r'^(?:sub ?total|total)\b')
+_GRAND_TOTAL_RE = re.compile(r'^total geral\b')
+
+HIERARCHY_COLUMNS = ['tipo_linha', 'nivel', 'pai_linha', 'capitulo', 'subtotal_calculado']
+
+
+def parse_codes(codes: pd.Series) -> pd.Series:
+    """
+    Normaliza códigos hierárquicos: tira espaços, ponto final e zeros à
+    esquerda de cada segmento ("01.02." → "1.2"). Códigos que não são
+    hierárquicos viram NA.
+    """
+    text = codes.astype('string').str.strip()
+    valid = text.str.match(_HIER_CODE_RE).fillna(False).astype(bool)
+    clean = text.where(valid).str.rstrip('.')
+    return clean.str.replace(r'(^|\.)0+(?=\d)', r'\1', regex=True)
+
+
+def _label_prefix(text: pd.Series) -> pd.Series:
+    """Início do texto em minúsculas, só letras e dígitos (basta para reconhecer 'total')."""
+    prefix = text.astype('string').str.slice(0, 24).str.lower()
+    return prefix.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip().fillna('')
+
+
+def _resolve_roots(parent: np.ndarray) -> np.ndarray:
+    """Raiz de cada nó por salto de ponteiros (log da profundidade iterações)."""
+    root = np.where(parent >= 0, parent, np.arange(len(parent)))
+    while True:
+        nxt = np.where(parent[root] >= 0, parent[root], root)
+        if np.array_equal(nxt, root):
+            return root
+        root = nxt
+
+
+def build_hierarchy(
+    df: pd.DataFrame,
+    col_code: str = 'codigo',
+    col_desc: str = 'descricao',
+    col_qty: str = 'quantidade',
+    col_unit: str = 'unidade',
+    col_value: str = 'preco_total',
+    col_id: str = 'id_linha'
+) -> pd.DataFrame:
+    """
+    Monta a árvore do orçamento e adiciona as colunas HIERARCHY_COLUMNS.
+
+    Regras:
+        - subtotal: descrição (ou unidade, se a descrição estiver vazia)
+          começando com "total"/"subtotal", sem quantidade; "total geral"
+          fica na raiz e soma todos os itens
+        - titulo: código com filhos na árvore, ou linha sem quantidade e sem unidade
+        - item: o resto
+        - pai de uma linha com código hierárquico: o código sem o último segmento
+          (subindo mais níveis se houver lacuna); linhas sem código ficam sob o
+          último título acima delas
+        - capitulo: código da raiz da linha
+        - subtotal_calculado: soma de col_value dos itens descendentes (títulos)
+          ou do título pai (subtotais)
+
+    Args:
+        df: Tabela estruturada (saída do mapeamento de colunas)
+        col_code, col_desc, col_qty, col_unit, col_value: Colunas usadas
+        col_id: Coluna com o id estável da linha (pai_linha aponta para ela;
+            sem ela, para a posição da linha)
+
+    Returns:
+        Cópia de df com tipo_linha (category), nivel (int8), pai_linha (Int32),
+        capitulo e subtotal_calculado (float64)
+    """
+    out = df.copy()
+    n = len(out)
+    positions = np.arange(n)
+
+    def column(name):
+        return out[name] if name in out.columns else pd.Series([None] * n, index=out.index, dtype=object)
+
+    codes = parse_codes(column(col_code)).reset_index(drop=True)
+    if codes.notna().sum() < MIN_HIERARCHICAL_FRACTION * column(col_code).notna().sum():
+        codes = pd.Series(pd.NA, index=codes.index, dtype='string')
+    has_code = codes.notna().to_numpy()
+
+    desc_raw = column(col_desc).astype('string').str.strip().fillna('').reset_index(drop=True)
+    desc = _label_prefix(desc_raw)
+    qty = pd.to_numeric(column(col_qty), errors='coerce').reset_index(drop=True)
+    unit = column(col_unit).astype('string').str.strip().reset_index(drop=True)
+    no_qty = (qty.isna() | (qty == 0)).to_numpy()
+    no_unit = (unit.isna() | (unit == '')).to_numpy()
+
+    # --- Pais pelo código: o primeiro ancestral existente ---
+    code_pos = pd.Series(positions[has_code], index=codes[has_code].to_numpy())
+    code_pos = code_pos[~code_pos.index.duplicated(keep='first')]
+
+    parent = np.full(n, -1, dtype=np.int32)
+    pending = has_code.copy()
+    ancestor = codes.copy()
+    while pending.any():
+        ancestor = ancestor.where(ancestor.str.contains('.', regex=False).fillna(False).astype(bool))
+        ancestor = ancestor.str.rsplit('.', n=1).str[0]
+        found = ancestor.map(code_pos).to_numpy(dtype=float)
+        hit = pending & ~np.isnan(found)
+        parent[hit] = found[hit].astype(np.int32)
+        pending &= ~hit & ancestor.notna().to_numpy()
+
+    # --- Tipos de linha ---
+    has_children = np.zeros(n, dtype=bool)
+    has_children[parent[parent >= 0]] = True
+    # Rótulo "Total do grupo" às vezes cai na coluna de unidade (descrição vazia)
+    label = desc.where(desc != '', _label_prefix(unit.fillna('')))
+    is_subtotal = label.str.match(_SUBTOTAL_RE).to_numpy() & no_qty
+    is_grand_total = is_subtotal & label.str.match(_GRAND_TOTAL_RE).to_numpy()
+    is_title = ~is_subtotal & (has_children | (no_qty & no_unit & (desc != '').to_numpy()))
+
+    # Itens e subtotais sem código ficam sob o último título acima; títulos sem
+    # código não revelam o aninhamento e ficam na raiz
+    last_title = pd.Series(np.where(is_title, positions, np.nan)).ffill()
+    previous_title = last_title.shift(1).to_numpy()
+    orphan = ~has_code & ~is_title & ~is_grand_total & ~np.isnan(previous_title)
+    parent[orphan] = previous_title[orphan].astype(np.int32)
+
+    tipo = np.where(is_subtotal, TIPO_SUBTOTAL, np.where(is_title, TIPO_TITULO, TIPO_ITEM))
+
+    # --- Nível e capítulo (saltos de ponteiro, sem recursão) ---
+    depth = np.zeros(n, dtype=np.int8)
+    cur = parent.copy()
+    while (cur >= 0).any():
+        live = cur >= 0
+        depth[live] += 1
+        cur[live] = parent[cur[live]]
+    roots = _resolve_roots(parent)
+    root_label = codes.fillna(desc_raw.str.slice(0, 40)).to_numpy(dtype=object)
+
+    # --- Subtotais: valor de cada item somado a todos os ancestrais ---
+    values = pd.to_numeric(column(col_value), errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+    values = np.where(tipo == TIPO_ITEM, values, 0.0)
+    totals = np.zeros(n, dtype=np.float64)
+    cur = parent.copy()
+    while (cur >= 0).any():
+        live = cur >= 0
+        totals += np.bincount(cur[live], weights=values[live], minlength=n)
+        cur[live] = parent[cur[live]]
+
+    subtotal = np.full(n, np.nan)
+    subtotal[is_title] = totals[is_title]
+    subtotal_parent = is_subtotal & (parent >= 0)
+    subtotal[subtotal_parent] = totals[parent[subtotal_parent]]
+    subtotal[is_grand_total] = values.sum()
+
+    # --- Colunas de saída ---
+    ids = out[col_id].to_numpy() if col_id in out.columns else positions
+    pai = pd.array(np.where(parent >= 0, ids[np.maximum(parent, 0)], 0), dtype='Int32')
+    pai[parent < 0] = pd.NA
+
+    out['tipo_linha'] = pd.Categorical(tipo, categories=TIPOS_LINHA)
+    out['nivel'] = depth
+    out['pai_linha'] = pai
+    out['capitulo'] = pd.Series(root_label[roots], index=out.index, dtype='string')
+    out['subtotal_calculado'] = subtotal
+    return out
+
+
+def rollup_by_level(
+    df: pd.DataFrame,
+    level: int = 1,
+    col_code: str = 'codigo',
+    col_value: str = 'preco_total',
+    col_id: str = 'id_linha'
+) -> pd.DataFrame:
+    """
+    Totais dos itens agrupados pelo ancestral de um nível (1 = capítulo).
+
+    Usa as colunas de build_hierarchy (pai_linha, nivel, tipo_linha).
+
+    Returns:
+        DataFrame com codigo, descricao, itens e total por nó do nível pedido
+    """
+    n = len(df)
+    ids = df[col_id].to_numpy() if col_id in df.columns else np.arange(n)
+    id_pos = pd.Series(np.arange(n), index=ids)
+    parent = df['pai_linha'].map(id_pos).fillna(-1).to_numpy(dtype=np.int64)
+    depth = df['nivel'].to_numpy(dtype=np.int64)
+
+    # Subir cada linha até o nível pedido (nível = profundidade + 1)
+    anc = np.arange(n)
+    for _ in range(int(depth.max(initial=0))):
+        deeper = depth[anc] > level - 1
+        if not deeper.any():
+            break
+        anc = np.where(deeper & (parent[anc] >= 0), parent[anc], anc)
+
+    items = (df['tipo_linha'] == TIPO_ITEM).to_numpy() & (depth > level - 1) & (depth[anc] == level - 1)
+    values = pd.to_numeric(df[col_value], errors='coerce').fillna(0.0).to_numpy() if col_value in df.columns else np.zeros(n)
+    groups = pd.DataFrame({'no': anc[items], 'valor': values[items]}).groupby('no')['valor'].agg(['size', 'sum'])
+
+    nodes = groups.index.to_numpy()
+    return pd.DataFrame({
+        'codigo': df[col_code].to_numpy()[nodes] if col_code in df.columns else nodes,
+        'descricao': df['descricao'].to_numpy()[nodes] if 'descricao' in df.columns else None,
+        'itens': groups['size'].to_numpy(),
+        'total': groups['sum'].to_numpy(),
+    })
+
+
+def is_structure_row(df: pd.DataFrame) -> Optional[np.ndarray]:
+    """Máscara das linhas de título/subtotal (None se não houver tipo_linha)."""
+    if 'tipo_linha' not in df.columns:
+        return None
+    return (df['tipo_linha'].astype('string').fillna(TIPO_ITEM) != TIPO_ITEM).to_numpy()
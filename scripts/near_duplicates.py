@@ -0,0 +1,181 @@
+"""
+Módulo de Detecção de Quase-Duplicatas
+
+Agrupa descrições parecidas (ordem de palavras diferente, uma palavra a mais,
+numeração solta) com MinHash + LSH em tempo aproximadamente linear.
+Cada linha recebe um cluster_id; linhas do mesmo cluster podem ser
+classificadas e revisadas uma única vez.
+"""
+
+import zlib
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+
+
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_NUM_PERM = 64
+
+# Linhas por bloco no cálculo das assinaturas (limita a memória)
+_CHUNK_SIZE = 5000
+
+# Membros de um bucket do LSH comparados entre si: buckets de até
+# _BUCKET_WINDOW + 1 pares únicos têm todos os pares comparados; nos maiores,
+# cada membro é comparado com os _BUCKET_WINDOW anteriores e com o primeiro
+_BUCKET_WINDOW = 32
+
+
+def _shingles(description: str) -> List[str]:
+    """Conjunto de tokens da descrição, sem a numeração solta do início."""
+    tokens = description.split()
+    start = 0
+    while start < len(tokens) - 1 and tokens[start].isdigit():
+        start += 1
+    return sorted(set(tokens[start:])) or ['']
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Escolhe (bandas, linhas por banda) cuja curva S tem o ponto de inflexão
+    (1/b)^(1/r) mais próximo do limiar de similaridade.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands < 1:
+            break
+        inflection = (1.0 / bands) ** (1.0 / rows)
+        error = abs(inflection - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def minhash_signatures(descriptions: List[str], num_perm: int = DEFAULT_NUM_PERM, seed: int = 42) -> np.ndarray:
+    """
+    Calcula as assinaturas MinHash (uint32) de uma lista de descrições.
+
+    Usa hashing multiply-shift sobre o CRC32 de cada token, vetorizado em numpy.
+
+    Returns:
+        Matriz (len(descriptions), num_perm)
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(descriptions), num_perm), dtype=np.uint32)
+
+    for start in range(0, len(descriptions), _CHUNK_SIZE):
+        chunk = [_shingles(d) for d in descriptions[start:start + _CHUNK_SIZE]]
+        lengths = np.fromiter((len(s) for s in chunk), dtype=np.int64, count=len(chunk))
+        flat = [t for s in chunk for t in s]
+
+        # Hash por token único do bloco, depois espalhado pelas linhas
+        token_codes, vocab = pd.factorize(pd.Series(flat, dtype=object))
+        base = np.fromiter((zlib.crc32(t.encode('utf-8')) for t in vocab), dtype=np.uint64, count=len(vocab))
+        permuted = ((base[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)
+
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted[token_codes], offsets, axis=0)
+
+    return signatures
+
+
+def cluster_near_duplicates(
+    descriptions: pd.Series,
+    units: Optional[pd.Series] = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM
+) -> np.ndarray:
+    """
+    Atribui um cluster_id a cada linha agrupando descrições quase iguais.
+
+    Apenas linhas com a mesma unidade podem cair no mesmo cluster. Pares
+    candidatos do LSH (membros do mesmo bucket, ver _BUCKET_WINDOW) são
+    confirmados pela similaridade de Jaccard estimada pelas assinaturas
+    (>= threshold); os clusters são os componentes conexos dos pares
+    confirmados e, em buckets dentro da janela, não dependem da ordem das
+    linhas.
+
+    Args:
+        descriptions: Descrições normalizadas
+        units: Unidades (opcional)
+        threshold: Similaridade de Jaccard mínima (0-1)
+        num_perm: Tamanho da assinatura MinHash
+
+    Returns:
+        Array int32 com o cluster_id de cada linha (0..n_clusters-1, na ordem
+        da primeira ocorrência)
+    """
+    n_rows = len(descriptions)
+    if n_rows == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    # Duplicatas exatas compartilham a assinatura: trabalhar só com pares únicos
+    desc_codes, desc_uniques = pd.factorize(descriptions, use_na_sentinel=False)
+    if units is not None:
+        unit_codes, unit_uniques = pd.factorize(units, use_na_sentinel=False)
+    else:
+        unit_codes, unit_uniques = np.zeros(n_rows, dtype=np.intp), ['']
+    n_units = len(unit_uniques)
+
+    pair_codes, pair_uniques = pd.factorize(desc_codes.astype(np.int64) * n_units + unit_codes)
+    pair_desc = [str(desc_uniques[k // n_units]) for k in pair_uniques]
+    pair_unit = (pair_uniques % n_units).astype(np.uint64)
+
+    signatures = minhash_signatures(pair_desc, num_perm=num_perm)
+    bands, rows = lsh_params(threshold, num_perm)
+
+    # Union-find sobre os pares únicos
+    parent = np.arange(len(pair_desc))
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    mixer = np.random.default_rng(7).integers(1, 2**63, size=rows, dtype=np.uint64) | np.uint64(1)
+    unit_salt = pair_unit * np.uint64(0x9E3779B97F4A7C15)
+
+    for band in range(bands):
+        band_slice = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = (band_slice * mixer).sum(axis=1) ^ unit_salt
+
+        # Agrupar por chave de bucket e comparar os membros entre si (A~B e
+        # B~C juntam A, B e C mesmo com A≁C, em qualquer ordem das linhas)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        same_as_prev = np.concatenate(([False], sorted_keys[1:] == sorted_keys[:-1]))
+        if not same_as_prev.any():
+            continue
+        positions = np.arange(len(order))
+        bucket_start = np.maximum.accumulate(np.where(same_as_prev, 0, positions))
+
+        candidates = []
+        for distance in range(1, _BUCKET_WINDOW + 1):
+            valid = positions - distance >= bucket_start
+            if not valid.any():
+                break
+            candidates.append((order[valid], order[positions[valid] - distance]))
+        # Buckets maiores que a janela: o primeiro do bucket contra todos
+        beyond = positions - bucket_start > _BUCKET_WINDOW
+        if beyond.any():
+            candidates.append((order[beyond], order[bucket_start[beyond]]))
+
+        for members, others in candidates:
+            # Confirmar candidatos pela similaridade estimada (e mesma unidade)
+            similarity = (signatures[members] == signatures[others]).mean(axis=1)
+            confirmed = (similarity >= threshold) & (pair_unit[members] == pair_unit[others])
+
+            for m, o in zip(members[confirmed], others[confirmed]):
+                rm, ro = find(m), find(o)
+                if rm != ro:
+                    parent[max(rm, ro)] = min(rm, ro)
+
+    roots = np.fromiter((find(i) for i in range(len(pair_desc))), dtype=np.int64, count=len(pair_desc))
+    cluster_codes, _ = pd.factorize(roots[pair_codes])
+    return cluster_codes.astype(np.int32)
@@ -6,9 +6,13 @@ com auditoria completa de alterações.
 """
 
 import re
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 from scripts.utils import normalize_text
+from scripts.abbreviations import load_abbreviations
+from scripts.attributes import extract_attributes
+from scripts.near_duplicates import cluster_near_duplicates, DEFAULT_THRESHOLD
 
 
 # Stopwords PT-BR comuns em descrições de orçamento
@@ -97,6 +101,30 @@ def normalize_decimal(text: str) -> Tuple[str, bool]:
     return text, has_comma_decimal
 
 
+def tokenize_descriptions(series: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """
+    Gera a representação tokenizada compartilhada entre normalizador e classificador.
+    
+    Cada descrição única é normalizada uma única vez (tokens separados por espaço)
+    e cada linha recebe o código da sua descrição única. Aproveita diretamente
+    as categorias quando a coluna já é categórica (saída de normalize_dataframe).
+    
+    Args:
+        series: Coluna de descrições (normalizadas ou não)
+        
+    Returns:
+        (codes, tokens): codes[i] é o índice em tokens da descrição da linha i
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) and not series.isna().any():
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    
+    tokens = [normalize_text(str(u)) for u in uniques]
+    return codes.astype(np.int32, copy=False), tokens
+
+
 def normalize_dataframe(
     df: pd.DataFrame,
     config: Dict[str, bool],
@@ -113,6 +141,10 @@ def normalize_dataframe(
             - remove_stopwords: bool
             - collapse_spaces: bool
             - normalize_numbers: bool
+            - expand_abbreviations: bool
+            - extract_attributes: bool
+            - cluster_near_duplicates: bool
+            - near_duplicate_threshold: float (similaridade de Jaccard, 0-1)
         col_desc: Nome da coluna de descrição
         
     Returns:
@@ -134,16 +166,23 @@ def normalize_dataframe(
         'decimals': 0,
         'accents': 0,
         'punctuation': 0,
+        'abbreviations': 0,
+        'abbreviation_terms': 0,
         'spaces': 0,
         'zeroed': 0,
+        'attributes': 0,
         'removed_empty': 0,
-        'duplicates_removed': 0
-    }
+        'duplicates_removed': 0,
+        'near_duplicate_clusters': 0,
+        'near_duplicate_rows': 0
     }
     
     # Lista de linhas zeradas (para reverter)
     zeroed_rows = []
     
+    # Trie de abreviações (compilada uma vez por processo)
+    abbreviation_trie = load_abbreviations() if config.get('expand_abbreviations', True) else None
+    
     # 0. Remover linhas vazias (Strict Cleaning)
     # Remove NaN, None, string "None", string vazia ou só espaços NA COLUNA DE DESCRIÇÃO
     if config.get('remove_empty_rows', True): # Default True
@@ -163,6 +202,10 @@ def normalize_dataframe(
             (temp_desc == 'item')                 # Títulos perdidos
         )
         
+        # Títulos e subtotais da hierarquia ficam (o rótulo pode estar em outra coluna)
+        if 'tipo_linha' in df_norm.columns:
+            mask_invalid &= df_norm['tipo_linha'].astype(str).eq('item')
+        
         df_norm = df_norm[~mask_invalid].reset_index(drop=True)
         removed_count = initial_count - len(df_norm)
         
@@ -178,6 +221,10 @@ def normalize_dataframe(
         original = str(row[col_desc])
         current = original
         
+        # 0.1 Abreviações de letras soltas ("m.o."): só reconhecíveis com a pontuação
+        if abbreviation_trie is not None:
+            current, n_dotted = abbreviation_trie.expand_dotted(current)
+        
         # 1. Separar números colados
         if config.get('normalize_numbers', True):
             before = current
@@ -225,6 +272,14 @@ def normalize_dataframe(
             if current != before:
                 stats['punctuation'] += 1
         
+        # 4.1 Expandir abreviações (uma passada pela trie de tokens)
+        if abbreviation_trie is not None:
+            current, n_expanded = abbreviation_trie.expand_text(current)
+            n_expanded += n_dotted
+            if n_expanded:
+                stats['abbreviations'] += 1
+                stats['abbreviation_terms'] += n_expanded
+        
         # 5. Remover stopwords
         if config.get('remove_stopwords', False):
             before = current
@@ -256,6 +311,13 @@ def normalize_dataframe(
         
         df_norm.at[idx, 'descricao_norm'] = current
     
+    # 7.1 Extrair atributos técnicos (fck, dn, bitola, espessura, traço, aço)
+    # Usa a descrição original: a normalização remove ':', '=' e 'ø'
+    if config.get('extract_attributes', True):
+        attributes = extract_attributes(df_norm[col_desc])
+        df_norm[attributes.columns] = attributes
+        stats['attributes'] = int(attributes.notna().any(axis=1).sum())
+    
     # 8. Deduplicação (Opção 1: Keep First)
     if config.get('remove_duplicates', False):
         before_dedup = len(df_norm)
@@ -275,6 +337,24 @@ def normalize_dataframe(
                 'msg': f"{dedup_count} itens duplicados removidos (mantida a 1ª ocorrência)."
             })
     
+    # 8.1 Agrupar quase-duplicatas (MinHash LSH) em cluster_id
+    if config.get('cluster_near_duplicates', False):
+        threshold = config.get('near_duplicate_threshold', DEFAULT_THRESHOLD)
+        units = df_norm['unidade'] if 'unidade' in df_norm.columns else None
+        df_norm['cluster_id'] = cluster_near_duplicates(df_norm['descricao_norm'], units, threshold=threshold)
+        
+        cluster_sizes = df_norm['cluster_id'].value_counts()
+        stats['near_duplicate_clusters'] = int((cluster_sizes > 1).sum())
+        stats['near_duplicate_rows'] = int(cluster_sizes[cluster_sizes > 1].sum())
+        audit_log.append({
+            'tipo': 'near_duplicates',
+            'quantidade': stats['near_duplicate_clusters'],
+            'msg': f"{stats['near_duplicate_rows']} linhas agrupadas em {stats['near_duplicate_clusters']} clusters de quase-duplicatas (similaridade >= {threshold:.2f})."
+        })
+    
+    # 9. Representação tokenizada reutilizável (uma categoria por descrição única)
+    df_norm['descricao_norm'] = df_norm['descricao_norm'].astype('category')
+    
     # Adicionar estatísticas ao log
     audit_log.insert(0, {
         'tipo': 'summary',
@@ -286,6 +366,56 @@ def normalize_dataframe(
     return df_norm, audit_log
 
 
+def normalize_batches(
+    batches: Iterable[pd.DataFrame],
+    config: Dict[str, bool],
+    col_desc: str = 'descricao'
+) -> Iterator[Tuple[pd.DataFrame, List[Dict]]]:
+    """
+    Versão em streaming de normalize_dataframe: normaliza lote a lote
+    (ex: fatias de uma aba, como em batch_ingest), com memória limitada
+    pelo lote.
+    
+    Cada lote recebe um índice contínuo em relação aos anteriores (e o mesmo
+    deslocamento em 'linha' no audit log). Regras que dependem da planilha
+    inteira ficam restritas ao lote: duplicatas só são removidas dentro do
+    lote e o agrupamento de quase-duplicatas é desativado.
+    
+    Args:
+        batches: Iterável de DataFrames
+        config: Mesma configuração de normalize_dataframe
+        col_desc: Nome da coluna de descrição
+        
+    Yields:
+        (df_normalizado, audit_log) por lote
+    """
+    batch_config = dict(config, cluster_near_duplicates=False)
+    offset = 0
+    
+    for batch in batches:
+        df_norm, audit_log = normalize_dataframe(batch, batch_config, col_desc=col_desc)
+        df_norm.index = pd.RangeIndex(offset, offset + len(df_norm))
+        for entry in audit_log:
+            if 'linha' in entry:
+                entry['linha'] += offset
+        offset += len(df_norm)
+        yield df_norm, audit_log
+
+
+def concat_batches(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Junta os lotes de normalize_batches (ou de process_batches sobre eles)
+    num DataFrame com índice 0..n-1. Colunas category com categorias
+    diferentes entre lotes (descricao_norm, traço...) voltam a ser category,
+    como normalize_dataframe daria na tabela inteira.
+    """
+    out = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype) and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype('category')
+    return out
+
+
 def get_normalization_report(audit_log: List[Dict]) -> str:
     """
     Gera relatório legível do audit log.
@@ -312,13 +442,17 @@ def get_normalization_report(audit_log: List[Dict]) -> str:
     report += f"  - Decimais normalizados (vírgula → ponto): {stats.get('decimals', 0)}\n"
     report += f"  - Acentos removidos: {stats.get('accents', 0)}\n"
     report += f"  - Pontuação removida: {stats.get('punctuation', 0)}\n"
+    report += f"  - Abreviações expandidas: {stats.get('abbreviations', 0)} linhas ({stats.get('abbreviation_terms', 0)} termos)\n"
     report += f"  - Stopwords removidas: {stats.get('stopwords', 0)}\n"
     report += f"  - Espaços colapsados: {stats.get('spaces', 0)}\n"
     report += f"  - Descrições zeradas (revertidas): {stats.get('zeroed', 0)}\n"
+    report += f"  - Linhas com atributos técnicos extraídos: {stats.get('attributes', 0)}\n"
     if stats.get('removed_empty', 0) > 0:
         report += f"  - Linhas removidas (vazias): {stats.get('removed_empty', 0)}\n"
     if stats.get('duplicates_removed', 0) > 0:
         report += f"  - Duplicatas removidas: {stats.get('duplicates_removed', 0)}\n"
+    if stats.get('near_duplicate_clusters', 0) > 0:
+        report += f"  - Quase-duplicatas: {stats.get('near_duplicate_rows', 0)} linhas em {stats.get('near_duplicate_clusters', 0)} clusters\n"
     
     # Avisos de decimais
     decimal_warnings = [log for log in audit_log if log.get('tipo') == 'decimal_comma']
@@ -341,9 +475,10 @@ if __name__ == '__main__':
             'Armação CA-50 ø20mm',
             'Argamassa traço 1:3',
             'Cimento Portland CP-II',
-            'Tubo DN100 PVC'
+            'Tubo DN100 PVC',
+            'Forn. e assent. de tubo PVC'
         ],
-        'unidade': ['m3', 'kg', 'm3', 'kg', 'm']
+        'unidade': ['m3', 'kg', 'm3', 'kg', 'm', 'm']
     })
     
     config = {
@@ -351,7 +486,9 @@ if __name__ == '__main__':
         'remove_punctuation': True,
         'remove_stopwords': False,
         'collapse_spaces': True,
-        'normalize_numbers': True
+        'normalize_numbers': True,
+        'expand_abbreviations': True,
+        'extract_attributes': True
     }
     
     df_norm, log = normalize_dataframe(test_df, config)
@@ -361,4 +498,7 @@ if __name__ == '__main__':
     for idx, row in df_norm.iterrows():
         print(f"{row['descricao']} → {row['descricao_norm']}")
     
+    print("\nAtributos extraídos:")
+    print(df_norm[['descricao', 'fck_mpa', 'dn_mm', 'bitola_mm', 'espessura_cm', 'traco', 'classe_aco']])
+    
     print("\n" + get_normalization_report(log))
@@ -0,0 +1,160 @@
+"""
+Módulo de Conversão Numérica (pt-BR)
+
+Converte colunas de quantidade e preço vindas da planilha ("1.234,56",
+"R$ 12,50", "(1.000,00)", 1234.5) para float64. Os separadores de milhar e
+decimal são detectados por coluna a partir de uma amostra, e a conversão é
+feita numa única passada vetorizada, contando as células que não puderam ser
+convertidas.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+
+NUMERIC_FIELDS = ['quantidade', 'preco_unit', 'preco_total']
+
+# Células usadas na detecção dos separadores
+DEFAULT_SAMPLE_SIZE = 1000
+
+# Símbolos de moeda, espaços (inclusive não separáveis) e sinal de porcentagem
+_NOISE_RE = r'(?i)r\$|us\$|\$|%|[\s ]'
+
+_BOTH_RE = r'^-?\d[\d.,]*[.,]\d+$'
+_THOUSANDS_DOT_RE = r'^-?\d{1,3}(?:\.\d{3})+$'
+_THOUSANDS_COMMA_RE = r'^-?\d{1,3}(?:,\d{3})+$'
+
+# Texto de str(float) ("100.0", "2.5"): números da planilha que viraram texto
+# numa coluna mista (frame_to_grid / Parquet); não indicam o formato da coluna
+_FLOAT_REPR_RE = r'^-?\d+\.\d+$'
+
+
+def _clean(text: pd.Series) -> pd.Series:
+    """Remove moeda/espaços e converte '-123', '(123)' e '123-' em negativo."""
+    cleaned = text.str.replace(_NOISE_RE, '', regex=True)
+    negative = (
+        (cleaned.str.startswith('(') & cleaned.str.endswith(')'))
+        | cleaned.str.startswith('-')
+        | cleaned.str.endswith('-')
+    ).fillna(False).to_numpy(dtype=bool)
+    cleaned = cleaned.str.strip('()-')
+    return cleaned.where(~negative, '-' + cleaned)
+
+
+def detect_separators(values: pd.Series, sample_size: int = DEFAULT_SAMPLE_SIZE) -> Tuple[Optional[str], str]:
+    """
+    Detecta os separadores (milhar, decimal) de uma coluna de textos numéricos.
+
+    Votos por célula da amostra:
+        - com '.' e ',': o último separador é o decimal
+        - só ',' sem cara de milhar ("12,5"): decimal ','
+        - só '.' sem cara de milhar ("12.5"): decimal '.'
+    Casos ambíguos ("1.234", "1,234") só pesam quando não há outros votos,
+    e aí vale o padrão brasileiro. Textos no formato de str(float) ("100.0")
+    também só votam quando nenhuma outra célula vota: numa coluna mista são
+    números convertidos em texto, não o formato digitado.
+
+    Returns:
+        (milhar, decimal), ex: ('.', ',') ou (',', '.')
+    """
+    sample = values.dropna()
+    sample = sample[sample != ''].head(sample_size)
+
+    has_dot = sample.str.contains('.', regex=False)
+    has_comma = sample.str.contains(',', regex=False)
+    both = has_dot & has_comma & sample.str.match(_BOTH_RE)
+    last_comma = sample.str.rfind(',') > sample.str.rfind('.')
+
+    only_comma = has_comma & ~has_dot
+    only_dot = has_dot & ~has_comma
+    comma_thousands = only_comma & sample.str.match(_THOUSANDS_COMMA_RE)
+    dot_thousands = only_dot & sample.str.match(_THOUSANDS_DOT_RE)
+    float_repr = only_dot & ~dot_thousands & sample.str.match(_FLOAT_REPR_RE)
+
+    br_votes = int((both & last_comma).sum() + (only_comma & ~comma_thousands).sum())
+    us_votes = int((both & ~last_comma).sum() + (only_dot & ~dot_thousands & ~float_repr).sum())
+    if br_votes == 0 and us_votes == 0:
+        us_votes = int(float_repr.sum())
+
+    if us_votes > br_votes:
+        return ',', '.'
+    if br_votes > 0 or dot_thousands.any() or not comma_thousands.any():
+        return '.', ','
+    return ',', '.'
+
+
+def parse_numeric_series(series: pd.Series, sample_size: int = DEFAULT_SAMPLE_SIZE) -> Tuple[pd.Series, Dict]:
+    """
+    Converte uma coluna para float64 no formato detectado.
+
+    Args:
+        series: Coluna da planilha (texto, número ou misto)
+        sample_size: Células usadas na detecção dos separadores
+
+    Returns:
+        (serie_float64, relatorio) com relatorio = {milhar, decimal, convertidos,
+        falhas, exemplos_falha}
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        result = series.astype('float64')
+        return result, {'milhar': None, 'decimal': '.', 'convertidos': int(result.notna().sum()), 'falhas': 0, 'exemplos_falha': []}
+
+    # Células que já são números (colunas mistas) não passam pelo texto
+    if series.dtype == object:
+        is_number = series.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool)).to_numpy(dtype=bool)
+    else:
+        is_number = np.zeros(len(series), dtype=bool)
+    numbers = pd.to_numeric(series.where(is_number), errors='coerce')
+
+    text = series.where(~is_number).astype('string').str.strip()
+    text = text.mask(text == '')
+    cleaned = _clean(text)
+
+    thousands, decimal = detect_separators(cleaned, sample_size)
+    if decimal == '.':
+        float_repr = np.zeros(len(cleaned), dtype=bool)
+    else:
+        # Coluna pt-BR: "100.0" não é milhar válido, é str(float) de uma célula numérica
+        float_repr = (
+            cleaned.str.match(_FLOAT_REPR_RE) & ~cleaned.str.match(_THOUSANDS_DOT_RE)
+        ).fillna(False).to_numpy(dtype=bool)
+    floats = pd.to_numeric(cleaned.where(float_repr), errors='coerce')
+    if thousands:
+        cleaned = cleaned.str.replace(thousands, '', regex=False)
+    if decimal != '.':
+        cleaned = cleaned.str.replace(decimal, '.', regex=False)
+
+    parsed = pd.to_numeric(cleaned, errors='coerce').astype('float64')
+    parsed = parsed.where(~float_repr, floats)
+    result = pd.Series(np.where(is_number, numbers, parsed), index=series.index, dtype='float64')
+
+    failed = text.notna() & parsed.isna()
+    report = {
+        'milhar': thousands,
+        'decimal': decimal,
+        'convertidos': int(result.notna().sum()),
+        'falhas': int(failed.sum()),
+        'exemplos_falha': text[failed].drop_duplicates().head(5).tolist(),
+    }
+    return result, report
+
+
+def parse_numeric_columns(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    sample_size: int = DEFAULT_SAMPLE_SIZE
+) -> Tuple[pd.DataFrame, Dict[str, Dict]]:
+    """
+    Converte as colunas numéricas mapeadas (padrão: NUMERIC_FIELDS) para float64.
+
+    Returns:
+        (df_convertido, {coluna: relatorio}); colunas ausentes são ignoradas
+    """
+    out = df.copy()
+    reports = {}
+    for col in columns if columns is not None else NUMERIC_FIELDS:
+        if col not in out.columns:
+            continue
+        out[col], reports[col] = parse_numeric_series(out[col], sample_size)
+    return out, reports
@@ -0,0 +1,492 @@
+"""
+Módulo de Revisão
+
+Funções de apoio à tela de validação (4. Apelidar e Validar):
+
+- Edições: o data_editor guarda em st.session_state[<key>] só o que mudou:
+      {'edited_rows': {posicao_na_view: {coluna: valor}}, 'added_rows': [...], 'deleted_rows': [...]}
+  As edições são traduzidas para os rótulos do DataFrame de trabalho e
+  aplicadas tocando só as linhas editadas (custo proporcional ao número de
+  edições, não ao tamanho da planilha).
+- Paginação: o servidor guarda a ordenação de cada coluna (SortIndex) e a
+  view filtrada/ordenada como um índice; só a página atual vai para o editor.
+- Facetas: status, tipo, grupo e apelido viram categorias; essas colunas,
+  revisar e desconhecido ganham um índice valor → posições (FacetIndex),
+  montado uma vez após a classificação e atualizado nas edições; filtros,
+  opções e contagens saem dele.
+- Modo agrupado: linhas com a mesma (descricao_norm, unidade) viram um grupo
+  (GroupIndex); a grade mostra uma linha por grupo e a decisão tomada nela é
+  repassada a todas as linhas do grupo.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from scripts.hierarchy import is_structure_row
+
+
+# Colunas que o usuário pode editar na tela de validação
+EDITABLE_COLUMNS = ['revisar', 'apelido_desejado']
+
+# Colunas guardadas como category no df_working e valores fixos de status
+CATEGORICAL_COLUMNS = ['status', 'tax_tipo', 'tax_grupo', 'apelido_sugerido']
+STATUS_VALUES = ['ok', 'revisar', 'desconhecido', 'estrutura']
+
+# Colunas indexadas para os filtros da tela
+FACET_COLUMNS = ['status', 'tax_tipo', 'tax_grupo', 'apelido_sugerido', 'revisar', 'tax_desconhecido']
+
+# Chave dos grupos do modo agrupado e ordenações possíveis dos grupos
+GROUP_COLUMNS = ['descricao_norm', 'unidade']
+GROUP_SORTS = ['linhas', 'preco_total', 'descricao_norm']
+
+# Tamanhos de página da grade de revisão
+PAGE_SIZES = [50, 100, 250, 500]
+DEFAULT_PAGE_SIZE = 100
+
+
+def editor_changes_by_label(view_index: pd.Index, edited_rows: Dict) -> Dict:
+    """
+    Traduz edited_rows (posição na view exibida) para rótulos do DataFrame
+    de trabalho: {rotulo: {coluna: valor}}. Posições fora da view (estado do
+    editor de uma view anterior) são ignoradas.
+    """
+    changes = {}
+    for position, row_changes in edited_rows.items():
+        position = int(position)
+        if 0 <= position < len(view_index):
+            changes.setdefault(view_index[position], {}).update(row_changes)
+    return changes
+
+
+def apply_changes(
+    df: pd.DataFrame,
+    changes: Dict,
+    editable_columns: Optional[Iterable[str]] = EDITABLE_COLUMNS
+) -> Dict[str, int]:
+    """
+    Aplica edições por rótulo ({rotulo: {coluna: valor}}) no DataFrame de trabalho, in-place.
+
+    Regras de status, só nas linhas em que 'revisar' foi editado:
+        - revisar marcado → status 'revisar'
+        - revisar desmarcado e status 'revisar' → status 'ok'
+
+    Args:
+        df: DataFrame de trabalho (df_working)
+        changes: Edições por rótulo de df (editor_changes_by_label)
+        editable_columns: Colunas aceitas (None = qualquer coluna existente)
+
+    Returns:
+        Dict com linhas, celulas, status_alterados, colunas (alteradas) e
+        rotulos (linhas alteradas)
+    """
+    allowed = set(editable_columns) if editable_columns is not None else None
+
+    # Edições agrupadas por coluna: {coluna: {rotulo: valor}}
+    by_column: Dict[str, Dict] = {}
+    for label, row_changes in changes.items():
+        if label not in df.index:
+            continue
+        for col, value in row_changes.items():
+            if col not in df.columns or (allowed is not None and col not in allowed):
+                continue
+            by_column.setdefault(col, {})[label] = value
+
+    touched = set()
+    cells = 0
+    columns = set()
+    for col, values in by_column.items():
+        labels = list(values)
+        new_values = pd.Series(list(values.values()), index=labels)
+        if col == 'revisar':
+            new_values = new_values.fillna(False).astype(bool)
+        current = df.loc[labels, col]
+        changed = [label for label in labels if not _same(current[label], new_values[label])]
+        if not changed:
+            continue
+        df.loc[changed, col] = new_values[changed].to_numpy()
+        touched.update(changed)
+        cells += len(changed)
+        columns.add(col)
+
+    status_changed = 0
+    revisar_labels = [label for label in by_column.get('revisar', {}) if label in touched]
+    if revisar_labels and 'status' in df.columns:
+        revisar = df.loc[revisar_labels, 'revisar'].astype(bool)
+        status = df.loc[revisar_labels, 'status']
+        new_status = status.where(~revisar, 'revisar')
+        new_status = new_status.where(revisar | (status != 'revisar'), 'ok')
+        diff = new_status[new_status != status]
+        if len(diff):
+            df.loc[diff.index, 'status'] = diff.to_numpy()
+            columns.add('status')
+        status_changed = len(diff)
+
+    return {
+        'linhas': len(touched),
+        'celulas': cells,
+        'status_alterados': status_changed,
+        'colunas': sorted(columns),
+        'rotulos': list(touched),
+    }
+
+
+def apply_editor_changes(
+    df: pd.DataFrame,
+    view_index: pd.Index,
+    edited_rows: Dict,
+    editable_columns: Optional[Iterable[str]] = EDITABLE_COLUMNS
+) -> Dict[str, int]:
+    """
+    Aplica as edições do data_editor (edited_rows) no DataFrame de trabalho, in-place.
+
+    Args:
+        df: DataFrame de trabalho (df_working)
+        view_index: Índice da view exibida no editor (posição → rótulo em df)
+        edited_rows: st.session_state[<key>]['edited_rows']
+        editable_columns: Colunas aceitas (None = qualquer coluna existente)
+
+    Returns:
+        Mesmo resumo de apply_changes
+    """
+    return apply_changes(df, editor_changes_by_label(view_index, edited_rows), editable_columns)
+
+
+def _same(a, b) -> bool:
+    """Compara valores de célula tratando vazios (None/NaN/'') como iguais entre si."""
+    a_empty = a is None or (not isinstance(a, str) and pd.isna(a)) or a == ''
+    b_empty = b is None or (not isinstance(b, str) and pd.isna(b)) or b == ''
+    if a_empty or b_empty:
+        return a_empty and b_empty
+    return a == b
+
+
+class SortIndex:
+    """
+    Ordenações pré-computadas das colunas do DataFrame de trabalho.
+
+    A ordem de cada coluna (posições, estável, vazios no fim) é calculada uma
+    vez; ordenar uma view filtrada vira uma seleção O(n) sobre essa ordem,
+    sem novo sort a cada rerun. Colunas editadas são invalidadas.
+    """
+
+    def __init__(self):
+        self._orders: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._source: Optional[Tuple[int, int]] = None
+
+    def _check_source(self, df: pd.DataFrame):
+        source = (id(df), len(df))
+        if source != self._source:
+            self._orders.clear()
+            self._source = source
+
+    def order(self, df: pd.DataFrame, col: str, ascending: bool = True) -> np.ndarray:
+        """Posições de df ordenadas pela coluna."""
+        self._check_source(df)
+        key = (col, ascending)
+        if key not in self._orders:
+            values = df[col].reset_index(drop=True)
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('string')
+            try:
+                ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+            except TypeError:
+                # Coluna com tipos misturados: ordena pelo texto
+                ordered = values.astype('string').sort_values(ascending=ascending, kind='stable', na_position='last')
+            self._orders[key] = ordered.index.to_numpy()
+        return self._orders[key]
+
+    def invalidate(self, columns: Optional[Iterable[str]] = None):
+        """Descarta as ordens das colunas (todas, se columns for None)."""
+        if columns is None:
+            self._orders.clear()
+            return
+        columns = set(columns)
+        self._orders = {key: order for key, order in self._orders.items() if key[0] not in columns}
+
+    def view_index(
+        self,
+        df: pd.DataFrame,
+        mask,
+        sort_col: Optional[str] = None,
+        ascending: bool = True
+    ) -> pd.Index:
+        """
+        Rótulos das linhas que passam no filtro, na ordem pedida (sem
+        sort_col: ordem do DataFrame).
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if sort_col is None or sort_col not in df.columns:
+            return df.index[mask]
+        order = self.order(df, sort_col, ascending)
+        return df.index[order[mask[order]]]
+
+
+def paginate(view_index: pd.Index, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> Tuple[pd.Index, int, int]:
+    """
+    Fatia da view para a página pedida (1-based; limitada ao intervalo válido).
+
+    Returns:
+        (rotulos_da_pagina, pagina, total_de_paginas)
+    """
+    n_pages = max(1, -(-len(view_index) // page_size))
+    page = min(max(1, int(page)), n_pages)
+    start = (page - 1) * page_size
+    return view_index[start:start + page_size], page, n_pages
+
+
+def to_categorical(df: pd.DataFrame, columns: Iterable[str] = CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    """
+    Converte as colunas de faceta para category, in-place (as que já são
+    category ficam como estão). Status recebe todas as categorias de
+    STATUS_VALUES, para as edições poderem gravar qualquer uma.
+    """
+    for col in columns:
+        if col not in df.columns:
+            continue
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+        if col == 'status':
+            missing = [v for v in STATUS_VALUES if v not in df[col].cat.categories]
+            if missing:
+                df[col] = df[col].cat.add_categories(missing)
+    return df
+
+
+class FacetIndex:
+    """
+    Índice valor → posições das colunas de filtro do df_working.
+
+    Montado uma vez (factorize + um argsort estável por coluna). Filtros são
+    interseções: parte do menor conjunto de posições e confere os códigos das
+    demais colunas só nessas posições. update() move as linhas editadas entre
+    os grupos sem varrer a tabela.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str] = FACET_COLUMNS):
+        self.n = len(df)
+        self.source = (id(df), len(df))
+        self._codes: Dict[str, np.ndarray] = {}
+        self._uniques: Dict[str, list] = {}
+        self._lookup: Dict[str, Dict] = {}
+        self._groups: Dict[str, Dict[int, np.ndarray]] = {}
+        for col in columns:
+            if col in df.columns:
+                self._build(col, df[col])
+
+    def matches(self, df: pd.DataFrame) -> bool:
+        """O índice foi montado para este DataFrame."""
+        return self.source == (id(df), len(df))
+
+    def __contains__(self, col: str) -> bool:
+        return col in self._codes
+
+    def _build(self, col: str, series: pd.Series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        codes = np.asarray(codes, dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        self._codes[col] = codes
+        self._uniques[col] = list(uniques)
+        self._lookup[col] = {value: code for code, value in enumerate(self._uniques[col])}
+        self._groups[col] = {code: order[bounds[code]:bounds[code + 1]] for code in range(len(uniques))}
+
+    def _code(self, col: str, value, create: bool = False) -> Optional[int]:
+        code = self._lookup[col].get(value)
+        if code is None and create:
+            code = len(self._uniques[col])
+            self._uniques[col].append(value)
+            self._lookup[col][value] = code
+            self._groups[col][code] = np.empty(0, dtype=np.int64)
+        return code
+
+    def count(self, col: str, value) -> int:
+        code = self._code(col, value)
+        return 0 if code is None else len(self._groups[col][code])
+
+    def positions(self, col: str, values: Iterable) -> np.ndarray:
+        """Posições (ordenadas) das linhas com qualquer um dos valores."""
+        codes = [c for c in (self._code(col, v) for v in values) if c is not None]
+        if not codes:
+            return np.empty(0, dtype=np.int64)
+        if len(codes) == 1:
+            return self._groups[col][codes[0]]
+        return np.sort(np.concatenate([self._groups[col][c] for c in codes]))
+
+    def values(self, col: str, within: Optional[np.ndarray] = None) -> list:
+        """Valores presentes (sem vazios), em ordem alfabética; within restringe a essas posições."""
+        if within is None:
+            codes = [c for c, pos in self._groups[col].items() if len(pos)]
+        else:
+            codes = np.unique(self._codes[col][within])
+            codes = codes[codes >= 0].tolist()
+        return sorted((self._uniques[col][c] for c in codes), key=str)
+
+    def select(self, filters: Dict[str, Iterable]) -> np.ndarray:
+        """
+        Posições que atendem a todos os filtros ({coluna: valores aceitos}).
+        Colunas fora do índice são ignoradas; sem filtros, todas as linhas.
+        """
+        filters = {col: list(values) for col, values in filters.items() if col in self._codes}
+        if not filters:
+            return np.arange(self.n)
+
+        candidates = {col: self.positions(col, values) for col, values in filters.items()}
+        first = min(candidates, key=lambda col: len(candidates[col]))
+        result = candidates[first]
+        for col, values in filters.items():
+            if col == first or not len(result):
+                continue
+            allowed = [c for c in (self._code(col, v) for v in values) if c is not None]
+            result = result[np.isin(self._codes[col][result], allowed)]
+        return result
+
+    def mask(self, positions: np.ndarray) -> np.ndarray:
+        """Máscara booleana (tamanho da tabela) a partir de posições."""
+        mask = np.zeros(self.n, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def update(self, col: str, positions: np.ndarray, new_values: Iterable):
+        """Move as posições editadas para os grupos dos novos valores."""
+        if col not in self._codes:
+            return
+        positions = np.asarray(positions, dtype=np.int64)
+        new_codes = np.array(
+            [-1 if _is_empty(v) else self._code(col, v, create=True) for v in new_values],
+            dtype=np.int64
+        )
+        old_codes = self._codes[col][positions]
+        moved = old_codes != new_codes
+        positions, old_codes, new_codes = positions[moved], old_codes[moved], new_codes[moved]
+
+        for code in np.unique(old_codes[old_codes >= 0]):
+            group = self._groups[col][code]
+            self._groups[col][code] = np.setdiff1d(group, positions[old_codes == code], assume_unique=True)
+        for code in np.unique(new_codes[new_codes >= 0]):
+            group = self._groups[col][code]
+            self._groups[col][code] = np.union1d(group, positions[new_codes == code])
+        self._codes[col][positions] = new_codes
+
+    def refresh_rows(self, df: pd.DataFrame, labels: Iterable, columns: Optional[Iterable[str]] = None):
+        """Atualiza o índice para as linhas (rótulos) alteradas em df."""
+        labels = list(labels)
+        if not labels:
+            return
+        positions = df.index.get_indexer(labels)
+        for col in (columns if columns is not None else list(self._codes)):
+            if col in self._codes:
+                self.update(col, positions, df[col].to_numpy()[positions])
+
+
+def _is_empty(value) -> bool:
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+class GroupIndex:
+    """
+    Grupos de linhas com a mesma (descricao_norm, unidade) no df_working.
+
+    Montado uma vez (factorize das colunas + um argsort estável): código do
+    grupo por linha, membros de cada grupo, primeira linha (representante),
+    número de linhas e soma de preco_total. Títulos e subtotais ficam fora
+    dos grupos. As colunas da chave não são editáveis, então o índice vale
+    enquanto o df_working for o mesmo.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str] = GROUP_COLUMNS):
+        self.n = len(df)
+        self.source = (id(df), len(df))
+        self.columns = [c for c in columns if c in df.columns]
+
+        keys = np.zeros(self.n, dtype=np.int64)
+        for col in self.columns:
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+            keys = keys * max(len(uniques), 1) + codes
+        structure = is_structure_row(df)
+        valid = np.ones(self.n, dtype=bool) if structure is None else ~structure
+
+        # Grupos numerados na ordem da primeira linha de cada um
+        codes = np.full(self.n, -1, dtype=np.int64)
+        codes[valid] = pd.factorize(keys[valid])[0]
+        self.codes = codes
+        n_groups = int(codes.max()) + 1 if self.n else 0
+
+        grouped = np.flatnonzero(valid)
+        order = grouped[np.argsort(codes[valid], kind='stable')]
+        self._order = order
+        self._bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+        self.first = order[self._bounds[:-1]]
+        self.sizes = np.diff(self._bounds)
+        if 'preco_total' in df.columns:
+            prices = pd.to_numeric(df['preco_total'], errors='coerce').fillna(0).to_numpy(dtype=float)
+            self.totals = np.bincount(codes[valid], weights=prices[valid], minlength=n_groups)
+        else:
+            self.totals = np.zeros(n_groups)
+        self._keys = df.iloc[self.first][self.columns].reset_index(drop=True) if n_groups else None
+        self._sorts: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    def matches(self, df: pd.DataFrame) -> bool:
+        """O índice foi montado para este DataFrame."""
+        return self.source == (id(df), len(df))
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def members(self, group: int) -> np.ndarray:
+        """Posições (ordenadas) das linhas do grupo."""
+        return np.sort(self._order[self._bounds[group]:self._bounds[group + 1]])
+
+    def groups(self, positions: np.ndarray) -> np.ndarray:
+        """Grupos (em ordem de aparição) que têm alguma linha entre as posições."""
+        codes = np.unique(self.codes[positions])
+        return codes[codes >= 0]
+
+    def order(self, by: str = 'linhas', ascending: bool = False) -> np.ndarray:
+        """Todos os grupos ordenados por linhas, preco_total ou uma coluna da chave."""
+        key = (by, ascending)
+        if key not in self._sorts:
+            if by == 'linhas':
+                values = pd.Series(self.sizes)
+            elif by == 'preco_total':
+                values = pd.Series(self.totals)
+            elif self._keys is not None and by in self._keys.columns:
+                values = self._keys[by].astype('string')
+            else:
+                values = pd.Series(np.arange(len(self)))
+            ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+            self._sorts[key] = ordered.index.to_numpy()
+        return self._sorts[key]
+
+    def view_index(self, groups: np.ndarray, by: Optional[str] = None, ascending: bool = False) -> pd.Index:
+        """Grupos selecionados na ordem pedida (sem by: ordem da planilha)."""
+        if by is None:
+            return pd.Index(groups)
+        order = self.order(by, ascending)
+        selected = np.zeros(len(self), dtype=bool)
+        selected[groups] = True
+        return pd.Index(order[selected[order]])
+
+    def summary(self, df: pd.DataFrame, groups: Iterable[int], columns: List[str]) -> pd.DataFrame:
+        """
+        Uma linha por grupo (índice = id do grupo): colunas da primeira linha
+        do grupo, mais linhas e preco_total (soma do grupo).
+        """
+        groups = np.asarray(list(groups), dtype=np.int64)
+        columns = [c for c in columns if c in df.columns and c != 'preco_total']
+        table = df.iloc[self.first[groups]][columns].copy()
+        table.index = pd.Index(groups)
+        table['linhas'] = self.sizes[groups]
+        table['preco_total'] = self.totals[groups]
+        return table
+
+    def expand(self, df: pd.DataFrame, changes: Dict) -> Dict:
+        """
+        Repassa edições por grupo ({grupo: {coluna: valor}}) a todas as linhas
+        do grupo: {rotulo: {coluna: valor}}, no formato de apply_changes.
+        """
+        expanded = {}
+        for group, row_changes in changes.items():
+            for label in df.index[self.members(int(group))]:
+                expanded.setdefault(label, {}).update(row_changes)
+        return expanded
@@ -6,7 +6,7 @@ import glob
 
 # Ensure we can import from project root
 sys.path.append(os.getcwd())
-from obra_taxonomia.header_utils import detect_header
+from scripts.header_utils import detect_header
 
 def run_test():
     files = glob.glob("data/excel/*.xls*")
@@ -0,0 +1,151 @@
+"""
+Módulo de Amostragem Estratificada
+
+Sorteia uma amostra estratificada das linhas (ex: por aba e unidade) e
+estima, a partir dela, a proporção de cada categoria na tabela inteira com
+intervalo de confiança. Usado na prévia da classificação: antes de
+classificar tudo, a taxa de ok/revisar/desconhecido é estimada em uma
+amostra pequena.
+
+Estimador estratificado com alocação proporcional:
+    p = Σ W_h · p_h,   W_h = N_h / N
+    Var(p) = Σ W_h² · (1 - n_h/N_h) · s²_h / n_h
+com s²_h = p̃_h(1-p̃_h) · n_h/(n_h-1), onde p̃_h = (x_h+1)/(n_h+2): a
+correção de Agresti-Coull evita variância zero em estratos com 0% ou 100%
+na amostra. Estratos com uma única linha sorteada usam a variância máxima
+(0,25), para não fingir precisão que não existe.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+
+# Tamanho padrão da amostra (IC de ±5 pontos percentuais no pior caso)
+DEFAULT_SAMPLE_SIZE = 400
+
+# z do intervalo de 95%
+Z_95 = 1.96
+
+
+def _strata_codes(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Código do estrato de cada linha (combinação dos valores das colunas)."""
+    columns = [c for c in columns if c in df.columns]
+    if not columns:
+        return np.zeros(len(df), dtype=np.intp)
+    combined = np.zeros(len(df), dtype=np.int64)
+    for c in columns:
+        codes, uniques = pd.factorize(df[c], use_na_sentinel=False)
+        combined = combined * len(uniques) + codes
+    return pd.factorize(combined)[0]
+
+
+def stratified_sample(
+    df: pd.DataFrame,
+    strata: List[str],
+    size: int = DEFAULT_SAMPLE_SIZE,
+    eligible: Optional[np.ndarray] = None,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sorteia linhas com alocação proporcional ao tamanho de cada estrato
+    (ao menos uma por estrato; os estratos que receberiam menos de meia
+    linha são reunidos num estrato só).
+
+    Args:
+        df: Tabela completa
+        strata: Colunas que definem os estratos (as ausentes são ignoradas)
+        size: Tamanho aproximado da amostra
+        eligible: Máscara das linhas que podem ser sorteadas (ex: só itens)
+        seed: Semente do sorteio (mesma tabela → mesma amostra)
+
+    Returns:
+        (posições sorteadas em ordem crescente, código do estrato de cada
+        linha da tabela; -1 nas não elegíveis)
+    """
+    codes = _strata_codes(df, strata)
+    if eligible is not None:
+        codes = np.where(eligible, codes, -1)
+
+    valid = codes >= 0
+    population = int(valid.sum())
+    if population == 0:
+        return np.empty(0, dtype=np.intp), codes
+
+    # Estratos pequenos demais para receber uma linha (ex: unidades raras)
+    # viram um estrato único, para a amostra não crescer com o nº de estratos
+    sizes = np.bincount(codes[valid])
+    rare = size * sizes / population < 0.5
+    if rare.any():
+        remap = np.where(rare, -1, np.cumsum(~rare) - 1)
+        remap[rare] = int((~rare).sum())
+        codes = np.where(valid, remap[np.maximum(codes, 0)], -1)
+
+    rng = np.random.default_rng(seed)
+    positions = np.flatnonzero(valid)
+    order = positions[np.argsort(codes[valid], kind='stable')]
+    sizes = np.bincount(codes[valid])
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+
+    picked = []
+    for h, n_pop in enumerate(sizes):
+        if n_pop == 0:
+            continue
+        n_h = min(n_pop, max(1, int(round(size * n_pop / population))))
+        members = order[bounds[h]:bounds[h + 1]]
+        picked.append(rng.choice(members, n_h, replace=False) if n_h < n_pop else members)
+    return np.sort(np.concatenate(picked)), codes
+
+
+def estimate_proportions(
+    values: pd.Series,
+    sample_strata: np.ndarray,
+    population_strata: np.ndarray,
+    categories: Optional[List] = None,
+    z: float = Z_95
+) -> Dict[str, Dict[str, float]]:
+    """
+    Estima a proporção de cada categoria na população a partir da amostra.
+
+    Args:
+        values: Categoria de cada linha sorteada
+        sample_strata: Estrato de cada linha sorteada (alinhado a values)
+        population_strata: Estrato de cada linha da população (-1 = fora)
+        categories: Categorias a estimar (padrão: as que aparecem na amostra)
+        z: Quantil normal do intervalo (1,96 → 95%)
+
+    Returns:
+        {categoria: {'p', 'inferior', 'superior', 'amostra'}} com proporções
+        entre 0 e 1 e 'amostra' = linhas da categoria na amostra
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    sample_strata = np.asarray(sample_strata)
+    population_strata = np.asarray(population_strata)
+    population_strata = population_strata[population_strata >= 0]
+
+    n_strata = int(max(population_strata.max(initial=-1), sample_strata.max(initial=-1))) + 1
+    N_h = np.bincount(population_strata, minlength=n_strata).astype(float)
+    n_h = np.bincount(sample_strata, minlength=n_strata).astype(float)
+    sampled = n_h > 0
+    W_h = N_h / N_h.sum() if N_h.sum() else N_h
+    fpc = np.where(sampled, 1 - n_h / np.maximum(N_h, 1), 0)
+
+    if categories is None:
+        categories = list(pd.unique(values.dropna()))
+
+    estimates = {}
+    for category in categories:
+        hits = np.bincount(sample_strata[(values == category).to_numpy()], minlength=n_strata).astype(float)
+        p_h = np.divide(hits, n_h, out=np.zeros(n_strata), where=sampled)
+        p_adj = (hits + 1) / (n_h + 2)
+        s2_h = np.where(n_h > 1, p_adj * (1 - p_adj) * n_h / np.maximum(n_h - 1, 1), 0.25)
+        var = float(np.sum(np.where(sampled, W_h ** 2 * fpc * s2_h / np.maximum(n_h, 1), 0)))
+        p = float(np.sum(W_h * p_h))
+        half = z * float(np.sqrt(var))
+        estimates[category] = {
+            'p': p,
+            'inferior': max(0.0, p - half),
+            'superior': min(1.0, p + half),
+            'amostra': int(hits.sum()),
+        }
+    return estimates
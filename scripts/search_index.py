@@ -0,0 +1,106 @@
+"""
+Módulo de Índice de Busca
+
+Índice invertido de trigramas para a busca por trecho de descrição da tela
+de validação. Os textos passam pelo mesmo normalize_text do resto do
+sistema (sem acento, minúsculas, só letras e dígitos), então a busca não
+diferencia acentos nem maiúsculas.
+
+Cada texto distinto entra uma vez no índice (trigrama → ids de texto); uma
+consulta cruza as listas dos seus trigramas, confirma o trecho só nos
+candidatos e devolve as linhas desses textos, sem percorrer a tabela.
+"""
+
+import numpy as np
+import pandas as pd
+from collections import OrderedDict, defaultdict
+from typing import List, Optional
+
+from scripts.utils import normalize_text
+
+
+# Consultas recentes guardadas por índice (reruns repetem a mesma busca)
+QUERY_CACHE_SIZE = 32
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Índice de trigramas sobre uma ou mais colunas de texto da mesma tabela."""
+
+    def __init__(self, columns: List[pd.Series]):
+        """
+        Args:
+            columns: Colunas de texto alinhadas (ex: descricao e descricao_norm);
+                uma linha casa se o trecho aparece em qualquer uma delas
+        """
+        self.n = len(columns[0]) if columns else 0
+        raw = pd.concat([c.reset_index(drop=True) for c in columns], ignore_index=True) if columns else pd.Series([], dtype=object)
+
+        # Normaliza só os valores distintos e reagrupa pelos textos normalizados
+        raw_codes, raw_uniques = pd.factorize(raw, use_na_sentinel=True)
+        normalized = pd.Series([normalize_text(v) for v in raw_uniques], dtype=object)
+        norm_codes, vocab = pd.factorize(normalized)
+        codes = np.where(raw_codes >= 0, np.asarray(norm_codes)[np.maximum(raw_codes, 0)], -1)
+
+        # Linhas de cada texto (posições módulo n: as colunas são empilhadas)
+        valid = codes >= 0
+        rows = (np.arange(len(codes)) % max(self.n, 1))[valid]
+        codes = codes[valid]
+        order = np.argsort(codes, kind='stable')
+        self._rows = rows[order]
+        self._bounds = np.searchsorted(codes[order], np.arange(len(vocab) + 1))
+        self._vocab = list(vocab)
+
+        postings = defaultdict(list)
+        for text_id, text in enumerate(self._vocab):
+            for gram in _trigrams(text):
+                postings[gram].append(text_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._vocab)
+
+    def search(self, query: str) -> Optional[np.ndarray]:
+        """
+        Posições (ordenadas) das linhas cujo texto normalizado contém a
+        consulta normalizada; None se a consulta ficar vazia (sem filtro).
+        """
+        q = normalize_text(query)
+        if not q:
+            return None
+        if q in self._cache:
+            self._cache.move_to_end(q)
+            return self._cache[q]
+
+        if len(q) < 3:
+            # Curta demais para trigramas: confere o vocabulário (textos distintos)
+            candidates = range(len(self._vocab))
+        else:
+            lists = []
+            for gram in _trigrams(q):
+                ids = self._postings.get(gram)
+                if ids is None:
+                    lists = []
+                    break
+                lists.append(ids)
+            lists.sort(key=len)
+            candidates = lists[0] if lists else np.empty(0, dtype=np.int32)
+            for ids in lists[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+        matched = [i for i in candidates if q in self._vocab[i]]
+        if matched:
+            result = np.unique(np.concatenate([self._rows[self._bounds[i]:self._bounds[i + 1]] for i in matched]))
+        else:
+            result = np.empty(0, dtype=np.int64)
+
+        self._cache[q] = result
+        if len(self._cache) > QUERY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
@@ -0,0 +1,158 @@
+"""
+Módulo de Armazenamento de Sessão (Arrow)
+
+Guarda os dados de cada etapa do app (raw, struct, norm, validated) como
+tabelas Arrow dentro do st.session_state, no lugar de textos CSV que eram
+gerados com to_csv e relidos com read_csv a cada página.
+
+- Colunas que não mudaram entre uma etapa e a anterior (base) são
+  compartilhadas: a nova tabela reaproveita os mesmos buffers.
+- get() devolve um DataFrame sem cópia para colunas numéricas e de texto
+  (pandas com Copy-on-Write: alterar o DataFrame não altera a etapa).
+- Cada put() recebe uma versão nova, usada pelas páginas como chave de
+  cache no lugar do hash do CSV; fingerprint() dá o hash do conteúdo
+  (para o cache de etapas, que precisa reconhecer dados iguais).
+"""
+
+import hashlib
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, Hashable, Optional
+
+from scripts.workbook_cache import to_parquet_frame
+
+
+STAGE_RAW = 'raw'
+STAGE_STRUCT = 'struct'
+STAGE_NORM = 'norm'
+STAGE_VALIDATED = 'validated'
+
+# Etapa anterior de cada etapa (de onde as colunas inalteradas são herdadas)
+STAGE_BASE = {
+    STAGE_STRUCT: STAGE_RAW,
+    STAGE_NORM: STAGE_STRUCT,
+    STAGE_VALIDATED: STAGE_NORM,
+}
+
+SESSION_KEY = 'data_store'
+
+
+class SessionStore:
+    """Tabelas Arrow por etapa, com versão e chave de origem."""
+
+    def __init__(self):
+        self._tables: Dict[str, pa.Table] = {}
+        self._versions: Dict[str, int] = {}
+        self._keys: Dict[str, Hashable] = {}
+        self._fingerprints: Dict[str, tuple] = {}
+        self._counter = 0
+
+    def __contains__(self, stage: str) -> bool:
+        return stage in self._tables
+
+    def put(self, stage: str, df: pd.DataFrame, base: Optional[str] = None, key: Hashable = None) -> pa.Table:
+        """
+        Grava uma etapa.
+
+        Args:
+            stage: Nome da etapa (STAGE_*)
+            df: Dados da etapa (o índice não é guardado)
+            base: Etapa cujas colunas idênticas são compartilhadas
+                (padrão: STAGE_BASE[stage])
+            key: Identificação da origem dos dados (ex: digest do arquivo +
+                abas); se for igual à da etapa gravada, nada é refeito
+
+        Returns:
+            Tabela Arrow gravada
+        """
+        if key is not None and stage in self._tables and self._keys.get(stage) == key:
+            return self._tables[stage]
+
+        table = pa.Table.from_pandas(to_parquet_frame(df), preserve_index=False)
+        base_table = self._tables.get(base or STAGE_BASE.get(stage))
+        if base_table is not None:
+            table = _share_columns(table, base_table)
+
+        self._counter += 1
+        self._tables[stage] = table
+        self._versions[stage] = self._counter
+        self._keys[stage] = key
+        return table
+
+    def get(self, stage: str) -> Optional[pd.DataFrame]:
+        """DataFrame da etapa (sem cópia onde o tipo permite), ou None se não existir."""
+        table = self._tables.get(stage)
+        if table is None:
+            return None
+        return table.to_pandas(split_blocks=True)
+
+    def table(self, stage: str) -> Optional[pa.Table]:
+        return self._tables.get(stage)
+
+    def version(self, stage: str) -> int:
+        """Versão da etapa (0 se não existir); muda a cada put()."""
+        return self._versions.get(stage, 0)
+
+    def fingerprint(self, stage: str) -> Optional[str]:
+        """
+        Hash do conteúdo da etapa (schema + dados), calculado uma vez por versão.
+
+        Serializa a tabela em Arrow IPC (que normaliza fatias e preenchimento
+        dos buffers) e aplica BLAKE2b: ~65 ms para 30 MB.
+        """
+        table = self._tables.get(stage)
+        if table is None:
+            return None
+        version = self._versions[stage]
+        cached = self._fingerprints.get(stage)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        digest = hashlib.blake2b(sink.getvalue(), digest_size=16).hexdigest()
+        self._fingerprints[stage] = (version, digest)
+        return digest
+
+    def drop(self, *stages: str):
+        for stage in stages:
+            self._tables.pop(stage, None)
+            self._versions.pop(stage, None)
+            self._keys.pop(stage, None)
+            self._fingerprints.pop(stage, None)
+
+    def nbytes(self) -> int:
+        """Memória total das etapas, contando uma vez os buffers compartilhados."""
+        seen = {}
+        for table in self._tables.values():
+            for column in table.columns:
+                for chunk in column.chunks:
+                    for buf in chunk.buffers():
+                        if buf is not None:
+                            seen[buf.address] = buf.size
+        return sum(seen.values())
+
+    def stage_nbytes(self) -> Dict[str, int]:
+        """Memória de cada etapa isoladamente (buffers compartilhados contam em todas)."""
+        return {stage: table.nbytes for stage, table in self._tables.items()}
+
+
+def _share_columns(table: pa.Table, base: pa.Table) -> pa.Table:
+    """Troca as colunas iguais às da etapa base pelas colunas da base (mesmos buffers)."""
+    base_names = set(base.column_names)
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if name in base_names:
+            base_column = base.column(name)
+            if base_column.type == column.type and base_column.equals(column):
+                column = base_column
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=table.schema)
+
+
+def get_session_store(state) -> SessionStore:
+    """SessionStore da sessão (criado na primeira chamada); state é o st.session_state."""
+    if SESSION_KEY not in state:
+        state[SESSION_KEY] = SessionStore()
+    return state[SESSION_KEY]
@@ -0,0 +1,156 @@
+"""
+Módulo de Cache de Etapas
+
+Guarda resultados das etapas do app (cabeçalho aplicado, tabela estruturada,
+normalização, classificação) indexados por um hash de tudo que os determina:
+o conteúdo da entrada (SessionStore.fingerprint), a configuração da etapa
+(header_row, colmap, config de normalização) e a taxonomia em uso. Voltar a
+uma configuração já usada devolve o resultado sem recalcular.
+
+O cache fica no st.session_state (um por sessão), limitado em bytes, e
+descarta os resultados usados há mais tempo (LRU).
+"""
+
+import sys
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+
+# Memória máxima do cache por sessão (bytes)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SESSION_KEY = 'stage_cache'
+
+
+def make_key(stage: str, *parts) -> str:
+    """Chave estável de uma etapa a partir de partes serializáveis em JSON (dicts em qualquer ordem)."""
+    payload = json.dumps([stage, *parts], sort_keys=True, ensure_ascii=False, default=str)
+    return f"{stage}:{hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()}"
+
+
+def taxonomy_fingerprint(builder) -> str:
+    """Hash das regras e do mapa de unidades carregados (muda quando os YAMLs mudam)."""
+    payload = json.dumps(
+        [builder.rules_cache, builder.units_map],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def estimate_bytes(value: Any) -> int:
+    """Tamanho aproximado em memória de um resultado (DataFrames, arrays e coleções deles)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        if value and not isinstance(value[0], (pd.DataFrame, pd.Series, np.ndarray, list, tuple, dict)):
+            # Lista homogênea de itens simples (ex: audit log): mede uma amostra
+            sample = value[:100]
+            return sys.getsizeof(value) + int(sum(estimate_bytes(v) for v in sample) * len(value) / len(sample))
+        return sys.getsizeof(value) + sum(estimate_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def _detached(value: Any) -> Any:
+    """
+    Cópia rasa de DataFrames/Series (sem copiar dados, com Copy-on-Write),
+    para que alterações de quem recebe não mudem o valor guardado.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(_detached(v) for v in value)
+    return value
+
+
+class StageCache:
+    """Cache LRU de resultados de etapas, limitado pelo total de bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str, default=None):
+        """Resultado guardado (marcado como usado agora), ou default."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return _detached(entry[0])
+
+    def put(self, key: str, value: Any) -> Any:
+        """
+        Guarda um resultado e descarta os mais antigos até caber em max_bytes.
+        Resultados maiores que o limite inteiro não são guardados.
+        """
+        size = estimate_bytes(value)
+        self.discard(key)
+        if size > self.max_bytes:
+            return value
+
+        self._entries[key] = (_detached(value), size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+        return value
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Resultado da chave, calculando e guardando se não existir.
+
+        Returns:
+            (resultado, veio_do_cache)
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return self.get(key), True
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return _detached(value), False
+
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self, stage: str = None):
+        """Limpa tudo, ou só as entradas de uma etapa."""
+        for key in list(self._entries):
+            if stage is None or key.startswith(f"{stage}:"):
+                self.discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def get_stage_cache(state, max_bytes: int = DEFAULT_MAX_BYTES) -> StageCache:
+    """StageCache da sessão (criado na primeira chamada); state é o st.session_state."""
+    if SESSION_KEY not in state:
+        state[SESSION_KEY] = StageCache(max_bytes)
+    return state[SESSION_KEY]
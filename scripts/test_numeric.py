@@ -0,0 +1,48 @@
+"""
+Script de teste da conversão numérica (scripts/numeric.py).
+Verifica colunas pt-BR, colunas em formato americano e colunas mistas em que
+números da planilha chegam como texto de str(float) ("100.0").
+"""
+import sys
+import os
+import pandas as pd
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.numeric import parse_numeric_series
+
+
+CASOS = [
+    # (descrição, valores, esperado, decimal esperado)
+    ("pt-BR em texto", ['1.234,56', 'R$ 12,50', '(1.000,00)', '7'], [1234.56, 12.5, -1000.0, 7.0], ','),
+    ("americano em texto", ['1,234.56', '12.5', '7.25'], [1234.56, 12.5, 7.25], '.'),
+    ("só str(float)", ['100.0', '2.5', '7.25'], [100.0, 2.5, 7.25], '.'),
+    ("misto str(float) + pt-BR", ['100.0', '2.5', 'R$ 1.234,56', '7.25'], [100.0, 2.5, 1234.56, 7.25], ','),
+    ("misto tipado + pt-BR", [100.0, 2.5, 'R$ 1.234,56', 7.25], [100.0, 2.5, 1234.56, 7.25], ','),
+    ("milhar ambíguo pt-BR", ['1.234', '12,5'], [1234.0, 12.5], ','),
+]
+
+
+def test_parse_numeric():
+    """Confere valor convertido, decimal detectado e ausência de falhas em cada caso."""
+    falhas = 0
+    for nome, valores, esperado, decimal in CASOS:
+        result, report = parse_numeric_series(pd.Series(valores, dtype=object))
+        ok = (
+            result.round(6).tolist() == esperado
+            and report['decimal'] == decimal
+            and report['falhas'] == 0
+        )
+        if ok:
+            print(f"[OK] {nome}")
+        else:
+            falhas += 1
+            print(f"[X] {nome}: obteve {result.tolist()} (decimal {report['decimal']!r}, falhas {report['falhas']})")
+
+    print(f"\n{len(CASOS) - falhas}/{len(CASOS)} casos corretos")
+    return falhas == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if test_parse_numeric() else 1)
@@ -0,0 +1,70 @@
+"""
+Script de teste do cache de planilhas (scripts/workbook_cache.py).
+Confere que read_workbook_cached devolve as mesmas abas (valores e tipos)
+na primeira leitura (Excel) e na segunda (cache em Parquet), inclusive em
+colunas que misturam números e texto.
+"""
+import sys
+import os
+import glob
+import datetime
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.workbook_cache import read_workbook_cached, encode_sheet, decode_sheet
+
+EXCEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'excel')
+
+
+def test_fixtures() -> bool:
+    """Cada planilha de data/excel: leitura sem cache == leitura do cache."""
+    falhas = 0
+    paths = sorted(glob.glob(os.path.join(EXCEL_DIR, '*.xls*')))
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            miss = read_workbook_cached(data, path, cache_dir=cache_dir)
+            hit = read_workbook_cached(data, path, cache_dir=cache_dir)
+            try:
+                assert not miss['cached'] and hit['cached'], "segunda leitura não veio do cache"
+                assert list(miss['sheets']) == list(hit['sheets']), "abas diferentes"
+                for name in miss['sheets']:
+                    pd.testing.assert_frame_equal(miss['sheets'][name], hit['sheets'][name])
+                print(f"[OK] {os.path.basename(path)}")
+            except AssertionError as e:
+                falhas += 1
+                print(f"[X] {os.path.basename(path)}: {str(e).splitlines()[0]}")
+
+    print(f"\n{len(paths) - falhas}/{len(paths)} planilhas idênticas no cache")
+    return falhas == 0
+
+
+def test_cell_types() -> bool:
+    """Coluna object com todos os tipos de célula suportados."""
+    values = [
+        None, float('nan'), 100.0, '100.0', 'R$ 1.234,56', 7, np.int64(8), True,
+        datetime.date(2024, 1, 31), datetime.datetime(2024, 1, 31, 8, 30),
+        datetime.time(8, 30), pd.Timestamp('2024-01-31 08:30'), pd.NaT,
+    ]
+    df = pd.DataFrame({'MISTA': pd.Series(values, dtype=object), 'VALOR': np.arange(len(values), dtype=float)})
+    stored, columns = encode_sheet(df)
+    result = decode_sheet(stored, columns, len(df))
+    try:
+        pd.testing.assert_frame_equal(df, result)
+        assert [type(v) for v in result['MISTA']][:6] == [type(None), float, float, str, str, int]
+        print("[OK] tipos de célula")
+        return True
+    except AssertionError as e:
+        print(f"[X] tipos de célula: {str(e).splitlines()[0]}")
+        return False
+
+
+if __name__ == '__main__':
+    ok = test_cell_types()
+    ok = test_fixtures() and ok
+    sys.exit(0 if ok else 1)
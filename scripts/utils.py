@@ -1,28 +1,55 @@
 import re
+import sys
+import json
+import time
 import unicodedata
 import os
+import atexit
+import threading
+import importlib.util
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Dict, Tuple
 
+# Caracteres acentuados comuns em PT-BR (e símbolos de unidade) com a mesma
+# saída que o caminho NFKD + ASCII produziria, pré-computados numa tabela.
+_PT_ACCENTED_CHARS = (
+    'áàâãäéèêëíìîïóòôõöúùûüçñýÿ'
+    'ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑÝ'
+    'ºª¹²³'
+)
+_ACCENT_TABLE = str.maketrans({
+    c: unicodedata.normalize('NFKD', c).encode('ASCII', 'ignore').decode('ASCII')
+    for c in _PT_ACCENTED_CHARS
+})
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+@lru_cache(maxsize=65536)
+def _normalize_str(text: str) -> str:
+    # Fast path: texto ASCII não precisa de tabela nem de NFKD
+    if not text.isascii():
+        text = text.translate(_ACCENT_TABLE)
+        # Fallback para caracteres fora da tabela (ex: 'ø', ligaduras)
+        if not text.isascii():
+            text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+    text = text.lower()
+    # Remove caracteres especiais e colapsa espaços numa única passada
+    return ' '.join(_NON_ALNUM_RE.sub(' ', text).split())
+
+
 def normalize_text(text):
     """
     Remove acentos, converte para minúsculas e remove caracteres especiais.
     Ex: 'Cimento Portland CP-II' -> 'cimento portland cp ii'
+
+    Resultados são memoizados (LRU), então textos repetidos ou já
+    normalizados custam apenas um lookup.
     """
     if not isinstance(text, str):
         return str(text).lower() if text is not None else ""
-        
-    # Unicode normalize (remove acentos)
-    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
-    text = text.lower()
-    
-    # Remove caracteres especiais (mantém apenas letras, números e espaços)
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    
-    # Remove espaços duplos
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
+
+    return _normalize_str(text)
 
 def normalize_unit(unit):
     """
@@ -108,7 +135,8 @@ def xlsx_to_csv_openpyxl(xlsx_path: str, output_dir: str) -> Tuple[bool, str, Li
         from openpyxl import load_workbook
         import csv
         
-        workbook = load_workbook(xlsx_path, data_only=True)
+        # read_only: linhas lidas sob demanda, sem montar o modelo do workbook
+        workbook = load_workbook(xlsx_path, data_only=True, read_only=True)
         output_files = []
         
         for sheet_name in workbook.sheetnames:
@@ -123,6 +151,7 @@ def xlsx_to_csv_openpyxl(xlsx_path: str, output_dir: str) -> Tuple[bool, str, Li
             
             output_files.append(output_path)
         
+        workbook.close()
         return True, f"Openpyxl: {len(output_files)} sheets converted", output_files
     except Exception as e:
         return False, f"Openpyxl failed: {str(e)}", []
@@ -137,21 +166,33 @@ def xlsx_to_csv_polars(xlsx_path: str, output_dir: str) -> Tuple[bool, str, List
         import polars as pl
         from openpyxl import load_workbook
         
-        workbook = load_workbook(xlsx_path, data_only=True)
+        workbook = load_workbook(xlsx_path, data_only=True, read_only=True)
         output_files = []
         
         for sheet_name in workbook.sheetnames:
-            # Polars não lê XLSX diretamente, então usamos openpyxl para extrair dados
-            sheet = workbook[sheet_name]
-            data = list(sheet.iter_rows(values_only=True))
+            # Polars não lê XLSX diretamente, então usamos openpyxl (read_only) para
+            # extrair os dados em lotes, gravando o CSV de forma incremental
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            
+            schema = _dedupe_header(list(header))
+            safe_name = re.sub(r'[^\w\s-]', '_', sheet_name)
+            output_path = os.path.join(output_dir, f"{safe_name}.csv")
             
-            if data:
-                df = pl.DataFrame(data[1:], schema=data[0], orient='row')
-                safe_name = re.sub(r'[^\w\s-]', '_', sheet_name)
-                output_path = os.path.join(output_dir, f"{safe_name}.csv")
-                df.write_csv(output_path)
-                output_files.append(output_path)
+            with open(output_path, 'wb') as f:
+                first = True
+                for batch in _iter_row_batches(rows, DEFAULT_BATCH_SIZE):
+                    batch = [tuple(r[:len(schema)]) + (None,) * (len(schema) - len(r)) for r in batch]
+                    df = pl.DataFrame(batch, schema=schema, orient='row', infer_schema_length=None)
+                    df.write_csv(f, include_header=first)
+                    first = False
+                if first:
+                    pl.DataFrame(schema=schema).write_csv(f)
+            output_files.append(output_path)
         
+        workbook.close()
         return True, f"Polars: {len(output_files)} sheets converted", output_files
     except Exception as e:
         return False, f"Polars failed: {str(e)}", []
@@ -280,6 +321,199 @@ def xlsx_to_csv_calamine(xlsx_path: str, output_dir: str) -> Tuple[bool, str, Li
         return False, f"Calamine failed: {str(e)}", []
 
 
+# ============================================================================
+# Engine Probing & Ranking - quais métodos existem e qual é o mais rápido
+# ============================================================================
+
+# Ordem padrão (mais rápidos primeiro) quando não há ranking de benchmark salvo
+DEFAULT_ENGINE_ORDER = ['calamine', 'pandas', 'openpyxl', 'xlsx2csv', 'polars', 'pyexcel', 'win32com', 'xlwings']
+
+# Formatos que cada engine consegue ler
+EXCEL_ENGINE_FORMATS = {
+    'calamine': {'.xlsx', '.xlsm', '.xlsb', '.xls', '.ods'},
+    'pandas': {'.xlsx', '.xlsm', '.xls', '.ods'},
+    'openpyxl': {'.xlsx', '.xlsm'},
+    'xlsx2csv': {'.xlsx', '.xlsm'},
+    'polars': {'.xlsx', '.xlsm', '.xlsb', '.xls', '.ods'},
+    'pyexcel': {'.xlsx', '.xlsm', '.xls', '.ods'},
+    'win32com': {'.xlsx', '.xlsm', '.xlsb', '.xls', '.ods'},
+    'xlwings': {'.xlsx', '.xlsm', '.xlsb', '.xls'},
+}
+
+# Módulos necessários por engine (e por extensão, quando depende do formato)
+_ENGINE_MODULES = {
+    'calamine': ['python_calamine'],
+    'pandas': ['pandas'],
+    'openpyxl': ['openpyxl'],
+    'xlsx2csv': ['xlsx2csv', 'openpyxl'],
+    'polars': ['polars', 'fastexcel'],
+    'pyexcel': ['pyexcel'],
+    'win32com': ['win32com'],
+    'xlwings': ['xlwings'],
+}
+_ENGINE_FORMAT_MODULES = {
+    ('pandas', '.xlsx'): 'openpyxl',
+    ('pandas', '.xlsm'): 'openpyxl',
+    ('pandas', '.xls'): 'xlrd',
+    ('pandas', '.ods'): 'odf',
+    ('pyexcel', '.xlsx'): 'pyexcel_xlsx',
+    ('pyexcel', '.xlsm'): 'pyexcel_xlsx',
+    ('pyexcel', '.xls'): 'pyexcel_xls',
+    ('pyexcel', '.ods'): 'pyexcel_ods3',
+}
+
+# Automação do Excel só existe onde o Excel existe
+_ENGINE_PLATFORMS = {
+    'win32com': ('win32',),
+    'xlwings': ('win32', 'darwin'),
+}
+
+ENGINE_RANKING_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'data', 'output', 'excel_engine_ranking.json'
+)
+
+
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@lru_cache(maxsize=1)
+def probe_excel_engines() -> Dict[str, bool]:
+    """
+    Verifica uma única vez por processo quais engines podem ser usadas
+    (módulos instaláveis + plataforma), sem importar os módulos.
+    """
+    available = {}
+    for engine, modules in _ENGINE_MODULES.items():
+        platforms = _ENGINE_PLATFORMS.get(engine)
+        if platforms and not sys.platform.startswith(platforms):
+            available[engine] = False
+            continue
+        available[engine] = all(_module_available(m) for m in modules)
+    return available
+
+
+def engine_supports(engine: str, ext: str) -> bool:
+    """Engine disponível e capaz de ler a extensão (ex: '.xls')."""
+    ext = ext.lower()
+    if not probe_excel_engines().get(engine, False):
+        return False
+    if ext not in EXCEL_ENGINE_FORMATS.get(engine, set()):
+        return False
+    module = _ENGINE_FORMAT_MODULES.get((engine, ext))
+    return module is None or _module_available(module)
+
+
+@lru_cache(maxsize=1)
+def load_engine_ranking(path: str = ENGINE_RANKING_PATH) -> Dict[str, List[str]]:
+    """Carrega o ranking salvo por benchmark_excel_engines (vazio se não existir)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {ext: [r['method'] for r in results] for ext, results in data.get('ranking', {}).items()}
+    except Exception as e:
+        print(f"Erro lendo ranking de engines {path}: {e}")
+        return {}
+
+
+def get_engine_order(ext: str, methods: Optional[List[str]] = None) -> List[str]:
+    """
+    Ordem de tentativa para uma extensão: engines do ranking de benchmark
+    (mais rápida primeiro), depois as demais na ordem padrão. Engines
+    indisponíveis ou que não leem o formato ficam de fora.
+    """
+    ext = ext.lower()
+    candidates = methods if methods is not None else DEFAULT_ENGINE_ORDER
+    ranked = load_engine_ranking().get(ext, [])
+    order = [m for m in ranked if m in candidates]
+    order += [m for m in DEFAULT_ENGINE_ORDER if m in candidates and m not in order]
+    order += [m for m in candidates if m not in order]
+    return [m for m in order if engine_supports(m, ext)]
+
+
+def benchmark_excel_engines(
+    fixtures_dir: str = 'data/excel',
+    methods: Optional[List[str]] = None,
+    repeat: int = 1,
+    save_path: Optional[str] = ENGINE_RANKING_PATH
+) -> Dict[str, List[Dict]]:
+    """
+    Mede a vazão (linhas/s) de cada engine disponível sobre as planilhas de
+    fixtures_dir, usando a leitura em memória, e ranqueia por extensão.
+    
+    Args:
+        fixtures_dir: Diretório com planilhas de exemplo
+        methods: Engines a medir (padrão: todas as disponíveis)
+        repeat: Repetições por arquivo (usa o melhor tempo)
+        save_path: Onde salvar o ranking em JSON (None para não salvar)
+    
+    Returns:
+        Dict {extensão: [{method, rows, seconds, rows_per_sec, failures}, ...]}
+        ordenado da engine mais rápida para a mais lenta
+    """
+    readers = _in_memory_readers('.xlsx')
+    methods = [m for m in (methods or DEFAULT_ENGINE_ORDER) if m in readers]
+    
+    totals = {}  # (ext, method) -> [rows, seconds, failures]
+    for fname in sorted(os.listdir(fixtures_dir)):
+        ext = os.path.splitext(fname)[1].lower()
+        if ext == '.csv' or ext not in EXCEL_ENGINE_FORMATS['calamine']:
+            continue
+        with open(os.path.join(fixtures_dir, fname), 'rb') as f:
+            data = f.read()
+        
+        readers = _in_memory_readers(ext)
+        for method in methods:
+            if not engine_supports(method, ext):
+                continue
+            entry = totals.setdefault((ext, method), [0, 0.0, 0])
+            best = None
+            for _ in range(max(1, repeat)):
+                start = time.perf_counter()
+                success, _, sheets = readers[method](data)
+                elapsed = time.perf_counter() - start
+                if not success:
+                    best = None
+                    break
+                best = elapsed if best is None else min(best, elapsed)
+            if best is None:
+                entry[2] += 1
+                continue
+            entry[0] += sum(len(df) for df in sheets.values())
+            entry[1] += best
+    
+    ranking = {}
+    for (ext, method), (rows, seconds, failures) in totals.items():
+        if failures or seconds <= 0:
+            # Engine que falhou em algum arquivo vai para o fim do ranking
+            rows_per_sec = 0.0
+        else:
+            rows_per_sec = rows / seconds
+        ranking.setdefault(ext, []).append({
+            'method': method,
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'rows_per_sec': round(rows_per_sec, 1),
+            'failures': failures
+        })
+    for results in ranking.values():
+        results.sort(key=lambda r: r['rows_per_sec'], reverse=True)
+    
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump({'platform': sys.platform, 'fixtures_dir': fixtures_dir, 'ranking': ranking}, f, indent=2)
+        load_engine_ranking.cache_clear()
+    
+    return ranking
+
+
 def convert_xlsx_to_csv_all_methods(
     xlsx_path: str, 
     output_dir: Optional[str] = None,
@@ -334,17 +568,9 @@ def convert_xlsx_to_csv_all_methods(
     if preferred_methods:
         methods_to_try = [(m, all_methods[m]) for m in preferred_methods if m in all_methods]
     else:
-        # Ordem padrão: mais comuns primeiro
-        methods_to_try = [
-            ('pandas', xlsx_to_csv_pandas),
-            ('openpyxl', xlsx_to_csv_openpyxl),
-            ('xlsx2csv', xlsx_to_csv_xlsx2csv),
-            ('polars', xlsx_to_csv_polars),
-            ('win32com', xlsx_to_csv_win32com),
-            ('xlwings', xlsx_to_csv_xlwings),
-            ('pyexcel', xlsx_to_csv_pyexcel),
-            ('calamine', xlsx_to_csv_calamine),
-        ]
+        # Ordem padrão: engines disponíveis, mais rápida primeiro (ranking de benchmark)
+        ext = os.path.splitext(xlsx_path)[1]
+        methods_to_try = [(m, all_methods[m]) for m in get_engine_order(ext, list(all_methods))]
     
     attempts = []
     
@@ -376,3 +602,531 @@ def convert_xlsx_to_csv_all_methods(
         'output_files': [],
         'attempts': attempts
     }
+
+
+# ============================================================================
+# In-Memory Excel Ingestion - bytes -> DataFrames (sem arquivos temporários)
+# ============================================================================
+
+def _dedupe_header(header: List) -> List[str]:
+    """
+    Nomes de coluna como pd.read_csv daria ao CSV equivalente
+    ('Unnamed: N' para vazios, sufixo '.N' para repetidos).
+    """
+    columns = []
+    seen = {}
+    for i, name in enumerate(header):
+        if name is None or (isinstance(name, float) and name != name) or str(name).strip() == '':
+            name = f"Unnamed: {i}"
+        name = str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _rows_to_dataframe(rows: List[tuple]):
+    """
+    Converte linhas cruas (primeira linha = cabeçalho) em DataFrame, com os
+    mesmos nomes de coluna que pd.read_csv daria ao CSV equivalente.
+    """
+    import pandas as pd
+
+    rows = [list(r) if isinstance(r, (list, tuple)) else [r] for r in rows]
+    if not rows:
+        return pd.DataFrame()
+
+    width = max(len(r) for r in rows)
+    columns = _dedupe_header(rows[0] + [None] * (width - len(rows[0])))
+
+    data = [r + [None] * (width - len(r)) for r in rows[1:]]
+    df = pd.DataFrame(data, columns=columns)
+    # Células vazias como NaN (igual ao read_csv) e tipos inferidos por coluna
+    return df.replace('', None).infer_objects()
+
+
+def xlsx_to_dataframes_pandas(data: bytes, sheet_names: Optional[List[str]] = None) -> Tuple[bool, str, Dict]:
+    """
+    Método 1: Pandas (Padrão de mercado para dados)
+    Requer: pandas, openpyxl (xlsx) ou xlrd (xls)
+    """
+    try:
+        import io
+        import pandas as pd
+
+        sheets = pd.read_excel(io.BytesIO(data), sheet_name=sheet_names)
+        return True, f"Pandas: {len(sheets)} sheets parsed", sheets
+    except Exception as e:
+        return False, f"Pandas failed: {str(e)}", {}
+
+
+def xlsx_to_dataframes_openpyxl(data: bytes, sheet_names: Optional[List[str]] = None) -> Tuple[bool, str, Dict]:
+    """
+    Método 3: Openpyxl (modo read_only, iterando linhas)
+    Requer: openpyxl
+    """
+    try:
+        import io
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(io.BytesIO(data), data_only=True, read_only=True)
+        sheets = {}
+        for sheet_name in sheet_names or workbook.sheetnames:
+            rows = list(workbook[sheet_name].iter_rows(values_only=True))
+            sheets[sheet_name] = _rows_to_dataframe(rows)
+        workbook.close()
+
+        return True, f"Openpyxl: {len(sheets)} sheets parsed", sheets
+    except Exception as e:
+        return False, f"Openpyxl failed: {str(e)}", {}
+
+
+def xlsx_to_dataframes_polars(data: bytes, sheet_names: Optional[List[str]] = None) -> Tuple[bool, str, Dict]:
+    """
+    Método 4: Polars (Performance ultra-rápida)
+    Requer: polars, fastexcel
+    """
+    try:
+        import io
+        import polars as pl
+
+        if sheet_names:
+            frames = pl.read_excel(io.BytesIO(data), sheet_name=list(sheet_names))
+        else:
+            frames = pl.read_excel(io.BytesIO(data), sheet_id=0)
+        sheets = {name: df.to_pandas() for name, df in frames.items()}
+        return True, f"Polars: {len(sheets)} sheets parsed", sheets
+    except Exception as e:
+        return False, f"Polars failed: {str(e)}", {}
+
+
+def xlsx_to_dataframes_xlsx2csv(data: bytes, sheet_names: Optional[List[str]] = None) -> Tuple[bool, str, Dict]:
+    """
+    Método 5: Xlsx2csv (CSV gerado em memória, sem disco)
+    Requer: xlsx2csv
+    """
+    try:
+        import io
+        import pandas as pd
+        from xlsx2csv import Xlsx2csv
+
+        converter = Xlsx2csv(io.BytesIO(data), outputencoding="utf-8")
+        sheets = {}
+        for sheet in converter.workbook.sheets:
+            if sheet_names and sheet['name'] not in sheet_names:
+                continue
+            buffer = io.StringIO()
+            converter.convert(buffer, sheetid=sheet['index'])
+            buffer.seek(0)
+            try:
+                sheets[sheet['name']] = pd.read_csv(buffer)
+            except pd.errors.EmptyDataError:
+                sheets[sheet['name']] = pd.DataFrame()
+
+        return True, f"Xlsx2csv: {len(sheets)} sheets parsed", sheets
+    except Exception as e:
+        return False, f"Xlsx2csv failed: {str(e)}", {}
+
+
+def xlsx_to_dataframes_pyexcel(data: bytes, sheet_names: Optional[List[str]] = None, file_type: str = 'xlsx') -> Tuple[bool, str, Dict]:
+    """
+    Método 7: Pyexcel (API unificada e simples)
+    Requer: pyexcel, pyexcel-xlsx
+    """
+    try:
+        import pyexcel as pe
+
+        book = pe.get_book(file_type=file_type, file_content=data)
+        sheets = {name: _rows_to_dataframe(book[name].to_array()) for name in sheet_names or book.sheet_names()}
+        return True, f"Pyexcel: {len(sheets)} sheets parsed", sheets
+    except Exception as e:
+        return False, f"Pyexcel failed: {str(e)}", {}
+
+
+def xlsx_to_dataframes_calamine(data: bytes, sheet_names: Optional[List[str]] = None) -> Tuple[bool, str, Dict]:
+    """
+    Método 8: Python-Calamine (Leitura de alta velocidade baseada em Rust)
+    Requer: python-calamine
+    """
+    try:
+        import io
+        from python_calamine import CalamineWorkbook
+
+        workbook = CalamineWorkbook.from_filelike(io.BytesIO(data))
+        sheets = {}
+        for sheet_name in sheet_names or workbook.sheet_names:
+            rows = workbook.get_sheet_by_name(sheet_name).to_python()
+            sheets[sheet_name] = _rows_to_dataframe(rows)
+
+        return True, f"Calamine: {len(sheets)} sheets parsed", sheets
+    except Exception as e:
+        return False, f"Calamine failed: {str(e)}", {}
+
+
+def _in_memory_readers(ext: str) -> Dict:
+    """Leitores bytes -> DataFrames por engine (pyexcel depende da extensão)."""
+    return {
+        'pandas': xlsx_to_dataframes_pandas,
+        'openpyxl': xlsx_to_dataframes_openpyxl,
+        'xlsx2csv': xlsx_to_dataframes_xlsx2csv,
+        'polars': xlsx_to_dataframes_polars,
+        'pyexcel': lambda d, names=None: xlsx_to_dataframes_pyexcel(d, names, file_type=ext.lstrip('.') or 'xlsx'),
+        'calamine': xlsx_to_dataframes_calamine,
+    }
+
+
+def list_sheet_names(data: bytes, method: str) -> Optional[List[str]]:
+    """
+    Lista as abas lendo apenas os metadados do workbook com a engine indicada.
+    Retorna None se a engine não permite listar sem ler tudo.
+    """
+    import io
+    
+    if method == 'calamine':
+        from python_calamine import CalamineWorkbook
+        return list(CalamineWorkbook.from_filelike(io.BytesIO(data)).sheet_names)
+    if method in ('openpyxl', 'xlsx2csv'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(io.BytesIO(data), read_only=True)
+        names = list(workbook.sheetnames)
+        workbook.close()
+        return names
+    if method == 'pandas':
+        import pandas as pd
+        return list(pd.ExcelFile(io.BytesIO(data)).sheet_names)
+    return None
+
+
+def list_sheets_metadata(data: bytes, filename: str = '', preview_rows: int = 5) -> Dict[str, any]:
+    """
+    Lista as abas com dimensões aproximadas e as primeiras linhas, sem ler
+    as abas inteiras.
+    
+    Em .xlsx/.xlsm usa openpyxl read_only: as dimensões vêm da tag
+    <dimension> de cada aba e só as primeiras linhas são lidas. Outros
+    formatos usam calamine (ou pandas com nrows).
+    
+    Args:
+        data: Conteúdo do arquivo
+        filename: Nome original (usado para detectar a extensão)
+        preview_rows: Linhas de dados na prévia (além do cabeçalho)
+    
+    Returns:
+        Dict com:
+            - success: bool
+            - method: str
+            - message: str
+            - sheets: List[Dict] com name, rows (linhas de dados, aprox.; None
+              se desconhecido), cols e preview (DataFrame)
+    """
+    import io
+    import pandas as pd
+    
+    ext = os.path.splitext(filename)[1].lower() or '.xlsx'
+    
+    try:
+        if ext == '.csv':
+            preview = pd.read_csv(io.BytesIO(data), nrows=preview_rows)
+            rows = max(data.count(b'\n') - 1 + (0 if data.endswith(b'\n') else 1), 0)
+            name = os.path.splitext(os.path.basename(filename))[0] or 'csv'
+            sheets = [{'name': name, 'rows': rows, 'cols': len(preview.columns), 'preview': preview}]
+            method = 'csv'
+        
+        elif ext in ('.xlsx', '.xlsm') and engine_supports('openpyxl', ext):
+            from openpyxl import load_workbook
+            
+            workbook = load_workbook(io.BytesIO(data), data_only=True, read_only=True)
+            sheets = []
+            for sheet in workbook.worksheets:
+                head = list(sheet.iter_rows(max_row=preview_rows + 1, values_only=True))
+                max_row = sheet.max_row
+                sheets.append({
+                    'name': sheet.title,
+                    'rows': max(max_row - 1, 0) if max_row else None,
+                    'cols': sheet.max_column or max((len(r) for r in head), default=0),
+                    'preview': _rows_to_dataframe(head),
+                })
+            workbook.close()
+            method = 'openpyxl'
+        
+        elif engine_supports('calamine', ext):
+            from python_calamine import CalamineWorkbook
+            
+            workbook = CalamineWorkbook.from_filelike(io.BytesIO(data))
+            sheets = []
+            for name in workbook.sheet_names:
+                sheet = workbook.get_sheet_by_name(name)
+                sheets.append({
+                    'name': name,
+                    'rows': max(sheet.height - 1, 0),
+                    'cols': sheet.width,
+                    'preview': _rows_to_dataframe(sheet.to_python(nrows=preview_rows + 1)),
+                })
+            method = 'calamine'
+        
+        else:
+            excel = pd.ExcelFile(io.BytesIO(data))
+            sheets = []
+            for name in excel.sheet_names:
+                preview = excel.parse(name, nrows=preview_rows)
+                sheets.append({'name': name, 'rows': None, 'cols': len(preview.columns), 'preview': preview})
+            method = 'pandas'
+    
+    except Exception as e:
+        return {'success': False, 'method': None, 'message': f"Metadata failed: {str(e)}", 'sheets': []}
+    
+    return {
+        'success': True,
+        'method': method,
+        'message': f"{method.capitalize()}: {len(sheets)} sheets listed",
+        'sheets': sheets,
+    }
+
+
+# Tamanho mínimo do arquivo para ler as abas em paralelo quando max_workers
+# não é informado: abaixo disso, subir os processos custa mais que a leitura
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+
+def _read_sheets_worker(method: str, ext: str, data: bytes, sheet_names: List[str]) -> Tuple[bool, str, Dict]:
+    """Executado no processo worker: abre o workbook e lê só as abas atribuídas."""
+    return _in_memory_readers(ext)[method](data, sheet_names)
+
+
+# Pool de processos compartilhado pelas leituras (um só, com um processo por
+# núcleo; leituras com menos abas usam só parte dele)
+_sheet_pool = None
+_sheet_pool_lock = threading.Lock()
+
+
+def _get_sheet_pool():
+    """
+    Pool de processos reutilizável para leitura de abas (criado no primeiro uso).
+    
+    Usa 'forkserver' onde existe (seguro com as threads do Streamlit, e com
+    pandas pré-carregado) e 'spawn' nos demais sistemas.
+    """
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context('forkserver')
+                ctx.set_forkserver_preload(['pandas', 'scripts.utils'])
+            else:
+                ctx = multiprocessing.get_context('spawn')
+            _sheet_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=ctx)
+        return _sheet_pool
+
+
+def _shutdown_sheet_pool(pool=None):
+    """
+    Encerra o pool de leitura; o próximo _get_sheet_pool cria outro.
+    
+    Args:
+        pool: Se informado, só encerra se ainda for o pool atual (outra
+            thread pode já tê-lo substituído)
+    """
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is None or (pool is not None and pool is not _sheet_pool):
+            return
+        current, _sheet_pool = _sheet_pool, None
+    current.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_shutdown_sheet_pool)
+
+
+def _read_sheets_parallel(
+    method: str,
+    ext: str,
+    data: bytes,
+    max_workers: Optional[int],
+    sheet_names: Optional[List[str]] = None
+) -> Tuple[bool, str, Dict]:
+    """
+    Divide as abas entre workers (cada um abre o workbook e lê as suas) e
+    junta os resultados na ordem original das abas. Cai para a leitura
+    serial quando há uma aba só, um worker só ou (sem max_workers) o
+    arquivo é menor que PARALLEL_MIN_BYTES.
+    
+    Com sheet_names, só essas abas são lidas (na ordem pedida).
+    """
+    reader = _in_memory_readers(ext)[method]
+    requested = list(sheet_names) if sheet_names else None
+    if max_workers is None and len(data) < PARALLEL_MIN_BYTES:
+        return reader(data, requested)
+    
+    if requested is None:
+        try:
+            sheet_names = list_sheet_names(data, method)
+        except Exception:
+            sheet_names = None
+    
+    # Um bloco de abas por worker: o pool tem um processo por núcleo, mas
+    # só recebe tantos blocos quanto abas (ou max_workers)
+    workers = min(max_workers or os.cpu_count() or 1, os.cpu_count() or 1, len(sheet_names or []))
+    if not sheet_names or workers < 2:
+        return reader(data, requested)
+    
+    # Blocos contíguos de abas, um por worker
+    size = -(-len(sheet_names) // workers)
+    chunks = [sheet_names[i:i + size] for i in range(0, len(sheet_names), size)]
+    
+    from concurrent.futures.process import BrokenProcessPool
+    
+    pool = None
+    try:
+        pool = _get_sheet_pool()
+        futures = [pool.submit(_read_sheets_worker, method, ext, data, chunk) for chunk in chunks]
+        results = [f.result() for f in futures]
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            # Worker morto (ex: falta de memória): encerra o pool para o
+            # próximo upload criar um novo em vez de cair sempre aqui
+            _shutdown_sheet_pool(pool)
+        # Pool indisponível (ex: ambiente sem multiprocessing): leitura serial
+        print(f"Leitura paralela indisponível ({e}); lendo abas em série.")
+        return reader(data, requested)
+    
+    sheets = {}
+    for success, message, chunk_sheets in results:
+        if not success:
+            return False, message, {}
+        sheets.update(chunk_sheets)
+    
+    ordered = {name: sheets[name] for name in sheet_names if name in sheets}
+    return True, f"{method.capitalize()}: {len(ordered)} sheets parsed ({len(chunks)} workers)", ordered
+
+
+def concat_sheets(sheets: Dict, origin_col: str = 'aba_origem'):
+    """Concatena as abas na ordem original, marcando a aba de origem de cada linha."""
+    import pandas as pd
+    
+    frames = [df.assign(**{origin_col: name}) for name, df in sheets.items()]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_excel_sheets_all_methods(
+    data: bytes,
+    filename: str = '',
+    preferred_methods: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    sheet_names: Optional[List[str]] = None
+) -> Dict[str, any]:
+    """
+    Lê as abas de uma planilha direto dos bytes, sem gravar em disco.
+    
+    Mesma semântica de fallback de convert_xlsx_to_csv_all_methods: tenta cada
+    método até um funcionar. Win32com e Xlwings exigem um arquivo no disco e
+    não participam. Arquivos .csv são lidos diretamente como uma única aba.
+    Workbooks com várias abas são lidos em paralelo, uma fatia de abas por
+    processo.
+    
+    Args:
+        data: Conteúdo do arquivo (ex: uploaded_file.getvalue())
+        filename: Nome original (usado para detectar .csv/.xls)
+        preferred_methods: Lista de métodos preferidos na ordem (padrão: todos)
+        max_workers: Processos para leitura das abas (padrão: núcleos; 1 = serial)
+        sheet_names: Abas a ler (padrão: todas)
+    
+    Returns:
+        Dict com:
+            - success: bool
+            - method: str (método que funcionou)
+            - message: str
+            - sheets: Dict[str, DataFrame] (na ordem das abas)
+            - attempts: List[Dict] (histórico de tentativas)
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    
+    if ext == '.csv':
+        try:
+            import io
+            import pandas as pd
+            
+            df = pd.read_csv(io.BytesIO(data))
+            sheet_name = os.path.splitext(os.path.basename(filename))[0] or 'csv'
+            message = "CSV: 1 sheet parsed"
+            return {
+                'success': True,
+                'method': 'csv',
+                'message': message,
+                'sheets': {sheet_name: df},
+                'attempts': [{'method': 'csv', 'success': True, 'message': message}]
+            }
+        except Exception as e:
+            message = f"CSV failed: {str(e)}"
+            return {
+                'success': False,
+                'method': None,
+                'message': message,
+                'sheets': {},
+                'attempts': [{'method': 'csv', 'success': False, 'message': message}]
+            }
+    
+    # Métodos disponíveis em memória
+    all_methods = _in_memory_readers(ext)
+    
+    # Definir ordem de tentativa
+    if preferred_methods:
+        methods_to_try = [(m, all_methods[m]) for m in preferred_methods if m in all_methods]
+    else:
+        # Engines disponíveis, mais rápida primeiro (ranking de benchmark)
+        methods_to_try = [(m, all_methods[m]) for m in get_engine_order(ext or '.xlsx', list(all_methods))]
+    
+    attempts = []
+    
+    for method_name, _ in methods_to_try:
+        success, message, sheets = _read_sheets_parallel(method_name, ext or '.xlsx', data, max_workers, sheet_names)
+        
+        attempts.append({
+            'method': method_name,
+            'success': success,
+            'message': message
+        })
+        
+        if success:
+            return {
+                'success': True,
+                'method': method_name,
+                'message': message,
+                'sheets': sheets,
+                'attempts': attempts
+            }
+    
+    return {
+        'success': False,
+        'method': None,
+        'message': 'Todos os métodos falharam',
+        'sheets': {},
+        'attempts': attempts
+    }
+
+
+# ============================================================================
+# Streaming - lotes de linhas com memória limitada pelo tamanho do lote
+# ============================================================================
+
+# Linhas por lote nas conversões em streaming (CSV gravado lote a lote)
+DEFAULT_BATCH_SIZE = 50000
+
+
+def _iter_row_batches(rows, batch_size: int):
+    """Agrupa um iterador de linhas em listas de até batch_size linhas."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,510 @@
+"""
+Módulo de Cache de Planilhas
+
+Guarda as abas já lidas de cada planilha em Parquet (data/output/workbook_cache),
+endereçadas pelo SHA-256 dos bytes do arquivo. Reenviar a mesma planilha pula
+a leitura do Excel: as abas voltam direto do Parquet.
+
+Cada entrada é um diretório <sha256>/ com um manifest.json (nomes das abas,
+colunas, método de leitura) e um arquivo Parquet por aba já lida. Colunas
+object (ex: número e texto na mesma coluna) são gravadas célula a célula,
+com o tipo original de cada uma, para que a leitura do cache devolva os
+mesmos valores que a leitura do Excel (100.0 continua float). Abas lidas
+separadamente (ex: só a aba escolhida na tela de upload) vão sendo somadas à
+mesma entrada. O cache é limitado pelo tamanho total e descarta as entradas
+usadas há mais tempo (LRU).
+"""
+
+import os
+import json
+import datetime
+import time
+import shutil
+import hashlib
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from scripts.utils import read_excel_sheets_all_methods
+
+
+WORKBOOK_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'data', 'output', 'workbook_cache'
+)
+
+# Tamanho máximo do cache em disco (bytes)
+DEFAULT_MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+MANIFEST_NAME = 'manifest.json'
+CACHE_VERSION = 3
+
+# Tipos que o Parquet grava sem conversão; colunas object mistas viram texto
+_PARQUET_SAFE_INFERRED = {'string', 'empty', 'floating', 'integer', 'boolean', 'datetime', 'date', 'decimal'}
+
+# Tipo original de cada célula das colunas object do cache
+CELL_NONE = 0
+CELL_FLOAT = 1
+CELL_TEXT = 2
+CELL_INT = 3
+CELL_BOOL = 4
+CELL_DATE = 5
+CELL_DATETIME = 6
+CELL_TIME = 7
+CELL_TIMESTAMP = 8
+CELL_NAT = 9
+CELL_NA = 10
+
+_CELL_CODES = {
+    type(None): CELL_NONE,
+    float: CELL_FLOAT,
+    str: CELL_TEXT,
+    int: CELL_INT,
+    bool: CELL_BOOL,
+    datetime.date: CELL_DATE,
+    datetime.datetime: CELL_DATETIME,
+    datetime.time: CELL_TIME,
+    pd.Timestamp: CELL_TIMESTAMP,
+    type(pd.NaT): CELL_NAT,
+    type(pd.NA): CELL_NA,
+}
+
+# Texto gravado -> valor, por tipo
+_CELL_PARSERS = {
+    CELL_TEXT: str,
+    CELL_INT: int,
+    CELL_BOOL: lambda text: text == 'True',
+    CELL_DATE: datetime.date.fromisoformat,
+    CELL_DATETIME: datetime.datetime.fromisoformat,
+    CELL_TIME: datetime.time.fromisoformat,
+    CELL_TIMESTAMP: pd.Timestamp,
+}
+
+
+def parquet_available() -> bool:
+    """pyarrow instalado (sem ele o cache fica desativado)."""
+    try:
+        return importlib.util.find_spec('pyarrow') is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def workbook_digest(data: bytes) -> str:
+    """SHA-256 (hex) do conteúdo do arquivo: a chave do cache."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_dir(digest: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, digest)
+
+
+def _sheet_file(name: str) -> str:
+    """Nome do arquivo Parquet de uma aba (estável, seguro para o disco)."""
+    return f"sheet_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}.parquet"
+
+
+def _read_manifest(entry: str) -> Optional[Dict]:
+    manifest_path = os.path.join(entry, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(entry: str, manifest: Dict):
+    """Grava o manifest de forma atômica (arquivo temporário + rename)."""
+    tmp_path = os.path.join(entry, f"{MANIFEST_NAME}.tmp-{os.getpid()}")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(entry, MANIFEST_NAME))
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def to_parquet_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepara uma aba para o Parquet: nomes de coluna como texto e colunas
+    object com tipos misturados (ex: número e texto na mesma coluna)
+    convertidas para texto, preservando os vazios.
+    """
+    out = df.copy()
+    out.columns = [str(c) for c in out.columns]
+    for col in out.columns:
+        series = out[col]
+        if series.dtype != object:
+            continue
+        if pd.api.types.infer_dtype(series, skipna=True) in _PARQUET_SAFE_INFERRED:
+            continue
+        out[col] = series.where(series.isna(), series.astype(str))
+    return out
+
+
+def _cell_code(value) -> int:
+    """Tipo da célula (CELL_*); numpy e subclasses caem no tipo Python equivalente."""
+    code = _CELL_CODES.get(type(value))
+    if code is not None:
+        return code
+    if isinstance(value, (bool, np.bool_)):
+        return CELL_BOOL
+    if isinstance(value, (int, np.integer)):
+        return CELL_INT
+    if isinstance(value, (float, np.floating)):
+        return CELL_FLOAT
+    if isinstance(value, pd.Timestamp):
+        return CELL_TIMESTAMP
+    if isinstance(value, datetime.datetime):
+        return CELL_DATETIME
+    if isinstance(value, datetime.date):
+        return CELL_DATE
+    if isinstance(value, datetime.time):
+        return CELL_TIME
+    # Outros tipos (raros em planilhas) ficam como texto
+    return CELL_TEXT
+
+
+def _cell_text(value, code: int) -> str:
+    if code == CELL_INT:
+        return str(int(value))
+    if code == CELL_BOOL:
+        return str(bool(value))
+    if code in (CELL_DATE, CELL_DATETIME, CELL_TIME, CELL_TIMESTAMP):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_sheet(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Converte uma aba para gravação no cache sem perder o tipo das células.
+
+    Colunas com tipo próprio (float64, int64, datetime64...) são gravadas como
+    estão, na coluna '<i>'. Cada coluna object vira três: '<i>:num' (células
+    float), '<i>:texto' (as demais, como texto) e '<i>:tipo' (CELL_*).
+
+    Returns:
+        (DataFrame para o Parquet, descrição das colunas para o manifest:
+        lista de {'name', 'object'})
+    """
+    data = {}
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df.iloc[:, i]
+        if not isinstance(name, (str, int, float, bool)) and name is not None:
+            name = str(name)
+        is_object = series.dtype == object
+        columns.append({'name': name, 'object': bool(is_object)})
+        if not is_object:
+            data[str(i)] = series.reset_index(drop=True)
+            continue
+
+        values = series.to_numpy()
+        codes = np.fromiter((_cell_code(v) for v in values), dtype=np.int8, count=len(values))
+        is_float = codes == CELL_FLOAT
+        is_text = np.isin(codes, list(_CELL_PARSERS))
+
+        num = np.full(len(values), np.nan)
+        num[is_float] = values[is_float].astype(float)
+        text = np.full(len(values), None, dtype=object)
+        text[is_text] = [_cell_text(v, c) for v, c in zip(values[is_text], codes[is_text])]
+
+        data[f"{i}:num"] = num
+        data[f"{i}:texto"] = pd.Series(text, dtype=object)
+        data[f"{i}:tipo"] = codes
+    return pd.DataFrame(data, index=pd.RangeIndex(len(df))), columns
+
+
+def decode_sheet(stored: pd.DataFrame, columns: List[Dict], rows: int) -> pd.DataFrame:
+    """
+    Reconstrói uma aba gravada por encode_sheet.
+
+    Args:
+        stored: DataFrame lido do Parquet
+        columns: Descrição das colunas (manifest)
+        rows: Número de linhas da aba (abas sem colunas)
+    """
+    data = {}
+    for i, column in enumerate(columns):
+        if not column['object']:
+            data[i] = stored[str(i)]
+            continue
+
+        codes = stored[f"{i}:tipo"].to_numpy()
+        num = stored[f"{i}:num"].to_numpy(dtype=float)
+        text = stored[f"{i}:texto"].to_numpy(dtype=object)
+
+        values = np.full(len(codes), None, dtype=object)
+        is_float = codes == CELL_FLOAT
+        values[is_float] = num[is_float]
+        values[codes == CELL_NAT] = pd.NaT
+        values[codes == CELL_NA] = pd.NA
+        for code, parse in _CELL_PARSERS.items():
+            positions = np.flatnonzero(codes == code)
+            if len(positions):
+                values[positions] = [parse(t) for t in text[positions]]
+        data[i] = pd.Series(values, dtype=object)
+
+    out = pd.DataFrame(data, index=pd.RangeIndex(rows))
+    out.columns = pd.Index([column['name'] for column in columns])
+    return out
+
+
+def load_cached_workbook(
+    digest: str,
+    cache_dir: str = WORKBOOK_CACHE_DIR,
+    sheet_names: Optional[List[str]] = None
+) -> Optional[Dict]:
+    """
+    Lê uma planilha do cache.
+
+    Args:
+        digest: SHA-256 do arquivo (workbook_digest)
+        cache_dir: Diretório do cache
+        sheet_names: Abas desejadas (padrão: o workbook inteiro)
+
+    Returns:
+        Dict com 'manifest' e 'sheets' (Dict[str, DataFrame] na ordem das abas,
+        ou na ordem pedida), ou None se alguma aba pedida não estiver no cache
+        (ou a entrada estiver corrompida)
+    """
+    entry = _entry_dir(digest, cache_dir)
+
+    try:
+        manifest = _read_manifest(entry)
+        if manifest is None:
+            return None
+
+        cached = {sheet['name']: sheet for sheet in manifest['sheets']}
+        if sheet_names is None:
+            if not manifest.get('complete'):
+                return None
+            sheet_names = manifest['sheet_names']
+        if any(name not in cached for name in sheet_names):
+            return None
+
+        sheets = {}
+        for name in sheet_names:
+            sheet = cached[name]
+            stored = pd.read_parquet(os.path.join(entry, sheet['file']))
+            sheets[name] = decode_sheet(stored, sheet['columns'], sheet['rows'])
+    except Exception as e:
+        print(f"Entrada de cache inválida {entry}: {e}")
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    # Marca o uso (LRU pela data de modificação do manifest)
+    try:
+        os.utime(os.path.join(entry, MANIFEST_NAME), None)
+    except OSError:
+        pass
+
+    return {'manifest': manifest, 'sheets': sheets}
+
+
+def store_workbook(
+    digest: str,
+    sheets: Dict[str, pd.DataFrame],
+    method: str = '',
+    filename: str = '',
+    complete: bool = True,
+    cache_dir: str = WORKBOOK_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_CACHE_BYTES
+) -> Optional[Dict]:
+    """
+    Grava abas de uma planilha no cache e aplica o limite de tamanho.
+
+    Cada aba é gravada num arquivo temporário e renomeada; o manifest é
+    regravado por último, também por rename, então leitores concorrentes
+    nunca veem uma aba pela metade.
+
+    Args:
+        digest: SHA-256 do arquivo
+        sheets: Abas lidas (nome -> DataFrame)
+        method: Método de leitura usado (registrado no manifest)
+        filename: Nome original do arquivo (informativo)
+        complete: True se sheets é o workbook inteiro (na ordem das abas);
+            False para abas avulsas, somadas à entrada existente
+        cache_dir: Diretório do cache
+        max_bytes: Tamanho máximo do cache após a gravação
+
+    Returns:
+        Manifest gravado, ou None se o cache estiver indisponível
+    """
+    if not parquet_available():
+        return None
+
+    entry = _entry_dir(digest, cache_dir)
+
+    try:
+        manifest = _read_manifest(entry)
+        if manifest is None:
+            # Entrada ausente ou de outra versão do cache: recomeçar do zero
+            shutil.rmtree(entry, ignore_errors=True)
+        os.makedirs(entry, exist_ok=True)
+        manifest = manifest or {
+            'version': CACHE_VERSION,
+            'sha256': digest,
+            'filename': filename,
+            'method': method,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'complete': False,
+            'sheet_names': [],
+            'sheets': [],
+        }
+        cached = {sheet['name']: sheet for sheet in manifest['sheets']}
+
+        for name, df in sheets.items():
+            if name in cached:
+                continue
+            file_name = _sheet_file(name)
+            tmp_path = os.path.join(entry, f"{file_name}.tmp-{os.getpid()}")
+            stored, columns = encode_sheet(df)
+            stored.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(entry, file_name))
+            cached[name] = {
+                'name': name,
+                'file': file_name,
+                'rows': int(df.shape[0]),
+                'cols': int(df.shape[1]),
+                'columns': columns,
+            }
+
+        if complete:
+            manifest['complete'] = True
+            manifest['sheet_names'] = list(sheets)
+            manifest['method'] = method or manifest.get('method', '')
+        manifest['sheets'] = list(cached.values())
+        _write_manifest(entry, manifest)
+    except Exception as e:
+        print(f"Erro gravando cache da planilha {digest[:12]}: {e}")
+        return None
+
+    evict_workbook_cache(cache_dir, max_bytes, keep=[digest])
+    return manifest
+
+
+def list_cached_workbooks(cache_dir: str = WORKBOOK_CACHE_DIR) -> List[Dict]:
+    """
+    Lista as entradas do cache, da usada mais recentemente para a mais antiga.
+
+    Returns:
+        Lista de dicts com sha256, filename, last_access (epoch), bytes e sheets
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        manifest_path = os.path.join(entry, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            continue
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            last_access = os.path.getmtime(manifest_path)
+        except (OSError, ValueError):
+            continue
+        entries.append({
+            'sha256': name,
+            'filename': manifest.get('filename', ''),
+            'last_access': last_access,
+            'bytes': _dir_size(entry),
+            'sheets': manifest.get('sheets', []),
+        })
+
+    entries.sort(key=lambda e: e['last_access'], reverse=True)
+    return entries
+
+
+def evict_workbook_cache(
+    cache_dir: str = WORKBOOK_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    keep: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Remove as entradas usadas há mais tempo até o cache caber em max_bytes.
+
+    Args:
+        cache_dir: Diretório do cache
+        max_bytes: Tamanho máximo total
+        keep: Digests que não podem ser removidos (ex: a entrada recém-gravada)
+
+    Returns:
+        Lista de digests removidos
+    """
+    keep = set(keep or [])
+    entries = list_cached_workbooks(cache_dir)
+    total = sum(e['bytes'] for e in entries)
+
+    removed = []
+    for entry in reversed(entries):
+        if total <= max_bytes:
+            break
+        if entry['sha256'] in keep:
+            continue
+        shutil.rmtree(_entry_dir(entry['sha256'], cache_dir), ignore_errors=True)
+        total -= entry['bytes']
+        removed.append(entry['sha256'])
+
+    return removed
+
+
+def read_workbook_cached(
+    data: bytes,
+    filename: str = '',
+    preferred_methods: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    sheet_names: Optional[List[str]] = None,
+    cache_dir: str = WORKBOOK_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_CACHE_BYTES
+) -> Dict[str, any]:
+    """
+    read_excel_sheets_all_methods com cache em Parquet.
+
+    Abas já vistas (mesmo SHA-256 do arquivo) são lidas do cache sem abrir o
+    Excel; caso contrário são lidas normalmente e gravadas no cache. Com
+    sheet_names, só as abas pedidas são lidas e guardadas.
+
+    Returns:
+        Mesmo dict de read_excel_sheets_all_methods, mais:
+            - cached: bool (True se veio do cache)
+            - digest: str (SHA-256 do arquivo)
+    """
+    digest = workbook_digest(data)
+
+    if parquet_available():
+        hit = load_cached_workbook(digest, cache_dir, sheet_names)
+        if hit is not None:
+            message = f"Cache: {len(hit['sheets'])} sheets loaded ({hit['manifest'].get('method') or '-'})"
+            return {
+                'success': True,
+                'method': 'cache',
+                'message': message,
+                'sheets': hit['sheets'],
+                'attempts': [{'method': 'cache', 'success': True, 'message': message}],
+                'cached': True,
+                'digest': digest,
+            }
+
+    result = read_excel_sheets_all_methods(data, filename, preferred_methods, max_workers, sheet_names)
+    if result['success']:
+        store_workbook(
+            digest, result['sheets'], result['method'], filename,
+            complete=sheet_names is None, cache_dir=cache_dir, max_bytes=max_bytes
+        )
+
+    result['cached'] = False
+    result['digest'] = digest
+    return result